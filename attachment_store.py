@@ -0,0 +1,101 @@
+"""
+Content-addressed storage for downloaded attachments.
+
+Every file is stored once under the sha256 of its content, sharded by the
+first two byte pairs of the hash (attachments/ab/cd/abcd...). The same
+screenshot attached to hundreds of cases therefore takes the disk space of
+one file; the attachments table keeps each attachment's own filename and
+points at the shared copy through content_hash and local_path.
+
+Downloads are streamed to attachments/partial/<key>.part and only moved into
+place once complete, so an interrupted download can be resumed from where it
+stopped and a partial file never shows up under a hash.
+"""
+import hashlib
+import os
+import threading
+
+# Bytes read at a time when hashing the already downloaded part of a file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class AttachmentStore:
+    """Store byte streams under the sha256 of their content"""
+
+    def __init__(self, root='attachments'):
+        self.root = root
+        self.partial_dir = os.path.join(root, 'partial')
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._downloaded = {}   # key -> (content_hash, path, size)
+
+    def path_for(self, content_hash):
+        """Path of the file holding content_hash"""
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], content_hash)
+
+    def download(self, key, open_stream, expected_size=None):
+        """Download a file into the store, resuming an earlier partial download
+
+        Args:
+            key: Stable name of the download (e.g. the TestRail attachment
+                ID); names its .part file. Concurrent downloads of the same
+                key wait for the first one and share its result.
+            open_stream: Called as open_stream(offset); returns (start,
+                chunks) like testrail.APIClient.open_attachment.
+            expected_size: Size the finished file must have, if known. A
+                mismatch discards the partial file and raises IOError.
+
+        Returns:
+            (content_hash, path, size)
+        """
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key in self._downloaded:
+                return self._downloaded[key]
+
+            os.makedirs(self.partial_dir, exist_ok=True)
+            part_path = os.path.join(self.partial_dir, f'{key}.part')
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if expected_size is not None and offset > expected_size:
+                offset = 0
+
+            if expected_size is not None and offset == expected_size and offset:
+                start, chunks = offset, iter(())
+            else:
+                start, chunks = open_stream(offset)
+                start = min(start, offset)
+
+            # The hash covers the part kept from earlier attempts as well
+            digest = hashlib.sha256()
+            with open(part_path, 'r+b' if start else 'wb') as part_file:
+                remaining = start
+                while remaining:
+                    block = part_file.read(min(HASH_CHUNK_SIZE, remaining))
+                    digest.update(block)
+                    remaining -= len(block)
+                part_file.truncate(start)
+                size = start
+                for chunk in chunks:
+                    digest.update(chunk)
+                    part_file.write(chunk)
+                    size += len(chunk)
+
+            if expected_size is not None and size != expected_size:
+                os.remove(part_path)
+                raise IOError(f"Downloaded {size} bytes of {key}, expected {expected_size}")
+
+            result = self._commit(part_path, digest.hexdigest(), size)
+            self._downloaded[key] = result
+            return result
+
+    def _commit(self, temp_path, content_hash, size):
+        """Move a complete file into place under its hash"""
+        path = self.path_for(content_hash)
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        return content_hash, path, size
@@ -0,0 +1,70 @@
+"""
+Secondary indexes for the local TestRail snapshot.
+
+The tables created by importer.py only have primary keys, so every join on
+tests.run_id, results.test_id, cases.suite_id, ... scanned a whole table.
+These indexes are built once the bulk load is done (building them after the
+inserts is cheaper than maintaining them during the load), followed by
+ANALYZE so the query planner knows their selectivity. Several are covering
+for the hot migrator and report queries, which then never touch the table.
+"""
+import sqlite3
+
+# (index name, table, columns)
+INDEXES = [
+    # Cases of a project (via suites) and the report's priority/type breakdowns
+    ('idx_cases_suite', 'cases', 'suite_id, priority_id, type_id'),
+    ('idx_cases_section', 'cases', 'section_id'),
+    ('idx_sections_suite', 'sections', 'suite_id'),
+    ('idx_suites_project', 'suites', 'project_id'),
+    # Runs and milestones of a project in migration order
+    ('idx_runs_project', 'runs', 'project_id, created_on'),
+    ('idx_milestones_project', 'milestones', 'project_id, due_on'),
+    # Tests of a run / of a case; covers SELECT run_id, case_id FROM tests
+    ('idx_tests_run_case', 'tests', 'run_id, case_id'),
+    ('idx_tests_case', 'tests', 'case_id'),
+    # Results of a test in date order, as read by migrate_test_results
+    ('idx_results_test_created', 'results', 'test_id, created_on, status_id'),
+    ('idx_attachments_entity', 'attachments', 'entity_type, entity_id'),
+]
+
+
+def create_indexes(conn):
+    """Create the missing indexes on the tables that exist; returns how many were created"""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    created = 0
+    for name, table, columns in INDEXES:
+        if table in tables and name not in existing:
+            conn.execute(f'CREATE INDEX {name} ON {table} ({columns})')
+            created += 1
+    conn.commit()
+    return created
+
+
+def optimize_database(db_path, analyze=None):
+    """Build the indexes and refresh the planner statistics
+
+    Args:
+        db_path: SQLite database file.
+        analyze: True to always run ANALYZE (e.g. after an import changed
+            the data), None to run it only when an index was created or no
+            statistics exist yet.
+
+    Returns:
+        The number of indexes created.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        created = create_indexes(conn)
+        if analyze is None:
+            has_stats = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").fetchone()
+            analyze = created > 0 or not has_stats
+        if analyze:
+            conn.execute('ANALYZE')
+            conn.commit()
+        return created
+    finally:
+        conn.close()
@@ -0,0 +1,174 @@
+"""
+Single-writer access to the local SQLite database.
+
+The importer fetches from TestRail on several worker threads, but an
+sqlite3 connection must only be used by the thread that created it. DBWriter
+owns the connection on one background thread and applies queued statements
+in the order they were submitted, so inserts stay consistent no matter how
+many workers produce them.
+
+INSERT statements are buffered per SQL text and applied with executemany,
+and commit() only ends a transaction once enough rows have been written, so
+a large import runs in a few big transactions instead of one per row batch.
+The connection is tuned for a bulk load (WAL journal, synchronous=NORMAL,
+a larger page cache and in-memory temp storage).
+"""
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+# Connection settings for the import session
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,       # KiB, i.e. 64 MB
+    'temp_store': 'MEMORY',
+}
+
+
+class DBWriter:
+    """Queue SQLite statements to a dedicated writer thread"""
+
+    def __init__(self, db_path, max_pending=10000, batch_size=1000,
+                 transaction_size=50000, pragmas=None):
+        """
+        Args:
+            db_path: SQLite database file.
+            max_pending: Statements queued before producers have to wait.
+            batch_size: Buffered rows that trigger an executemany flush.
+            transaction_size: Rows written before commit() really commits.
+            pragmas: PRAGMA name -> value; defaults to DEFAULT_PRAGMAS.
+        """
+        self.batch_size = max(1, batch_size)
+        self.transaction_size = max(1, transaction_size)
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        # A bounded queue makes fast producers wait for the writer instead of
+        # piling up rows in memory
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, args=(db_path,),
+                                        name='sqlite-writer', daemon=True)
+        self._closed = False
+        # Serialises submissions with close(), so no statement can be queued
+        # behind the stop sentinel and never run
+        self._submit_lock = threading.Lock()
+        self.error_count = 0
+        self._thread.start()
+
+    def execute(self, sql, params=()):
+        """Queue a single statement"""
+        self._submit('execute', sql, params)
+
+    def executemany(self, sql, rows):
+        """Queue a statement for every row in rows"""
+        self._submit('executemany', sql, list(rows))
+
+    def commit(self):
+        """Mark a point where the current transaction may end
+
+        Buffered rows are written, and the transaction is committed once at
+        least transaction_size rows have been written since the last commit.
+        close() always commits.
+        """
+        self._submit('commit')
+
+    def query(self, sql, params=()):
+        """Run a SELECT after all queued (and buffered) writes and return its rows"""
+        future = Future()
+        self._submit('query', sql, params, future)
+        return future.result()
+
+    def close(self):
+        """Commit outstanding work and stop the writer thread"""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def _submit(self, op, sql=None, params=(), future=None):
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("DBWriter is closed")
+            self._queue.put((op, sql, params, future))
+
+    def _run(self, db_path):
+        conn = sqlite3.connect(db_path)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+
+        buffers = {}        # INSERT sql -> rows waiting for executemany
+        buffered = 0
+        uncommitted = 0
+
+        def flush():
+            nonlocal buffered, uncommitted
+            for sql, rows in buffers.items():
+                # The savepoint undoes the rows executemany applied before
+                # failing, so the replay below does not insert them twice
+                if not conn.in_transaction:
+                    conn.execute('BEGIN')
+                conn.execute('SAVEPOINT batch')
+                try:
+                    conn.executemany(sql, rows)
+                    conn.execute('RELEASE batch')
+                except Exception:
+                    conn.execute('ROLLBACK TO batch')
+                    conn.execute('RELEASE batch')
+                    # Find the offending rows instead of losing the batch
+                    for row in rows:
+                        try:
+                            conn.execute(sql, row)
+                        except Exception as e:
+                            self._write_failed(e)
+                uncommitted += len(rows)
+            buffers.clear()
+            buffered = 0
+
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                op, sql, params, future = item
+                try:
+                    if op in ('execute', 'executemany') and sql.lstrip()[:6].upper() == 'INSERT':
+                        rows = buffers.setdefault(sql, [])
+                        if op == 'execute':
+                            rows.append(params)
+                            buffered += 1
+                        else:
+                            rows.extend(params)
+                            buffered += len(params)
+                        if buffered >= self.batch_size:
+                            flush()
+                        continue
+
+                    # Anything else sees (and is ordered after) the buffered rows
+                    flush()
+                    if op == 'execute':
+                        conn.execute(sql, params)
+                        uncommitted += 1
+                    elif op == 'executemany':
+                        conn.executemany(sql, params)
+                        uncommitted += len(params)
+                    elif op == 'commit':
+                        if uncommitted >= self.transaction_size:
+                            conn.commit()
+                            uncommitted = 0
+                    elif op == 'query':
+                        future.set_result(conn.execute(sql, params).fetchall())
+                except Exception as e:
+                    if future is not None:
+                        future.set_exception(e)
+                    else:
+                        self._write_failed(e)
+        finally:
+            flush()
+            conn.commit()
+            conn.close()
+
+    def _write_failed(self, error):
+        self.error_count += 1
+        print(f"  Warning: Database write failed: {error}", flush=True)
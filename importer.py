@@ -1,9 +1,15 @@
 from testrail import *
-from sqlite3 import *
+from db_writer import DBWriter
+from db_indexes import optimize_database
+from attachment_store import AttachmentStore
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import json
 import sys
 import base64
 import os
+import threading
+import time
 import traceback
 import requests
 
@@ -15,6 +21,20 @@ def print_flush(*args, **kwargs):
 with open('config.json') as config_file:
     config = json.load(config_file)
 
+parser = argparse.ArgumentParser(description='Import the selected TestRail project into testrail.db')
+parser.add_argument('--workers', type=int, default=config.get('import_workers', 1),
+                    help='number of concurrent TestRail fetches per stage (default: 1)')
+parser.add_argument('--incremental', action='store_true', default=config.get('incremental_import', False),
+                    help='only fetch cases, runs and results changed since the last import')
+args = parser.parse_args()
+WORKERS = max(1, args.workers)
+INCREMENTAL = args.incremental
+
+# Concurrent attachment downloads, and retries of a download that broke off
+# (each retry resumes where the previous attempt stopped)
+DOWNLOAD_WORKERS = max(1, config.get('attachment_download_workers', 4))
+DOWNLOAD_RETRIES = config.get('attachment_download_retries', 3)
+
 # Load migration configuration
 migration_config = None
 SELECTED_PROJECT_ID = None
@@ -34,666 +54,815 @@ except FileNotFoundError:
     print_flush("=" * 80)
     sys.exit(1)
 
-db = connect('testrail.db')
-cursor = db.cursor()
-
-client = APIClient(config['testrail_url'])
-client.user = config['testrail_user']
-client.password = config['testrail_password']
-
-print_flush("\n" + "=" * 80)
-print_flush("FETCHING AND STORING TESTRAIL DATA")
-print_flush("=" * 80)
-
-# 1. PROJECTS - Only import the selected project
-print_flush("\n[1/15] Fetching Selected Project...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS projects (
-    id INTEGER NOT NULL PRIMARY KEY,
-    name TEXT,
-    announcement TEXT,
-    show_announcement TEXT,
-    is_completed TEXT,
-    suite_mode TEXT,
-    default_role_id TEXT,
-    case_statuses_enabled TEXT,
-    url TEXT,
-    users TEXT, 
-    groups TEXT
-)''')
-
-project = client.send_get(f'get_project/{SELECTED_PROJECT_ID}')
-cursor.execute('INSERT OR REPLACE INTO projects (id, name, announcement, show_announcement, is_completed, suite_mode, default_role_id, case_statuses_enabled, url, users, groups) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-               (
-                   project['id'], 
-                   project['name'], 
-                   project['announcement'], 
-                   project['show_announcement'], 
-                   project['is_completed'], 
-                   project['suite_mode'], 
-                   project['default_role_id'], 
-                   project['case_statuses_enabled'], 
-                   project['url'],
-                   str(project['users']),
-                   str(project['groups'])
-                ))
-db.commit()
-print(f"✓ Stored project: {project['name']}")
-
-# 2. USERS
-print("\n[2/15] Fetching Users...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS users (
-    id INTEGER NOT NULL PRIMARY KEY,
-    name TEXT,
-    email TEXT,
-    is_active INTEGER,
-    role_id INTEGER,
-    role TEXT
-)''')
-users = client.send_get('get_users')['users']
-for user in users:
-    cursor.execute('INSERT OR REPLACE INTO users (id, name, email, is_active, role_id, role) VALUES (?, ?, ?, ?, ?, ?)',
-                   (user['id'], user['name'], user['email'], user['is_active'], user.get('role_id'), user.get('role')))
-db.commit()
-print(f"✓ Stored {len(users)} users")
-
-# 3. CASE TYPES
-print("\n[3/15] Fetching Case Types...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS case_types (
-    id INTEGER NOT NULL PRIMARY KEY,
-    name TEXT,
-    is_default INTEGER
-)''')
-case_types = client.send_get('get_case_types')
-for case_type in case_types:
-    cursor.execute('INSERT OR REPLACE INTO case_types (id, name, is_default) VALUES (?, ?, ?)',
-                   (case_type['id'], case_type['name'], case_type['is_default']))
-db.commit()
-print(f"✓ Stored {len(case_types)} case types")
-
-# 4. CASE FIELDS
-print("\n[4/15] Fetching Case Fields...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS case_fields (
-    id INTEGER NOT NULL PRIMARY KEY,
-    type_id INTEGER,
-    name TEXT,
-    system_name TEXT,
-    label TEXT,
-    description TEXT,
-    is_active INTEGER,
-    configs TEXT
-)''')
-case_fields = client.send_get('get_case_fields')
-for field in case_fields:
-    cursor.execute('INSERT OR REPLACE INTO case_fields (id, type_id, name, system_name, label, description, is_active, configs) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
-                   (field['id'], field['type_id'], field['name'], field['system_name'], field['label'], 
-                    field.get('description'), field['is_active'], str(field.get('configs'))))
-db.commit()
-print(f"✓ Stored {len(case_fields)} case fields")
-
-# 5. PRIORITIES
-print("\n[5/15] Fetching Priorities...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS priorities (
-    id INTEGER NOT NULL PRIMARY KEY,
-    name TEXT,
-    short_name TEXT,
-    is_default INTEGER,
-    priority INTEGER
-)''')
-priorities = client.send_get('get_priorities')
-for priority in priorities:
-    cursor.execute('INSERT OR REPLACE INTO priorities (id, name, short_name, is_default, priority) VALUES (?, ?, ?, ?, ?)',
-                   (priority['id'], priority['name'], priority['short_name'], priority['is_default'], priority['priority']))
-db.commit()
-print(f"✓ Stored {len(priorities)} priorities")
-
-# 6. RESULT FIELDS
-print("\n[6/15] Fetching Result Fields...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS result_fields (
-    id INTEGER NOT NULL PRIMARY KEY,
-    type_id INTEGER,
-    name TEXT,
-    system_name TEXT,
-    label TEXT,
-    description TEXT,
-    is_active INTEGER,
-    configs TEXT
-)''')
-result_fields = client.send_get('get_result_fields')
-for field in result_fields:
-    cursor.execute('INSERT OR REPLACE INTO result_fields (id, type_id, name, system_name, label, description, is_active, configs) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
-                   (field['id'], field['type_id'], field['name'], field['system_name'], field['label'], 
-                    field.get('description'), field['is_active'], str(field.get('configs'))))
-db.commit()
-print(f"✓ Stored {len(result_fields)} result fields")
-
-# 7. STATUSES
-print("\n[7/15] Fetching Statuses...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS statuses (
-    id INTEGER NOT NULL PRIMARY KEY,
-    name TEXT,
-    label TEXT,
-    color_dark INTEGER,
-    color_medium INTEGER,
-    color_bright INTEGER,
-    is_system INTEGER,
-    is_untested INTEGER,
-    is_final INTEGER
-)''')
-statuses = client.send_get('get_statuses')
-for status in statuses:
-    cursor.execute('INSERT OR REPLACE INTO statuses (id, name, label, color_dark, color_medium, color_bright, is_system, is_untested, is_final) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                   (status['id'], status['name'], status['label'], status['color_dark'], status['color_medium'], 
-                    status['color_bright'], status['is_system'], status['is_untested'], status['is_final']))
-db.commit()
-print(f"✓ Stored {len(statuses)} statuses")
-
-# 8. TEMPLATES
-print("\n[8/15] Fetching Templates...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS templates (
-    id INTEGER NOT NULL PRIMARY KEY,
-    project_id INTEGER,
-    name TEXT,
-    is_default INTEGER
-)''')
-try:
-    templates = client.send_get(f'get_templates/{SELECTED_PROJECT_ID}')
-    for template in templates:
-        cursor.execute('INSERT OR REPLACE INTO templates (id, project_id, name, is_default) VALUES (?, ?, ?, ?)',
-                       (template['id'], SELECTED_PROJECT_ID, template['name'], template['is_default']))
-    db.commit()
-    print(f"✓ Stored {len(templates)} templates")
-except Exception as e:
-    print(f"  Warning: Could not fetch templates for project {SELECTED_PROJECT_ID}: {e}")
-    print(f"✓ Stored templates")
-
-# 9. SUITES
-print("\n[9/15] Fetching Suites...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS suites (
-    id INTEGER NOT NULL PRIMARY KEY,
-    project_id INTEGER,
-    name TEXT,
-    description TEXT,
-    url TEXT,
-    is_master INTEGER,
-    is_baseline INTEGER,
-    is_completed INTEGER,
-    completed_on INTEGER
-)''')
-suite_count = 0
-try:
-    suites = client.send_get(f'get_suites/{SELECTED_PROJECT_ID}')['suites']
-    for suite in suites:
-        cursor.execute('INSERT OR REPLACE INTO suites (id, project_id, name, description, url, is_master, is_baseline, is_completed, completed_on) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                       (suite['id'], suite['project_id'], suite['name'], suite.get('description'), suite['url'], 
-                        suite['is_master'], suite['is_baseline'], suite['is_completed'], suite.get('completed_on')))
-        suite_count += 1
-    db.commit()
-except Exception as e:
-    print(f"  Warning: Could not fetch suites for project {SELECTED_PROJECT_ID}: {e}")
-print(f"✓ Stored {suite_count} suites")
-
-# 10. SECTIONS
-print("\n[10/15] Fetching Sections...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS sections (
-    id INTEGER NOT NULL PRIMARY KEY,
-    suite_id INTEGER,
-    name TEXT,
-    description TEXT,
-    parent_id INTEGER,
-    display_order INTEGER,
-    depth INTEGER
-)''')
-section_count = 0
-try:
-    suites = client.send_get(f'get_suites/{SELECTED_PROJECT_ID}')['suites']
-    for suite in suites:
+# All SQLite writes go through one writer thread, which batches inserts into
+# large transactions; the TestRail fetches of each stage run on a bounded
+# pool of WORKERS threads
+writer = DBWriter('testrail.db',
+                  batch_size=config.get('db_batch_size', 1000),
+                  transaction_size=config.get('db_transaction_size', 50000))
+pool = ThreadPoolExecutor(max_workers=WORKERS)
+# Downloads run on their own bounded pool, fed by the workers listing
+# attachments
+download_pool = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix='download')
+
+# Single pooled client shared by every import stage
+client = client_from_config(config, pool_maxsize=max(WORKERS, DOWNLOAD_WORKERS))
+
+
+class ProgressCounter:
+    """Thread-safe counter for progress output from worker threads"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+    
+    def increment(self):
+        with self._lock:
+            self.value += 1
+            return self.value
+
+# Columns that change whenever results are added to a run or it is closed
+RUN_STATE_COLUMNS = ['is_completed', 'passed_count', 'blocked_count', 'untested_count', 'retest_count',
+                     'failed_count'] + [f'custom_status{i}_count' for i in range(1, 8)]
+
+def run_state(run):
+    return tuple(int(bool(run.get(column))) if column == 'is_completed' else run.get(column)
+                 for column in RUN_STATE_COLUMNS)
+
+
+def import_project():
+    """Fetch the selected project into testrail.db; returns the summary counts"""
+    runs = []   # runs stored by this import
+    
+    # Watermarks of the last import of each project. A full import records them
+    # too, so a later --incremental run knows where to start.
+    # The watermark is the time this import started, not the newest row stored:
+    # a row changed while the import runs can be older than rows fetched later,
+    # and must still be picked up by the next run. The margin covers clock skew
+    # between this machine and the TestRail server.
+    SYNC_WATERMARK_MARGIN = config.get('sync_watermark_margin', 300)
+    import_started = int(time.time())
+    writer.execute('''CREATE TABLE IF NOT EXISTS sync_state (
+        project_id INTEGER,
+        entity TEXT,
+        watermark INTEGER,
+        synced_on INTEGER,
+        PRIMARY KEY (project_id, entity)
+    )''')
+    # Runs whose tests, results and attachments are not all stored: every run
+    # is listed here while it is being imported and removed once it is done,
+    # so a run left behind by a failed or aborted import is fetched again
+    writer.execute('''CREATE TABLE IF NOT EXISTS sync_stale_runs (
+        project_id INTEGER,
+        run_id INTEGER,
+        PRIMARY KEY (project_id, run_id)
+    )''')
+    stale_run_ids = {run_id for (run_id,) in writer.query(
+        'SELECT run_id FROM sync_stale_runs WHERE project_id = ?', (SELECTED_PROJECT_ID,))}
+    watermarks = {}
+    if INCREMENTAL:
+        watermarks = dict(writer.query('SELECT entity, watermark FROM sync_state WHERE project_id = ?',
+                                       (SELECTED_PROJECT_ID,)))
+
+    def changed_since(entity):
+        """created_after/updated_after value for an entity, or None for a full fetch"""
+        watermark = watermarks.get(entity)
+        # One second of overlap: rows seen again are simply replaced
+        return watermark - 1 if watermark is not None else None
+
+    print_flush("\n" + "=" * 80)
+    print_flush("FETCHING AND STORING TESTRAIL DATA")
+    if WORKERS > 1:
+        print_flush(f"Using {WORKERS} concurrent workers")
+    if INCREMENTAL and watermarks:
+        print_flush("Incremental import: fetching cases, runs and results changed since the last import")
+    elif INCREMENTAL:
+        print_flush("Incremental import: no earlier import of this project found, fetching everything")
+    print_flush("=" * 80)
+
+    # Fetches that failed; watermarks are only advanced by a clean import
+    failed_fetches = ProgressCounter()
+
+    # 1. PROJECTS - Only import the selected project
+    print_flush("\n[1/15] Fetching Selected Project...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS projects (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name TEXT,
+        announcement TEXT,
+        show_announcement TEXT,
+        is_completed TEXT,
+        suite_mode TEXT,
+        default_role_id TEXT,
+        case_statuses_enabled TEXT,
+        url TEXT,
+        users TEXT, 
+        groups TEXT
+    )''')
+
+    project = client.send_get(f'get_project/{SELECTED_PROJECT_ID}')
+    writer.execute('INSERT OR REPLACE INTO projects (id, name, announcement, show_announcement, is_completed, suite_mode, default_role_id, case_statuses_enabled, url, users, groups) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                   (
+                       project['id'], 
+                       project['name'], 
+                       project['announcement'], 
+                       project['show_announcement'], 
+                       project['is_completed'], 
+                       project['suite_mode'], 
+                       project['default_role_id'], 
+                       project['case_statuses_enabled'], 
+                       project['url'],
+                       str(project['users']),
+                       str(project['groups'])
+                    ))
+    writer.commit()
+    print(f"✓ Stored project: {project['name']}")
+
+    # 2. USERS
+    print("\n[2/15] Fetching Users...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name TEXT,
+        email TEXT,
+        is_active INTEGER,
+        role_id INTEGER,
+        role TEXT
+    )''')
+    users = client.send_get('get_users')['users']
+    for user in users:
+        writer.execute('INSERT OR REPLACE INTO users (id, name, email, is_active, role_id, role) VALUES (?, ?, ?, ?, ?, ?)',
+                       (user['id'], user['name'], user['email'], user['is_active'], user.get('role_id'), user.get('role')))
+    writer.commit()
+    print(f"✓ Stored {len(users)} users")
+
+    # 3. CASE TYPES
+    print("\n[3/15] Fetching Case Types...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS case_types (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name TEXT,
+        is_default INTEGER
+    )''')
+    case_types = client.send_get('get_case_types')
+    for case_type in case_types:
+        writer.execute('INSERT OR REPLACE INTO case_types (id, name, is_default) VALUES (?, ?, ?)',
+                       (case_type['id'], case_type['name'], case_type['is_default']))
+    writer.commit()
+    print(f"✓ Stored {len(case_types)} case types")
+
+    # 4. CASE FIELDS
+    print("\n[4/15] Fetching Case Fields...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS case_fields (
+        id INTEGER NOT NULL PRIMARY KEY,
+        type_id INTEGER,
+        name TEXT,
+        system_name TEXT,
+        label TEXT,
+        description TEXT,
+        is_active INTEGER,
+        configs TEXT
+    )''')
+    case_fields = client.send_get('get_case_fields')
+    for field in case_fields:
+        writer.execute('INSERT OR REPLACE INTO case_fields (id, type_id, name, system_name, label, description, is_active, configs) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                       (field['id'], field['type_id'], field['name'], field['system_name'], field['label'], 
+                        field.get('description'), field['is_active'], str(field.get('configs'))))
+    writer.commit()
+    print(f"✓ Stored {len(case_fields)} case fields")
+
+    # 5. PRIORITIES
+    print("\n[5/15] Fetching Priorities...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS priorities (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name TEXT,
+        short_name TEXT,
+        is_default INTEGER,
+        priority INTEGER
+    )''')
+    priorities = client.send_get('get_priorities')
+    for priority in priorities:
+        writer.execute('INSERT OR REPLACE INTO priorities (id, name, short_name, is_default, priority) VALUES (?, ?, ?, ?, ?)',
+                       (priority['id'], priority['name'], priority['short_name'], priority['is_default'], priority['priority']))
+    writer.commit()
+    print(f"✓ Stored {len(priorities)} priorities")
+
+    # 6. RESULT FIELDS
+    print("\n[6/15] Fetching Result Fields...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS result_fields (
+        id INTEGER NOT NULL PRIMARY KEY,
+        type_id INTEGER,
+        name TEXT,
+        system_name TEXT,
+        label TEXT,
+        description TEXT,
+        is_active INTEGER,
+        configs TEXT
+    )''')
+    result_fields = client.send_get('get_result_fields')
+    for field in result_fields:
+        writer.execute('INSERT OR REPLACE INTO result_fields (id, type_id, name, system_name, label, description, is_active, configs) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                       (field['id'], field['type_id'], field['name'], field['system_name'], field['label'], 
+                        field.get('description'), field['is_active'], str(field.get('configs'))))
+    writer.commit()
+    print(f"✓ Stored {len(result_fields)} result fields")
+
+    # 7. STATUSES
+    print("\n[7/15] Fetching Statuses...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS statuses (
+        id INTEGER NOT NULL PRIMARY KEY,
+        name TEXT,
+        label TEXT,
+        color_dark INTEGER,
+        color_medium INTEGER,
+        color_bright INTEGER,
+        is_system INTEGER,
+        is_untested INTEGER,
+        is_final INTEGER
+    )''')
+    statuses = client.send_get('get_statuses')
+    for status in statuses:
+        writer.execute('INSERT OR REPLACE INTO statuses (id, name, label, color_dark, color_medium, color_bright, is_system, is_untested, is_final) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                       (status['id'], status['name'], status['label'], status['color_dark'], status['color_medium'], 
+                        status['color_bright'], status['is_system'], status['is_untested'], status['is_final']))
+    writer.commit()
+    print(f"✓ Stored {len(statuses)} statuses")
+
+    # 8. TEMPLATES
+    print("\n[8/15] Fetching Templates...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS templates (
+        id INTEGER NOT NULL PRIMARY KEY,
+        project_id INTEGER,
+        name TEXT,
+        is_default INTEGER
+    )''')
+    try:
+        templates = client.send_get(f'get_templates/{SELECTED_PROJECT_ID}')
+        for template in templates:
+            writer.execute('INSERT OR REPLACE INTO templates (id, project_id, name, is_default) VALUES (?, ?, ?, ?)',
+                           (template['id'], SELECTED_PROJECT_ID, template['name'], template['is_default']))
+        writer.commit()
+        print(f"✓ Stored {len(templates)} templates")
+    except Exception as e:
+        print(f"  Warning: Could not fetch templates for project {SELECTED_PROJECT_ID}: {e}")
+        print(f"✓ Stored templates")
+
+    # 9. SUITES
+    print("\n[9/15] Fetching Suites...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS suites (
+        id INTEGER NOT NULL PRIMARY KEY,
+        project_id INTEGER,
+        name TEXT,
+        description TEXT,
+        url TEXT,
+        is_master INTEGER,
+        is_baseline INTEGER,
+        is_completed INTEGER,
+        completed_on INTEGER
+    )''')
+    suite_count = 0
+    # Suites and runs are fetched once here and reused by every later stage;
+    # the case and test IDs collected while streaming feed the attachment stage.
+    suites = []
+    try:
+        suites_response = client.send_get(f'get_suites/{SELECTED_PROJECT_ID}')
+        suites = suites_response if isinstance(suites_response, list) else suites_response.get('suites', [])
+        for suite in suites:
+            writer.execute('INSERT OR REPLACE INTO suites (id, project_id, name, description, url, is_master, is_baseline, is_completed, completed_on) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (suite['id'], suite['project_id'], suite['name'], suite.get('description'), suite['url'], 
+                            suite['is_master'], suite['is_baseline'], suite['is_completed'], suite.get('completed_on')))
+            suite_count += 1
+        writer.commit()
+    except Exception as e:
+        print(f"  Warning: Could not fetch suites for project {SELECTED_PROJECT_ID}: {e}")
+    print(f"✓ Stored {suite_count} suites")
+
+    # 10. SECTIONS
+    print("\n[10/15] Fetching Sections...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS sections (
+        id INTEGER NOT NULL PRIMARY KEY,
+        suite_id INTEGER,
+        name TEXT,
+        description TEXT,
+        parent_id INTEGER,
+        display_order INTEGER,
+        depth INTEGER
+    )''')
+    def import_sections(suite):
+        count = 0
         try:
-            sections = client.send_get(f'get_sections/{SELECTED_PROJECT_ID}&suite_id={suite["id"]}')['sections']
-            for section in sections:
-                cursor.execute('INSERT OR REPLACE INTO sections (id, suite_id, name, description, parent_id, display_order, depth) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            for section in client.iter_sections(SELECTED_PROJECT_ID, suite_id=suite['id']):
+                writer.execute('INSERT OR REPLACE INTO sections (id, suite_id, name, description, parent_id, display_order, depth) VALUES (?, ?, ?, ?, ?, ?, ?)',
                                (section['id'], section['suite_id'], section['name'], section.get('description'), 
                                 section.get('parent_id'), section['display_order'], section['depth']))
-                section_count += 1
-            db.commit()
+                count += 1
+            writer.commit()
         except Exception as e:
-            print(f"  Warning: Could not fetch sections for suite {suite['id']}: {e}")
-except:
-    pass
-print(f"✓ Stored {section_count} sections")
-
-# 11. MILESTONES
-print("\n[11/15] Fetching Milestones...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS milestones (
-    id INTEGER NOT NULL PRIMARY KEY,
-    project_id INTEGER,
-    name TEXT,
-    description TEXT,
-    start_on INTEGER,
-    started_on INTEGER,
-    is_started INTEGER,
-    due_on INTEGER,
-    is_completed INTEGER,
-    completed_on INTEGER,
-    parent_id INTEGER,
-    url TEXT
-)''')
-milestone_count = 0
-try:
-    milestones = client.send_get(f'get_milestones/{SELECTED_PROJECT_ID}')['milestones']
-    for milestone in milestones:
-        cursor.execute('INSERT OR REPLACE INTO milestones (id, project_id, name, description, start_on, started_on, is_started, due_on, is_completed, completed_on, parent_id, url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                       (milestone['id'], milestone['project_id'], milestone['name'], milestone.get('description'), 
-                        milestone.get('start_on'), milestone.get('started_on'), milestone['is_started'], 
-                        milestone.get('due_on'), milestone['is_completed'], milestone.get('completed_on'), 
-                        milestone.get('parent_id'), milestone['url']))
-        milestone_count += 1
-    db.commit()
-except Exception as e:
-    print(f"  Warning: Could not fetch milestones for project {SELECTED_PROJECT_ID}: {e}")
-print(f"✓ Stored {milestone_count} milestones")
-
-# 12. CASES (Test Cases)
-print("\n[12/15] Fetching Cases...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS cases (
-    id INTEGER NOT NULL PRIMARY KEY,
-    title TEXT,
-    section_id INTEGER,
-    template_id INTEGER,
-    type_id INTEGER,
-    priority_id INTEGER,
-    milestone_id INTEGER,
-    refs TEXT,
-    created_by INTEGER,
-    created_on INTEGER,
-    updated_by INTEGER,
-    updated_on INTEGER,
-    estimate TEXT,
-    estimate_forecast TEXT,
-    suite_id INTEGER,
-    custom_fields TEXT
-)''')
-case_count = 0
-try:
-    suites = client.send_get(f'get_suites/{SELECTED_PROJECT_ID}')['suites']
-    for suite in suites:
+            print_flush(f"  Warning: Could not fetch sections for suite {suite['id']}: {e}")
+        return count
+
+    section_count = sum(pool.map(import_sections, suites))
+    print(f"✓ Stored {section_count} sections")
+
+    # 11. MILESTONES
+    print("\n[11/15] Fetching Milestones...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS milestones (
+        id INTEGER NOT NULL PRIMARY KEY,
+        project_id INTEGER,
+        name TEXT,
+        description TEXT,
+        start_on INTEGER,
+        started_on INTEGER,
+        is_started INTEGER,
+        due_on INTEGER,
+        is_completed INTEGER,
+        completed_on INTEGER,
+        parent_id INTEGER,
+        url TEXT
+    )''')
+    milestone_count = 0
+    try:
+        for milestone in client.iter_milestones(SELECTED_PROJECT_ID):
+            writer.execute('INSERT OR REPLACE INTO milestones (id, project_id, name, description, start_on, started_on, is_started, due_on, is_completed, completed_on, parent_id, url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (milestone['id'], milestone['project_id'], milestone['name'], milestone.get('description'), 
+                            milestone.get('start_on'), milestone.get('started_on'), milestone['is_started'], 
+                            milestone.get('due_on'), milestone['is_completed'], milestone.get('completed_on'), 
+                            milestone.get('parent_id'), milestone['url']))
+            milestone_count += 1
+        writer.commit()
+    except Exception as e:
+        print(f"  Warning: Could not fetch milestones for project {SELECTED_PROJECT_ID}: {e}")
+    print(f"✓ Stored {milestone_count} milestones")
+
+    # 12. CASES (Test Cases)
+    print("\n[12/15] Fetching Cases...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS cases (
+        id INTEGER NOT NULL PRIMARY KEY,
+        title TEXT,
+        section_id INTEGER,
+        template_id INTEGER,
+        type_id INTEGER,
+        priority_id INTEGER,
+        milestone_id INTEGER,
+        refs TEXT,
+        created_by INTEGER,
+        created_on INTEGER,
+        updated_by INTEGER,
+        updated_on INTEGER,
+        estimate TEXT,
+        estimate_forecast TEXT,
+        suite_id INTEGER,
+        custom_fields TEXT
+    )''')
+    def import_cases(suite):
+        suite_case_ids = []
         try:
-            cases = client.send_get(f'get_cases/{SELECTED_PROJECT_ID}&suite_id={suite["id"]}')['cases']
-            for case in cases:
+            for case in client.iter_cases(SELECTED_PROJECT_ID, suite_id=suite['id'],
+                                          updated_after=changed_since('cases')):
                 # Extract custom fields
                 custom_fields = {k: v for k, v in case.items() if k.startswith('custom_')}
-                cursor.execute('INSERT OR REPLACE INTO cases (id, title, section_id, template_id, type_id, priority_id, milestone_id, refs, created_by, created_on, updated_by, updated_on, estimate, estimate_forecast, suite_id, custom_fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                writer.execute('INSERT OR REPLACE INTO cases (id, title, section_id, template_id, type_id, priority_id, milestone_id, refs, created_by, created_on, updated_by, updated_on, estimate, estimate_forecast, suite_id, custom_fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
                                (case['id'], case['title'], case['section_id'], case['template_id'], 
                                 case['type_id'], case['priority_id'], case.get('milestone_id'), case.get('refs'), 
                                 case['created_by'], case['created_on'], case['updated_by'], case['updated_on'], 
                                 case.get('estimate'), case.get('estimate_forecast'), case['suite_id'], 
                                 str(custom_fields)))
-                case_count += 1
-            db.commit()
+                suite_case_ids.append(case['id'])
+            writer.commit()
         except Exception as e:
-            print(f"  Warning: Could not fetch cases for suite {suite['id']}: {e}")
-except:
-    pass
-print(f"✓ Stored {case_count} cases")
-
-# 13. PLANS
-print("\n[13/15] Fetching Plans...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS plans (
-    id INTEGER NOT NULL PRIMARY KEY,
-    project_id INTEGER,
-    name TEXT,
-    description TEXT,
-    milestone_id INTEGER,
-    assignedto_id INTEGER,
-    is_completed INTEGER,
-    completed_on INTEGER,
-    created_by INTEGER,
-    created_on INTEGER,
-    url TEXT,
-    entries TEXT
-)''')
-plan_count = 0
-try:
-    plans = client.send_get(f'get_plans/{SELECTED_PROJECT_ID}')['plans']
-    for plan in plans:
-        plan_details = client.send_get(f'get_plan/{plan["id"]}')
-        cursor.execute('INSERT OR REPLACE INTO plans (id, project_id, name, description, milestone_id, assignedto_id, is_completed, completed_on, created_by, created_on, url, entries) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                       (plan_details['id'], plan_details['project_id'], plan_details['name'], 
-                        plan_details.get('description'), plan_details.get('milestone_id'), 
-                        plan_details.get('assignedto_id'), plan_details['is_completed'], 
-                        plan_details.get('completed_on'), plan_details['created_by'], 
-                        plan_details['created_on'], plan_details['url'], str(plan_details.get('entries'))))
-        plan_count += 1
-    db.commit()
-except Exception as e:
-    print(f"  Warning: Could not fetch plans for project {SELECTED_PROJECT_ID}: {e}")
-print(f"✓ Stored {plan_count} plans")
-
-# 14. RUNS
-print("\n[14/15] Fetching Runs...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS runs (
-    id INTEGER NOT NULL PRIMARY KEY,
-    suite_id INTEGER,
-    project_id INTEGER,
-    plan_id INTEGER,
-    name TEXT,
-    description TEXT,
-    milestone_id INTEGER,
-    assignedto_id INTEGER,
-    include_all INTEGER,
-    is_completed INTEGER,
-    completed_on INTEGER,
-    config TEXT,
-    config_ids TEXT,
-    passed_count INTEGER,
-    blocked_count INTEGER,
-    untested_count INTEGER,
-    retest_count INTEGER,
-    failed_count INTEGER,
-    custom_status1_count INTEGER,
-    custom_status2_count INTEGER,
-    custom_status3_count INTEGER,
-    custom_status4_count INTEGER,
-    custom_status5_count INTEGER,
-    custom_status6_count INTEGER,
-    custom_status7_count INTEGER,
-    created_by INTEGER,
-    created_on INTEGER,
-    url TEXT
-)''')
-run_count = 0
-try:
-    runs = client.send_get(f'get_runs/{SELECTED_PROJECT_ID}')['runs']
-    for run in runs:
-        cursor.execute('INSERT OR REPLACE INTO runs (id, suite_id, project_id, plan_id, name, description, milestone_id, assignedto_id, include_all, is_completed, completed_on, config, config_ids, passed_count, blocked_count, untested_count, retest_count, failed_count, custom_status1_count, custom_status2_count, custom_status3_count, custom_status4_count, custom_status5_count, custom_status6_count, custom_status7_count, created_by, created_on, url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                       (run['id'], run.get('suite_id'), run['project_id'], run.get('plan_id'), run['name'], 
-                        run.get('description'), run.get('milestone_id'), run.get('assignedto_id'), 
-                        run['include_all'], run['is_completed'], run.get('completed_on'), run.get('config'), 
-                        str(run.get('config_ids')), run['passed_count'], run['blocked_count'], 
-                        run['untested_count'], run['retest_count'], run['failed_count'], 
-                        run.get('custom_status1_count'), run.get('custom_status2_count'), 
-                        run.get('custom_status3_count'), run.get('custom_status4_count'), 
-                        run.get('custom_status5_count'), run.get('custom_status6_count'), 
-                        run.get('custom_status7_count'), run['created_by'], run['created_on'], run['url']))
-        run_count += 1
-    db.commit()
-except Exception as e:
-    print(f"  Warning: Could not fetch runs for project {SELECTED_PROJECT_ID}: {e}")
-print(f"✓ Stored {run_count} runs")
-
-# 15. TESTS
-print("\n[15/15] Fetching Tests...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS tests (
-    id INTEGER NOT NULL PRIMARY KEY,
-    case_id INTEGER,
-    run_id INTEGER,
-    status_id INTEGER,
-    assignedto_id INTEGER,
-    priority_id INTEGER,
-    type_id INTEGER,
-    milestone_id INTEGER,
-    refs TEXT,
-    title TEXT,
-    template_id INTEGER,
-    estimate TEXT,
-    estimate_forecast TEXT,
-    custom_fields TEXT
-)''')
-test_count = 0
-try:
-    runs = client.send_get(f'get_runs/{SELECTED_PROJECT_ID}')['runs']
-    for run in runs:
+            failed_fetches.increment()
+            print_flush(f"  Warning: Could not fetch cases for suite {suite['id']}: {e}")
+        return suite_case_ids
+
+    case_ids = [case_id for suite_case_ids in pool.map(import_cases, suites) for case_id in suite_case_ids]
+    case_count = len(case_ids)
+    print(f"✓ Stored {case_count} cases")
+
+    # 13. PLANS
+    print("\n[13/15] Fetching Plans...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS plans (
+        id INTEGER NOT NULL PRIMARY KEY,
+        project_id INTEGER,
+        name TEXT,
+        description TEXT,
+        milestone_id INTEGER,
+        assignedto_id INTEGER,
+        is_completed INTEGER,
+        completed_on INTEGER,
+        created_by INTEGER,
+        created_on INTEGER,
+        url TEXT,
+        entries TEXT
+    )''')
+    plan_count = 0
+    try:
+        for plan in client.iter_plans(SELECTED_PROJECT_ID):
+            plan_details = client.send_get(f'get_plan/{plan["id"]}')
+            writer.execute('INSERT OR REPLACE INTO plans (id, project_id, name, description, milestone_id, assignedto_id, is_completed, completed_on, created_by, created_on, url, entries) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (plan_details['id'], plan_details['project_id'], plan_details['name'], 
+                            plan_details.get('description'), plan_details.get('milestone_id'), 
+                            plan_details.get('assignedto_id'), plan_details['is_completed'], 
+                            plan_details.get('completed_on'), plan_details['created_by'], 
+                            plan_details['created_on'], plan_details['url'], str(plan_details.get('entries'))))
+            plan_count += 1
+        writer.commit()
+    except Exception as e:
+        print(f"  Warning: Could not fetch plans for project {SELECTED_PROJECT_ID}: {e}")
+    print(f"✓ Stored {plan_count} plans")
+
+    # 14. RUNS
+    print("\n[14/15] Fetching Runs...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS runs (
+        id INTEGER NOT NULL PRIMARY KEY,
+        suite_id INTEGER,
+        project_id INTEGER,
+        plan_id INTEGER,
+        name TEXT,
+        description TEXT,
+        milestone_id INTEGER,
+        assignedto_id INTEGER,
+        include_all INTEGER,
+        is_completed INTEGER,
+        completed_on INTEGER,
+        config TEXT,
+        config_ids TEXT,
+        passed_count INTEGER,
+        blocked_count INTEGER,
+        untested_count INTEGER,
+        retest_count INTEGER,
+        failed_count INTEGER,
+        custom_status1_count INTEGER,
+        custom_status2_count INTEGER,
+        custom_status3_count INTEGER,
+        custom_status4_count INTEGER,
+        custom_status5_count INTEGER,
+        custom_status6_count INTEGER,
+        custom_status7_count INTEGER,
+        created_by INTEGER,
+        created_on INTEGER,
+        url TEXT
+    )''')
+    def list_runs():
+        """Return the runs to import
+    
+        An incremental import asks only for the runs that can have changed: runs
+        that are still active, runs created since the last import, and runs that
+        were active or left stale last time (fetched one by one). Closed runs
+        cannot be reopened, so every other run is left out.
+        """
+        if changed_since('runs') is None:
+            return list(client.iter_runs(SELECTED_PROJECT_ID))
+    
+        listed = {run['id']: run for run in client.iter_runs(SELECTED_PROJECT_ID, is_completed=0)}
+        for run in client.iter_runs(SELECTED_PROJECT_ID, created_after=changed_since('runs')):
+            listed.setdefault(run['id'], run)
+        active_run_ids = {run_id for (run_id,) in writer.query(
+            'SELECT id FROM runs WHERE project_id = ? AND (is_completed = 0 OR is_completed IS NULL)',
+            (SELECTED_PROJECT_ID,))}
+        for run_id in sorted(active_run_ids | stale_run_ids):
+            if run_id not in listed:
+                listed[run_id] = client.send_get(f'get_run/{run_id}')
+        return list(listed.values())
+
+    # State of every run at the last import, to skip runs that did not change
+    stored_runs = {}
+    if INCREMENTAL:
+        for row in writer.query(f'SELECT id, {", ".join(RUN_STATE_COLUMNS)} FROM runs WHERE project_id = ?',
+                                (SELECTED_PROJECT_ID,)):
+            stored_runs[row[0]] = tuple(row[1:])
+
+    run_count = 0
+    unchanged_run_count = 0
+    try:
+        for run in list_runs():
+            if run['id'] not in stale_run_ids and stored_runs.get(run['id']) == run_state(run):
+                unchanged_run_count += 1
+                continue
+            writer.execute('INSERT OR REPLACE INTO sync_stale_runs (project_id, run_id) VALUES (?, ?)',
+                           (SELECTED_PROJECT_ID, run['id']))
+            writer.execute('INSERT OR REPLACE INTO runs (id, suite_id, project_id, plan_id, name, description, milestone_id, assignedto_id, include_all, is_completed, completed_on, config, config_ids, passed_count, blocked_count, untested_count, retest_count, failed_count, custom_status1_count, custom_status2_count, custom_status3_count, custom_status4_count, custom_status5_count, custom_status6_count, custom_status7_count, created_by, created_on, url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                           (run['id'], run.get('suite_id'), run['project_id'], run.get('plan_id'), run['name'], 
+                            run.get('description'), run.get('milestone_id'), run.get('assignedto_id'), 
+                            run['include_all'], run['is_completed'], run.get('completed_on'), run.get('config'), 
+                            str(run.get('config_ids')), run['passed_count'], run['blocked_count'], 
+                            run['untested_count'], run['retest_count'], run['failed_count'], 
+                            run.get('custom_status1_count'), run.get('custom_status2_count'), 
+                            run.get('custom_status3_count'), run.get('custom_status4_count'), 
+                            run.get('custom_status5_count'), run.get('custom_status6_count'), 
+                            run.get('custom_status7_count'), run['created_by'], run['created_on'], run['url']))
+            runs.append(run)
+            run_count += 1
+        writer.commit()
+    except Exception as e:
+        failed_fetches.increment()
+        print(f"  Warning: Could not fetch runs for project {SELECTED_PROJECT_ID}: {e}")
+    print(f"✓ Stored {run_count} runs")
+    if unchanged_run_count:
+        print(f"  ↻ Skipped {unchanged_run_count} unchanged run(s)")
+
+    # Runs that stay in sync_stale_runs after this import
+    failed_run_ids = set()
+
+    def mark_run_incomplete(run):
+        """Keep a run stale so the next incremental import fetches it again"""
+        failed_fetches.increment()
+        failed_run_ids.add(run['id'])
+
+    # 15. TESTS
+    print("\n[15/15] Fetching Tests...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS tests (
+        id INTEGER NOT NULL PRIMARY KEY,
+        case_id INTEGER,
+        run_id INTEGER,
+        status_id INTEGER,
+        assignedto_id INTEGER,
+        priority_id INTEGER,
+        type_id INTEGER,
+        milestone_id INTEGER,
+        refs TEXT,
+        title TEXT,
+        template_id INTEGER,
+        estimate TEXT,
+        estimate_forecast TEXT,
+        custom_fields TEXT
+    )''')
+    def import_tests(run):
+        test_ids = []
         try:
-            tests = client.send_get(f'get_tests/{run["id"]}')['tests']
-            for test in tests:
+            for test in client.iter_tests(run['id']):
                 custom_fields = {k: v for k, v in test.items() if k.startswith('custom_')}
-                cursor.execute('INSERT OR REPLACE INTO tests (id, case_id, run_id, status_id, assignedto_id, priority_id, type_id, milestone_id, refs, title, template_id, estimate, estimate_forecast, custom_fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                writer.execute('INSERT OR REPLACE INTO tests (id, case_id, run_id, status_id, assignedto_id, priority_id, type_id, milestone_id, refs, title, template_id, estimate, estimate_forecast, custom_fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
                                (test['id'], test['case_id'], test['run_id'], test['status_id'], 
                                 test.get('assignedto_id'), test['priority_id'], test['type_id'], 
                                 test.get('milestone_id'), test.get('refs'), test['title'], 
                                 test['template_id'], test.get('estimate'), test.get('estimate_forecast'), 
                                 str(custom_fields)))    
-                test_count += 1
-            db.commit()
+                test_ids.append(test['id'])
+            writer.commit()
         except Exception as e:
-            print(f"  Warning: Could not fetch tests for run {run['id']}: {e}")
-except:
-    pass
-print(f"✓ Stored {test_count} tests")
-
-
-print("\nFetching Results (this may take a while)...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS results (
-    id INTEGER NOT NULL PRIMARY KEY,
-    test_id INTEGER,
-    status_id INTEGER,
-    created_by INTEGER,
-    created_on INTEGER,
-    assignedto_id INTEGER,
-    comment TEXT,
-    version TEXT,
-    elapsed TEXT,
-    defects TEXT,
-    custom_fields TEXT
-)''')
-result_count = 0
-try:
-    runs = client.send_get(f'get_runs/{SELECTED_PROJECT_ID}')['runs']
-    for run in runs:
+            mark_run_incomplete(run)
+            print_flush(f"  Warning: Could not fetch tests for run {run['id']}: {e}")
+        return test_ids
+
+    run_test_ids = dict(zip([run['id'] for run in runs], pool.map(import_tests, runs)))
+    test_count = sum(len(test_ids) for test_ids in run_test_ids.values())
+    print(f"✓ Stored {test_count} tests")
+
+
+    print("\nFetching Results (this may take a while)...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS results (
+        id INTEGER NOT NULL PRIMARY KEY,
+        test_id INTEGER,
+        status_id INTEGER,
+        created_by INTEGER,
+        created_on INTEGER,
+        assignedto_id INTEGER,
+        comment TEXT,
+        version TEXT,
+        elapsed TEXT,
+        defects TEXT,
+        custom_fields TEXT
+    )''')
+    # Results are pulled in bulk per run (one call per page of results) instead
+    # of one get_results call per test. testrail_results_created_after (unix
+    # timestamp) limits the import to results newer than that point, as does the
+    # watermark of an incremental import.
+    results_created_after = max(filter(None, [config.get('testrail_results_created_after'),
+                                              changed_since('results')]), default=None)
+
+    def import_results(run):
+        count = 0
         try:
-            tests = client.send_get(f'get_tests/{run["id"]}')['tests']
-            for test in tests:
-                try:
-                    results = client.send_get(f'get_results/{test["id"]}')['results']
-                    for result in results:
-                        custom_fields = {k: v for k, v in result.items() if k.startswith('custom_')}
-                        cursor.execute('INSERT OR REPLACE INTO results (id, test_id, status_id, created_by, created_on, assignedto_id, comment, version, elapsed, defects, custom_fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                                       (result['id'], result['test_id'], result['status_id'], 
-                                        result['created_by'], result['created_on'], result.get('assignedto_id'), 
-                                        result.get('comment'), result.get('version'), result.get('elapsed'), 
-                                        result.get('defects'), str(custom_fields)))
-                        result_count += 1
-                    db.commit()
-                except Exception as e:
-                    pass  # Skip individual test results that fail
-        except:
-            pass
-except:
-    pass
-print(f"✓ Stored {result_count} results")
-
-# 15. ATTACHMENTS
-print("\n[15/15] Fetching Attachments...")
-cursor.execute('''CREATE TABLE IF NOT EXISTS attachments (
-    id INTEGER NOT NULL PRIMARY KEY,
-    entity_type TEXT,
-    entity_id INTEGER,
-    filename TEXT,
-    size INTEGER,
-    created_on INTEGER,
-    user_id INTEGER,
-    url TEXT,
-    local_path TEXT,
-    UNIQUE(id, entity_type, entity_id)
-)''')
-
-# Create attachments directory
-attachments_dir = 'attachments'
-os.makedirs(attachments_dir, exist_ok=True)
-
-attachment_count = 0
-
-# Get attachments for test cases
-print("  Fetching case attachments...")
-try:
-    suites_response = client.send_get(f'get_suites/{SELECTED_PROJECT_ID}')
-    if suites_response:
-        suites = suites_response if isinstance(suites_response, list) else suites_response.get('suites', [])
-        
-        for suite in suites:
+            for result in client.iter_results_for_run(run['id'], created_after=results_created_after):
+                custom_fields = {k: v for k, v in result.items() if k.startswith('custom_')}
+                writer.execute('INSERT OR REPLACE INTO results (id, test_id, status_id, created_by, created_on, assignedto_id, comment, version, elapsed, defects, custom_fields) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               (result['id'], result['test_id'], result['status_id'], 
+                                result['created_by'], result['created_on'], result.get('assignedto_id'), 
+                                result.get('comment'), result.get('version'), result.get('elapsed'), 
+                                result.get('defects'), str(custom_fields)))
+                count += 1
+            writer.commit()
+        except Exception as e:
+            mark_run_incomplete(run)
+            print_flush(f"  Warning: Could not fetch results for run {run['id']}: {e}")
+        return count
+
+    result_count = sum(pool.map(import_results, runs))
+    print(f"✓ Stored {result_count} results")
+
+    # 15. ATTACHMENTS
+    print("\n[15/15] Fetching Attachments...")
+    writer.execute('''CREATE TABLE IF NOT EXISTS attachments (
+        id INTEGER NOT NULL PRIMARY KEY,
+        entity_type TEXT,
+        entity_id INTEGER,
+        filename TEXT,
+        size INTEGER,
+        created_on INTEGER,
+        user_id INTEGER,
+        url TEXT,
+        local_path TEXT,
+        jira_attachment_id TEXT,
+        content_hash TEXT,
+        UNIQUE(id, entity_type, entity_id)
+    )''')
+
+    # Databases imported before content-addressed storage lack content_hash
+    if 'content_hash' not in [row[1] for row in writer.query('PRAGMA table_info(attachments)')]:
+        writer.execute('ALTER TABLE attachments ADD COLUMN content_hash TEXT')
+
+    # Files are stored once per content under attachments/<sha256 shards>/
+    attachments_dir = 'attachments'
+    store = AttachmentStore(attachments_dir)
+
+    downloaded = ProgressCounter()
+
+    def fetch_attachment(attachment):
+        """Return (local_path, content_hash, size) of an attachment
+    
+        The download is skipped when an earlier import already stored the same
+        TestRail attachment; otherwise it is streamed into the store, which keeps
+        a single copy of identical files. A download that breaks off is retried
+        from where it stopped, and the result must match the attachment's size.
+        """
+        known = writer.query('SELECT local_path, content_hash FROM attachments WHERE id = ? AND content_hash IS NOT NULL',
+                             (attachment['id'],))
+        for local_path, content_hash in known:
+            if os.path.exists(local_path):
+                return local_path, content_hash, os.path.getsize(local_path)
+    
+        for attempt in range(DOWNLOAD_RETRIES + 1):
             try:
-                cases_response = client.send_get(f'get_cases/{SELECTED_PROJECT_ID}&suite_id={suite["id"]}')
-                if not cases_response:
+                content_hash, local_path, size = store.download(
+                    attachment['id'],
+                    lambda offset: client.open_attachment(attachment['id'], offset),
+                    attachment.get('size')
+                )
+                break
+            except (OSError, APIError) as e:
+                if attempt == DOWNLOAD_RETRIES:
+                    raise
+                print_flush(f"    Warning: Download of {attachment['filename']} failed ({e}), retrying...")
+    
+        if size == 0:
+            raise APIError(f"TestRail returned an empty file for attachment {attachment['id']}")
+        return local_path, content_hash, size
+
+    def store_attachment(attachment, entity_type, entity_id):
+        """Download an attachment and record it for its case or result; returns 1 or 0"""
+        try:
+            local_filename, content_hash, size = fetch_attachment(attachment)
+        except Exception as e:
+            print_flush(f"    ❌ Error downloading attachment {attachment['id']} ({attachment['filename']}): {e}")
+            return 0
+    
+        attachment_url = f"{config['testrail_url']}index.php?/attachments/get/{attachment['id']}"
+        writer.execute(
+            'INSERT OR REPLACE INTO attachments (id, entity_type, entity_id, filename, size, created_on, user_id, url, local_path, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (attachment['id'], entity_type, entity_id, attachment['filename'], 
+             attachment.get('size'), attachment.get('created_on'), 
+             attachment.get('user_id'), attachment_url, local_filename, content_hash)
+        )
+    
+        if downloaded.increment() % 10 == 0:
+            print_flush(f"    Downloaded {downloaded.value} attachments...")
+            writer.commit()
+        return 1
+
+    # Get attachments for test cases
+    print("  Fetching case attachments...")
+
+    def import_case_attachments(case_id):
+        """List a case's attachments and queue their downloads; returns the futures"""
+        downloads = []
+        try:
+            for attachment in client.iter_attachments_for_case(case_id):
+                # Check if already exists to avoid duplicates
+                if writer.query('SELECT id FROM attachments WHERE id = ? AND entity_type = ? AND entity_id = ?',
+                                (attachment['id'], 'case', case_id)):
+                    print_flush(f"    Skipping duplicate: {attachment['filename']}")
                     continue
-                cases = cases_response if isinstance(cases_response, list) else cases_response.get('cases', [])
-                
-                for case in cases:
-                    try:
-                        attachments = client.send_get(f'get_attachments_for_case/{case["id"]}')
-                        if attachments and 'attachments' in attachments:
-                            for attachment in attachments['attachments']:
-                                # Download attachment
-                                attachment_url = f"{config['testrail_url']}index.php?/attachments/get/{attachment['id']}"
-                                local_filename = f"{attachments_dir}/case_{case['id']}_{attachment['filename']}"
-                                
-                                try:
-                                    # Check if already exists to avoid duplicates
-                                    cursor.execute('SELECT id FROM attachments WHERE id = ? AND entity_type = ? AND entity_id = ?',
-                                                   (attachment['id'], 'case', case['id']))
-                                    if cursor.fetchone():
-                                        print(f"    Skipping duplicate: {attachment['filename']}")
-                                        continue
-                                    
-                                    # Download file using TestRail API
-                                    # The get_attachment endpoint takes a filepath and saves directly to it
-                                    # It returns the filepath on success or error message on failure
-                                    result = client.send_get(f"get_attachment/{attachment['id']}", local_filename)
-                                    
-                                    # Verify file was written successfully
-                                    if result == local_filename and os.path.exists(local_filename) and os.path.getsize(local_filename) > 0:
-                                        # Store in database
-                                        cursor.execute(
-                                            'INSERT OR REPLACE INTO attachments (id, entity_type, entity_id, filename, size, created_on, user_id, url, local_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                                            (attachment['id'], 'case', case['id'], attachment['filename'], 
-                                             attachment.get('size'), attachment.get('created_on'), 
-                                             attachment.get('user_id'), attachment_url, local_filename)
-                                        )
-                                        attachment_count += 1
-                                        
-                                        if attachment_count % 10 == 0:
-                                            print(f"    Downloaded {attachment_count} attachments...")
-                                            db.commit()
-                                    else:
-                                        print(f"    Warning: Failed to download file: {attachment['filename']} - {result}")
-                                        
-                                except Exception as e:
-                                    print(f"    Warning: Could not download attachment {attachment['id']}: {e}")
-                                    traceback.print_exc()
-                                    
-                    except:
-                        pass
-            except:
-                pass
-except Exception as e:
-    print(f"  Warning: Could not fetch case attachments: {e}")
-
-# Get attachments for test results
-print("  Fetching result attachments...")
-result_attachment_count = 0
-try:
-    runs = client.send_get(f'get_runs/{SELECTED_PROJECT_ID}')['runs']
-    print(f"  Checking {len(runs)} runs for result attachments...")
-    for run_idx, run in enumerate(runs, 1):
+            
+                # Download attachment
+                downloads.append(download_pool.submit(store_attachment, attachment, 'case', case_id))
+        except Exception as e:
+            print_flush(f"    Warning: Could not fetch attachments for case {case_id}: {e}")
+        return downloads
+
+    case_downloads = [download for downloads in pool.map(import_case_attachments, case_ids) for download in downloads]
+    case_attachment_count = sum(download.result() for download in case_downloads)
+
+    # Get attachments for test results
+    print("  Fetching result attachments...")
+
+    def import_result_attachments(test_id):
+        """List a test's result attachments once and queue their downloads; returns the futures
+    
+        Every attachment is stored under the result it was added to. Attachments
+        that do not name a result of this test go to its latest result.
+        """
+        downloads = []
+        # Results were already imported above, so read them locally
+        result_ids = [row[0] for row in writer.query('SELECT id FROM results WHERE test_id = ? ORDER BY created_on DESC, id DESC',
+                                                     (test_id,))]
+        if not result_ids:
+            return downloads
         try:
-            print(f"  Processing run {run_idx}/{len(runs)}: {run['name']} (ID: {run['id']})")
-            tests_response = client.send_get(f'get_tests/{run["id"]}')
-            if not tests_response:
-                continue
-            tests = tests_response if isinstance(tests_response, list) else tests_response.get('tests', [])
+            for attachment in client.iter_attachments_for_test(test_id):
+                # Older TestRail versions call the owning result test_change_id
+                result_id = attachment.get('result_id') or attachment.get('test_change_id')
+                if result_id not in result_ids:
+                    result_id = result_ids[0]
+            
+                # Check if already exists to avoid duplicates
+                if writer.query('SELECT id FROM attachments WHERE id = ? AND entity_type = ? AND entity_id = ?',
+                                (attachment['id'], 'result', result_id)):
+                    continue
             
-            for test in tests:
-                try:
-                    results_response = client.send_get(f'get_results/{test["id"]}')
-                    if not results_response:
-                        continue
-                    results = results_response if isinstance(results_response, list) else results_response.get('results', [])
-                    
-                    for result in results:
-                        try:
-                            # Get attachments for this test (they're associated with results through the test)
-                            attachments = client.send_get(f'get_attachments_for_test/{test["id"]}')
-                            if attachments and 'attachments' in attachments:
-                                for attachment in attachments['attachments']:
-                                    try:
-                                        # Check if attachment belongs to this specific result
-                                        # Attachments for results show up under the test's attachments
-                                        # We store them associated with the result
-                                        
-                                        # Check if already exists to avoid duplicates
-                                        cursor.execute('SELECT id FROM attachments WHERE id = ? AND entity_type = ? AND entity_id = ?',
-                                                       (attachment['id'], 'result', result['id']))
-                                        if cursor.fetchone():
-                                            continue
-                                        
-                                        # Download attachment
-                                        attachment_url = f"{config['testrail_url']}index.php?/attachments/get/{attachment['id']}"
-                                        local_filename = f"{attachments_dir}/result_{result['id']}_{attachment['filename']}"
-                                        
-                                        print(f"    Downloading result attachment: {attachment['filename']} (ID: {attachment['id']}) for result {result['id']}")
-                                        
-                                        # Download file using TestRail API
-                                        # The get_attachment endpoint takes a filepath and saves directly to it
-                                        # It returns the filepath on success or error message on failure
-                                        result_path = client.send_get(f"get_attachment/{attachment['id']}", local_filename)
-                                        
-                                        # Verify file was written successfully
-                                        if result_path == local_filename and os.path.exists(local_filename) and os.path.getsize(local_filename) > 0:
-                                            print(f"    ✓ Successfully downloaded: {attachment['filename']} ({os.path.getsize(local_filename)} bytes)")
-                                            # Store in database
-                                            cursor.execute(
-                                                'INSERT OR REPLACE INTO attachments (id, entity_type, entity_id, filename, size, created_on, user_id, url, local_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                                                (attachment['id'], 'result', result['id'], attachment['filename'], 
-                                                 attachment.get('size'), attachment.get('created_on'), 
-                                                 attachment.get('user_id'), attachment_url, local_filename)
-                                            )
-                                            attachment_count += 1
-                                            result_attachment_count += 1
-                                            
-                                            if attachment_count % 10 == 0:
-                                                print(f"    Downloaded {attachment_count} attachments total ({result_attachment_count} from results)...")
-                                                db.commit()
-                                        else:
-                                            print(f"    ❌ Failed to download: {attachment['filename']}")
-                                            print(f"       Expected path: {local_filename}")
-                                            print(f"       API returned: {result_path}")
-                                            print(f"       File exists: {os.path.exists(local_filename)}")
-                                            if os.path.exists(local_filename):
-                                                print(f"       File size: {os.path.getsize(local_filename)} bytes")
-                                            
-                                    except Exception as e:
-                                        print(f"    ❌ Error downloading attachment {attachment['id']} ({attachment['filename']}): {e}")
-                                        traceback.print_exc()
-                        except Exception as e:
-                            print(f"    Warning: Error getting attachments for test {test.get('id', 'unknown')}: {e}")
-                except:
-                    pass
-        except:
-            pass
-except Exception as e:
-    print(f"  Warning: Could not fetch result attachments: {e}")
-    traceback.print_exc()
-
-db.commit()
-print(f"✓ Stored and downloaded {attachment_count} attachments total")
-print(f"  - From test cases: {attachment_count - result_attachment_count}")
-print(f"  - From test results: {result_attachment_count}")
-
-print("\n" + "=" * 80)
-print("IMPORT COMPLETE!")
-print("=" * 80)
-print(f"\nDatabase saved to: testrail.db")
-print(f"Attachments saved to: {attachments_dir}/")
-print("\nSummary:")
-print(f"  - Project: {migration_config.get('testrail_project_name')} (ID: {SELECTED_PROJECT_ID})")
-print(f"  - Target Jira Project: {migration_config.get('jira_project_name')} ({migration_config.get('jira_project_key')})")
-print(f"  - Users: {len(users)}")
-print(f"  - Suites: {suite_count}")
-print(f"  - Sections: {section_count}")
-print(f"  - Cases: {case_count}")
-print(f"  - Milestones: {milestone_count}")
-print(f"  - Plans: {plan_count}")
-print(f"  - Runs: {run_count}")
-print(f"  - Tests: {test_count}")
-print(f"  - Results: {result_count}")
-print(f"  - Attachments: {attachment_count}")
-
-db.close()
+                print_flush(f"    Downloading result attachment: {attachment['filename']} (ID: {attachment['id']}) for result {result_id}")
+                downloads.append(download_pool.submit(store_attachment, attachment, 'result', result_id))
+        except Exception as e:
+            print_flush(f"    Warning: Error getting attachments for test {test_id}: {e}")
+        return downloads
+
+    result_downloads = []
+    print(f"  Checking {len(runs)} runs for result attachments...")
+    for run_idx, run in enumerate(runs, 1):
+        print_flush(f"  Processing run {run_idx}/{len(runs)}: {run['name']} (ID: {run['id']})")
+        for downloads in pool.map(import_result_attachments, run_test_ids.get(run['id'], [])):
+            result_downloads.extend(downloads)
+    result_attachment_count = sum(download.result() for download in result_downloads)
+
+    attachment_count = case_attachment_count + result_attachment_count
+    writer.executemany('DELETE FROM sync_stale_runs WHERE project_id = ? AND run_id = ?',
+                       [(SELECTED_PROJECT_ID, run['id']) for run in runs if run['id'] not in failed_run_ids])
+    writer.commit()
+
+    # Advance the watermarks to the start of this import
+    if failed_fetches.value:
+        print_flush(f"  ⚠ {failed_fetches.value} fetch(es) failed - keeping the previous sync watermarks")
+    else:
+        watermark = import_started - SYNC_WATERMARK_MARGIN
+        writer.executemany('INSERT OR REPLACE INTO sync_state (project_id, entity, watermark, synced_on) VALUES (?, ?, ?, ?)',
+                           [(SELECTED_PROJECT_ID, entity, watermark, int(time.time()))
+                            for entity in ('cases', 'runs', 'results')])
+        writer.commit()
+    print(f"✓ Stored and downloaded {attachment_count} attachments total")
+    print(f"  - From test cases: {case_attachment_count}")
+    print(f"  - From test results: {result_attachment_count}")
+    return {
+        'attachments_dir': attachments_dir,
+        'users': len(users),
+        'suites': suite_count,
+        'sections': section_count,
+        'cases': case_count,
+        'milestones': milestone_count,
+        'plans': plan_count,
+        'runs': run_count,
+        'tests': test_count,
+        'results': result_count,
+        'attachments': attachment_count,
+    }
+
+
+def main():
+    # Stored data must survive an aborted import: the writer only commits
+    # every db_transaction_size rows, so it is always closed on the way out
+    try:
+        summary = import_project()
+    finally:
+        # Queued work is cancelled; fetches still running after an abort fail
+        # on their next write once the writer is closed, so joining the
+        # workers afterwards does not wait for whole stages
+        pool.shutdown(wait=False, cancel_futures=True)
+        download_pool.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+        pool.shutdown()
+        download_pool.shutdown()
+        client.close()
+    
+    # Indexes are built after the bulk load, which is cheaper than keeping them
+    # up to date during the inserts
+    print_flush("\nIndexing database...")
+    index_count = optimize_database('testrail.db', analyze=True)
+    print_flush(f"✓ Created {index_count} indexes and refreshed query statistics")
+    
+    print("\n" + "=" * 80)
+    print("IMPORT COMPLETE!")
+    print("=" * 80)
+    print(f"\nDatabase saved to: testrail.db")
+    print(f"Attachments saved to: {summary['attachments_dir']}/")
+    print("\nSummary:")
+    print(f"  - Project: {migration_config.get('testrail_project_name')} (ID: {SELECTED_PROJECT_ID})")
+    print(f"  - Target Jira Project: {migration_config.get('jira_project_name')} ({migration_config.get('jira_project_key')})")
+    print(f"  - Users: {summary['users']}")
+    print(f"  - Suites: {summary['suites']}")
+    print(f"  - Sections: {summary['sections']}")
+    print(f"  - Cases: {summary['cases']}")
+    print(f"  - Milestones: {summary['milestones']}")
+    print(f"  - Plans: {summary['plans']}")
+    print(f"  - Runs: {summary['runs']}")
+    print(f"  - Tests: {summary['tests']}")
+    print(f"  - Results: {summary['results']}")
+    print(f"  - Attachments: {summary['attachments']}")
+
+
+if __name__ == '__main__':
+    main()
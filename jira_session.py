@@ -0,0 +1,67 @@
+"""
+Pooled HTTP sessions for the Jira/Xray REST APIs.
+
+Every Jira call used to go through bare requests.get/post, which opens (and
+TLS-handshakes) a new connection each time. create_jira_session returns a
+requests.Session with authentication set once and a keep-alive connection
+pool, shared by the migrator, the project selector and the GUI.
+"""
+import re
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+# Same connection pool defaults as the TestRail client, overridable from config.json
+from testrail import DEFAULT_POOL_CONNECTIONS, DEFAULT_POOL_MAXSIZE
+
+
+def is_personal_access_token(password):
+    """Guess whether a Jira password is a Personal Access Token
+
+    PATs are typically:
+    - Longer than normal passwords (>30 chars)
+    - Base64-encoded (alphanumeric + = padding)
+    - No special characters like !, @, #, etc.
+    """
+    is_base64_like = bool(re.match(r'^[A-Za-z0-9+/=]+$', password))
+    return (len(password) > 30 and is_base64_like) or len(password) > 40
+
+
+def create_jira_session(username, password, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                        pool_maxsize=DEFAULT_POOL_MAXSIZE):
+    """Create an authenticated, pooled session for Jira
+
+    PATs are sent as a Bearer token, anything else as HTTP Basic Auth.
+    pool_maxsize should be at least the number of threads sharing the
+    session, otherwise extra connections are opened and discarded.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    # requests sets Content-Type itself for json= and files= bodies
+    session.headers['Accept'] = 'application/json'
+    if is_personal_access_token(password):
+        session.headers['Authorization'] = f'Bearer {password}'
+    else:
+        session.auth = HTTPBasicAuth(username, password)
+    return session
+
+
+def session_from_config(config, pool_maxsize=None):
+    """Create a Jira session from config.json settings
+
+    Optional keys: jira_pool_connections and jira_pool_maxsize. pool_maxsize,
+    when given, raises the per-host pool to at least that many connections.
+    """
+    maxsize = config.get('jira_pool_maxsize', DEFAULT_POOL_MAXSIZE)
+    if pool_maxsize:
+        maxsize = max(maxsize, pool_maxsize)
+    return create_jira_session(
+        config['jira_username'],
+        config['jira_password'],
+        pool_connections=config.get('jira_pool_connections', DEFAULT_POOL_CONNECTIONS),
+        pool_maxsize=maxsize
+    )
@@ -12,12 +12,21 @@ This script migrates test data from TestRail (stored in SQLite) to Xray in Jira.
 
 import requests
 import json
+import re
 import sqlite3
-from requests.auth import HTTPBasicAuth
 import time
+import threading
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import os
 
+from db_indexes import optimize_database
+from jira_session import is_personal_access_token, session_from_config
+from multipart_upload import MultipartFile, UploadProgress, format_size
+from rate_limiter import limiter_from_config
+from task_graph import TaskGraph
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -54,8 +63,64 @@ JIRA_PROJECT_KEY = migration_config.get('jira_project_key') if migration_config
 # Database
 DB_PATH = 'testrail.db'
 
-# API Rate limiting
-RATE_LIMIT_DELAY = 0.5  # seconds between API calls
+# API Rate limiting: initial requests/second for the adaptive limiter, which
+# ramps up while Jira responds quickly and backs off on HTTP 429/503
+# (see rate_limiter.py and the jira_* keys in config.json)
+JIRA_RATE_LIMIT = config.get('jira_rate_limit', 2.0)
+
+# Push test results with one Xray import/execution call per chunk of tests
+# instead of one PUT per result (falls back to per-test updates if rejected)
+BULK_RESULTS = config.get('bulk_results', True)
+BULK_RESULTS_CHUNK_SIZE = config.get('bulk_results_chunk_size', 100)
+
+# Push only the latest result of each (run, case): Xray keeps one status per
+# test in an execution, so earlier retests would just be overwritten.
+# consolidate_result_comments folds the earlier results into that comment.
+COLLAPSE_RESULT_HISTORY = config.get('collapse_result_history', True)
+CONSOLIDATE_RESULT_COMMENTS = config.get('consolidate_result_comments', False)
+
+# Issues per /rest/api/2/issue/bulk request (Jira accepts at most 50)
+JIRA_BULK_CREATE_SIZE = min(50, config.get('jira_bulk_create_size', 50))
+JIRA_BULK_CREATE_RETRIES = config.get('jira_bulk_create_retries', 1)
+
+# Worker threads creating Tests (issue plus steps) concurrently; 1 keeps the
+# serial behaviour. Overridden by --workers.
+MIGRATION_WORKERS = config.get('migration_workers', 1)
+
+# Run the stages as one dependency graph (see migrate_pipelined) instead of
+# one after another
+PIPELINED_MIGRATION = config.get('pipelined_migration', False)
+
+# Concurrent attachment uploads, and retries of an upload that failed with a
+# connection error or a 5xx response
+ATTACHMENT_WORKERS = config.get('attachment_workers', 4)
+ATTACHMENT_UPLOAD_RETRIES = config.get('attachment_upload_retries', 3)
+
+# Mapping rows are written to jira_mappings as soon as Jira returns a key and
+# committed every CHECKPOINT_BATCH_SIZE rows, so --resume can pick up after
+# a crash without recreating issues
+CHECKPOINT_BATCH_SIZE = config.get('checkpoint_batch_size', 20)
+
+# mapping dict key -> jira_mappings.testrail_entity_type
+MAPPING_ENTITY_TYPES = {
+    'cases': 'case',
+    'suites': 'suite',
+    'runs': 'run',
+    'milestones': 'milestone'
+}
+
+# Issues requested per JQL search page; Jira may cap this server-side
+# (jira.search.views.default.max, 1000 by default on Server/Data Center)
+JIRA_SEARCH_PAGE_SIZE = config.get('jira_search_page_size', 1000)
+
+# Write all steps of a Test in one update of Xray's 'Manual Test Steps'
+# field instead of one POST per step (falls back to per-step POSTs if the
+# server rejects it). xray_steps_field overrides the field lookup, e.g.
+# "customfield_10100".
+BULK_TEST_STEPS = config.get('bulk_test_steps', True)
+XRAY_STEPS_FIELD = config.get('xray_steps_field')
+XRAY_STEPS_FIELD_NAME = 'Manual Test Steps'
+XRAY_STEPS_FIELD_TYPE = 'com.xpandit.plugins.xray:manual-test-steps-custom-field'
 
 # Xray issue type names (customize based on your Jira configuration)
 XRAY_TEST_TYPE = 'Test'
@@ -70,57 +135,70 @@ XRAY_PRECONDITION_TYPE = 'Precondition'
 class JiraXrayClient:
     """Client for interacting with Jira and Xray APIs"""
     
-    def __init__(self, base_url, username, password):
+    def __init__(self, base_url, username, password, rate_limiter=None, pool_maxsize=None, session=None):
         self.base_url = base_url.rstrip('/')
         self.username = username
         self.password = password
+        self.rate_limiter = rate_limiter or limiter_from_config(config, 'jira', default_rate=JIRA_RATE_LIMIT)
+        
+        # Test Execution key -> {test key: test run ID}, filled on first use
+        self._testrun_ids = {}
+        self._testrun_lock = threading.Lock()
         
-        # Detect if using PAT (Personal Access Token) vs regular password
-        # PATs are typically:
-        # - Longer than normal passwords (>30 chars)
-        # - Base64-encoded (alphanumeric + = padding)
-        # - No special characters like !, @, #, etc.
-        import re
-        is_base64_like = bool(re.match(r'^[A-Za-z0-9+/=]+$', password))
-        self.is_token = (len(password) > 30 and is_base64_like) or len(password) > 40
+        # Cleared when the server turns out not to support import/execution
+        self.bulk_results = BULK_RESULTS
         
+        # Issue key -> {(filename, size): attachment ID}, filled on first use
+        self._attachment_index = {}
+        self._attachment_lock = threading.Lock()
+        
+        # Bulk step updates: None until the first attempt tells whether the
+        # server accepts them; the field ID is looked up once
+        self._bulk_steps = None if BULK_TEST_STEPS else False
+        self._steps_field_id = XRAY_STEPS_FIELD
+        self._steps_lock = threading.Lock()
+        
+        # One pooled keep-alive session with auth set once, shared by every
+        # request (and every worker thread) of this client. A caller that
+        # already holds a session for these credentials can pass it in; it
+        # stays the caller's to close.
+        self.is_token = is_personal_access_token(password)
+        self._owns_session = session is None
+        self.session = session or session_from_config(
+            dict(config, jira_username=username, jira_password=password),
+            pool_maxsize=pool_maxsize
+        )
+        # Kept for scripts that send their own requests with the client's
+        # credentials (auth is None for a PAT, which travels in the headers)
+        self.auth = self.session.auth
+        self.headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
         if self.is_token:
-            # Use Bearer token authentication for PAT
-            self.auth = None
-            self.headers = {
-                'Authorization': f'Bearer {password}',
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            }
+            self.headers['Authorization'] = self.session.headers['Authorization']
             print("  ℹ Using Bearer Token authentication (PAT detected)")
         else:
-            # Use Basic Auth for regular password
-            self.auth = HTTPBasicAuth(username, password)
-            self.headers = {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            }
             print("  ℹ Using HTTP Basic Auth (password detected)")
+    
+    def close(self):
+        """Release the pooled connections held by this client"""
+        if self._owns_session:
+            self.session.close()
         
     def _make_request(self, method, endpoint, data=None, params=None):
         """Make HTTP request to Jira API"""
         url = f"{self.base_url}/rest/api/2/{endpoint}"
         
         try:
-            # Use auth only if not using Bearer token (it's in headers)
-            auth_param = None if self.is_token else self.auth
-            
             if method == 'GET':
-                response = requests.get(url, auth=auth_param, headers=self.headers, params=params)
+                send = lambda: self.session.get(url, params=params)
             elif method == 'POST':
-                response = requests.post(url, auth=auth_param, headers=self.headers, json=data)
+                send = lambda: self.session.post(url, json=data)
             elif method == 'PUT':
-                response = requests.put(url, auth=auth_param, headers=self.headers, json=data)
+                send = lambda: self.session.put(url, json=data)
             elif method == 'DELETE':
-                response = requests.delete(url, auth=auth_param, headers=self.headers)
+                send = lambda: self.session.delete(url)
             
+            response = self.rate_limiter.send(send)  # Rate limiting and 429/503 retries
             response.raise_for_status()
-            time.sleep(RATE_LIMIT_DELAY)  # Rate limiting
             
             if response.text:
                 return response.json()
@@ -137,18 +215,15 @@ class JiraXrayClient:
         url = f"{self.base_url}/rest/raven/{api_version}/{endpoint}"
         
         try:
-            # Use auth only if not using Bearer token (it's in headers)
-            auth_param = None if self.is_token else self.auth
-            
             if method == 'GET':
-                response = requests.get(url, auth=auth_param, headers=self.headers)
+                send = lambda: self.session.get(url)
             elif method == 'POST':
-                response = requests.post(url, auth=auth_param, headers=self.headers, json=data)
+                send = lambda: self.session.post(url, json=data)
             elif method == 'PUT':
-                response = requests.put(url, auth=auth_param, headers=self.headers, json=data)
+                send = lambda: self.session.put(url, json=data)
             
+            response = self.rate_limiter.send(send)
             response.raise_for_status()
-            time.sleep(RATE_LIMIT_DELAY)
             
             if response.text:
                 return response.json()
@@ -172,6 +247,81 @@ class JiraXrayClient:
         """Create a new issue in Jira"""
         return self._make_request('POST', 'issue', data=issue_data)
     
+    def create_issues_bulk(self, issues, max_retries=JIRA_BULK_CREATE_RETRIES):
+        """Create issues through /issue/bulk, up to JIRA_BULK_CREATE_SIZE per request
+        
+        Jira lists the created issues in request order and reports failures
+        by their position (failedElementNumber), so results are mapped back
+        to the input by position. The elements Jira reports as failed are
+        retried, and so is a whole batch Jira turned away before creating
+        anything (401, 403 or a 429 the rate limiter gave up on). issue/bulk
+        is not idempotent, so a batch whose outcome is unknown (connection
+        error, timeout, a 5xx or a body that is not Jira's) is reported as
+        failed instead of being sent again.
+        
+        Returns:
+            A list aligned with issues holding the created issue dict (with
+            'key'), or None for issues that could not be created.
+        """
+        created = [None] * len(issues)
+        pending = list(range(len(issues)))
+        
+        for attempt in range(max_retries + 1):
+            if not pending:
+                break
+            if attempt:
+                print(f"  Retrying {len(pending)} failed issue(s) (attempt {attempt + 1})...")
+            
+            failed = []
+            for start in range(0, len(pending), JIRA_BULK_CREATE_SIZE):
+                batch = pending[start:start + JIRA_BULK_CREATE_SIZE]
+                data = {'issueUpdates': [issues[i] for i in batch]}
+                status_code = None
+                try:
+                    response = self._make_request('POST', 'issue/bulk', data=data)
+                except requests.exceptions.HTTPError as e:
+                    # Jira answers 400 when every element failed, with the
+                    # same body describing the per-element errors
+                    status_code = e.response.status_code
+                    try:
+                        response = e.response.json() if status_code < 500 else None
+                    except ValueError:
+                        response = None
+                except requests.exceptions.RequestException:
+                    response = None
+                
+                # A bulk response lists created issues and/or per-element
+                # errors; anything else (e.g. {"errorMessages": [...]}) is not one
+                if not (isinstance(response, dict) and (isinstance(response.get('issues'), list)
+                                                        or isinstance(response.get('errors'), list))):
+                    if status_code in (401, 403, 429):
+                        # Rejected before Jira looked at the issues
+                        print(f"  ⚠ Bulk create of {len(batch)} issue(s) was rejected (HTTP {status_code})")
+                        failed.extend(batch)
+                    else:
+                        # Jira may have created the batch before the failure
+                        print(f"  ⚠ Outcome of a bulk create of {len(batch)} issue(s) is unknown - not resending it; "
+                              f"check Jira for duplicates before retrying these cases")
+                    continue
+                
+                errors = response.get('errors') or []
+                failed_numbers = {error.get('failedElementNumber') for error in errors}
+                
+                created_issues = iter(response.get('issues') or [])
+                for number, index in enumerate(batch):
+                    if number in failed_numbers:
+                        failed.append(index)
+                    else:
+                        created[index] = next(created_issues, None)
+                
+                for error in errors:
+                    print(f"  ❌ Bulk create element {error.get('failedElementNumber')} failed: "
+                          f"{error.get('elementErrors', {}).get('errors') or error.get('elementErrors')}")
+            
+            pending = failed
+        
+        return created
+    
     def update_issue(self, issue_key, update_data):
         """Update an existing issue"""
         return self._make_request('PUT', f'issue/{issue_key}', data=update_data)
@@ -180,32 +330,54 @@ class JiraXrayClient:
         """Get issue details"""
         return self._make_request('GET', f'issue/{issue_key}')
     
-    def search_issues(self, jql, fields=None, max_results=100):
+    def search_issues(self, jql, fields=None, max_results=100, start_at=0):
         """Search for issues using JQL"""
         params = {
             'jql': jql,
+            'startAt': start_at,
             'maxResults': max_results
         }
         if fields:
             params['fields'] = ','.join(fields)
         return self._make_request('GET', 'search', params=params)
     
+    def iter_search_issues(self, jql, fields=None, page_size=JIRA_SEARCH_PAGE_SIZE):
+        """Iterate over every issue matching jql, one page at a time
+        
+        Jira may return fewer issues than requested per page, so paging
+        advances by the number of issues actually received. Order the JQL
+        (e.g. ORDER BY key) to keep pages stable.
+        """
+        start_at = 0
+        while True:
+            response = self.search_issues(jql, fields=fields, max_results=page_size, start_at=start_at)
+            issues = response.get('issues', [])
+            yield from issues
+            start_at += len(issues)
+            if not issues or start_at >= response.get('total', 0):
+                return
+    
     def add_comment(self, issue_key, comment):
         """Add comment to an issue"""
         data = {'body': comment}
         return self._make_request('POST', f'issue/{issue_key}/comment', data=data)
     
-    def add_attachment(self, issue_key, file_path):
-        """Add attachment to an issue"""
-        url = f'{self.base_url}/rest/api/2/issue/{issue_key}/attachments'
+    def add_attachment(self, issue_key, file_path, filename=None, progress=None,
+                       max_retries=ATTACHMENT_UPLOAD_RETRIES):
+        """Add attachment to an issue
         
-        headers = {
-            'X-Atlassian-Token': 'no-check'
-        }
+        The multipart body is streamed from disk (see multipart_upload.py),
+        so memory use does not grow with the file size. The rate limiter
+        retries 429/503 responses; connection errors and timeouts are
+        retried here up to max_retries times with backoff. Other errors are
+        not retried, so a large file is never streamed many times over.
         
-        # Add authentication header
-        if self.is_token:
-            headers['Authorization'] = f'Bearer {self.password}'
+        Args:
+            filename: Name of the attachment in Jira; defaults to the file's name.
+            progress: Optional UploadProgress counting the bytes sent.
+        """
+        url = f'{self.base_url}/rest/api/2/issue/{issue_key}/attachments'
+        filename = filename or os.path.basename(file_path)
         
         try:
             # Verify file exists and is readable
@@ -218,25 +390,37 @@ class JiraXrayClient:
                 print(f"❌ File is empty: {file_path}")
                 return None
             
-            print(f"  📎 Uploading {os.path.basename(file_path)} ({file_size} bytes) to {issue_key}...")
+            print(f"  📎 Uploading {filename} ({format_size(file_size)}) to {issue_key}...")
             
-            with open(file_path, 'rb') as f:
-                files = {'file': (os.path.basename(file_path), f)}
-                
-                if self.is_token:
-                    response = requests.post(url, headers=headers, files=files)
-                else:
-                    response = requests.post(
-                        url, 
-                        headers=headers, 
-                        files=files,
-                        auth=HTTPBasicAuth(self.username, self.password)
-                    )
-                
-                response.raise_for_status()
-                result = response.json()
-                print(f"  ✓ Uploaded successfully (ID: {result[0]['id']})")
-                return result
+            def send():
+                # A fresh body per attempt so a throttled upload can be retried
+                with MultipartFile(file_path, filename=filename,
+                                   progress=progress.add if progress else None) as body:
+                    headers = {'X-Atlassian-Token': 'no-check', 'Content-Type': body.content_type}
+                    response = None
+                    try:
+                        response = self.session.post(url, headers=headers, data=body)
+                        return response
+                    finally:
+                        # Bytes of a failed attempt were not uploaded
+                        if progress and (response is None or response.status_code >= 300):
+                            progress.add(-body.bytes_read)
+            
+            for attempt in range(max_retries + 1):
+                try:
+                    response = self.rate_limiter.send(send)
+                    break
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    if attempt == max_retries:
+                        raise
+                    wait = 2 ** attempt
+                    print(f"  ⚠ Upload of {filename} failed ({type(e).__name__}), retrying in {wait}s...")
+                    time.sleep(wait)
+            
+            response.raise_for_status()
+            result = response.json()
+            print(f"  ✓ Uploaded successfully (ID: {result[0]['id']})")
+            return result
         except requests.exceptions.HTTPError as e:
             print(f"❌ HTTP Error uploading {file_path}: {e.response.status_code} - {e.response.text}")
             return None
@@ -246,6 +430,23 @@ class JiraXrayClient:
             traceback.print_exc()
             return None
     
+    def get_attachment_index(self, issue_key):
+        """Return {(filename, size): attachment ID} of an issue, fetched once and cached
+        
+        Only the attachment field is requested. The cache lives as long as the
+        client, so each issue is read at most once per migration.
+        """
+        with self._attachment_lock:
+            cached = self._attachment_index.get(issue_key)
+        if cached is not None:
+            return cached
+        
+        issue = self._make_request('GET', f'issue/{issue_key}', params={'fields': 'attachment'})
+        index = {(attachment['filename'], attachment['size']): str(attachment['id'])
+                 for attachment in issue.get('fields', {}).get('attachment') or []}
+        with self._attachment_lock:
+            return self._attachment_index.setdefault(issue_key, index)
+    
     def create_link(self, inward_issue, outward_issue, link_type='Relates'):
         """Create link between two issues"""
         data = {
@@ -259,9 +460,9 @@ class JiraXrayClient:
     # XRAY SPECIFIC API METHODS (REST API v1.0)
     # ========================================================================
     
-    def create_test(self, project_key, summary, description=None, steps=None, precondition=None):
-        """Create a Test issue in Xray"""
-        issue_data = {
+    def _test_issue_data(self, project_key, summary, description=None):
+        """Build the Jira issue payload for a Test"""
+        return {
             'fields': {
                 'project': {'key': project_key},
                 'summary': summary,
@@ -269,6 +470,10 @@ class JiraXrayClient:
                 'issuetype': {'name': XRAY_TEST_TYPE}
             }
         }
+    
+    def create_test(self, project_key, summary, description=None, steps=None, precondition=None):
+        """Create a Test issue in Xray"""
+        issue_data = self._test_issue_data(project_key, summary, description)
         
         test = self.create_issue(issue_data)
         test_key = test['key']
@@ -283,8 +488,80 @@ class JiraXrayClient:
         
         return test
     
+    def create_tests_bulk(self, project_key, tests):
+        """Create many Test issues with issue/bulk, then add their steps
+        
+        Args:
+            tests: dicts with 'summary', 'description' and optional 'steps'.
+        
+        Returns:
+            A list aligned with tests holding the created issue or None.
+            Issues whose steps could not be added have 'steps_failed' set.
+        """
+        issues = [self._test_issue_data(project_key, test['summary'], test.get('description'))
+                  for test in tests]
+        created = self.create_issues_bulk(issues)
+        
+        for test, issue in zip(tests, created):
+            if issue and test.get('steps'):
+                if self.update_test_steps(issue['key'], test['steps']) is None:
+                    issue['steps_failed'] = True
+        
+        return created
+    
+    def get_steps_field_id(self):
+        """Return the ID of Xray's 'Manual Test Steps' field, or None if it isn't found"""
+        with self._steps_lock:
+            if self._steps_field_id is None:
+                self._steps_field_id = ''
+                try:
+                    for field in self._make_request('GET', 'field'):
+                        schema = field.get('schema') or {}
+                        if schema.get('custom') == XRAY_STEPS_FIELD_TYPE or field.get('name') == XRAY_STEPS_FIELD_NAME:
+                            self._steps_field_id = field['id']
+                            break
+                except Exception as e:
+                    print(f"  Warning: Could not look up the '{XRAY_STEPS_FIELD_NAME}' field: {e}")
+            return self._steps_field_id or None
+    
+    def set_test_steps(self, test_key, steps):
+        """Replace all steps of a Test with one update of the 'Manual Test Steps' field"""
+        steps_field = {
+            'steps': [
+                {
+                    'index': index,
+                    'fields': {
+                        'Action': step.get('action', ''),
+                        'Data': step.get('data', ''),
+                        'Expected Result': step.get('expected', '')
+                    }
+                }
+                for index, step in enumerate(steps, 1)
+            ]
+        }
+        return self.update_issue(test_key, {'fields': {self.get_steps_field_id(): steps_field}})
+    
     def update_test_steps(self, test_key, steps):
-        """Update test steps for a Test issue using Xray v2 API"""
+        """Update test steps for a Test issue
+        
+        Steps are written in a single request when the server accepts the
+        'Manual Test Steps' field; otherwise each step is POSTed on its own
+        through the Xray v2 API.
+        """
+        if self._bulk_steps is not False and self.get_steps_field_id():
+            try:
+                self.set_test_steps(test_key, steps)
+                self._bulk_steps = True
+                return True
+            except requests.exceptions.RequestException as e:
+                status_code = getattr(e.response, 'status_code', None)
+                if self._bulk_steps is None and status_code in (400, 404, 405):
+                    # Rejected before ever succeeding: not supported here
+                    print("  ⚠ Bulk step update not supported, adding steps one at a time")
+                    self._bulk_steps = False
+                # Anything else (timeouts, 5xx, throttling) falls back for
+                # this Test only
+        
         # Xray v2 API: POST each step individually to /rest/raven/2.0/api/test/{testKey}/steps
         try:
             # Post each step individually - v2 API doesn't support bulk updates
@@ -359,27 +636,45 @@ class JiraXrayClient:
             return self._make_xray_request('POST', f'api/testexec/{test_execution_key}/test', data=data, api_version='1.0')
         except Exception as e:
             print(f"  Warning: Could not add tests to execution {test_execution_key}: {e}")
+        finally:
+            # New tests get new test runs, so the cached IDs are stale
+            self.invalidate_testrun_ids(test_execution_key)
+    
+    def get_testrun_ids(self, test_execution_key, refresh=False):
+        """Return {test key: test run ID} for an execution, fetched once and cached
+        
+        refresh=True fetches the list again, e.g. after tests were added to
+        the execution since it was cached.
+        """
+        with self._testrun_lock:
+            cached = self._testrun_ids.get(test_execution_key)
+        if cached is not None and not refresh:
+            return cached
+        
+        # Use v1 API to get list of tests in execution with their test run IDs
+        url = f"{self.base_url}/rest/raven/1.0/api/testexec/{test_execution_key}/test"
+        response = self.rate_limiter.send(lambda: self.session.get(url))
+        response.raise_for_status()
+        
+        testrun_ids = {test.get('key'): test.get('id') for test in response.json()}
+        with self._testrun_lock:
+            self._testrun_ids[test_execution_key] = testrun_ids
+        return testrun_ids
+    
+    def invalidate_testrun_ids(self, test_execution_key):
+        """Forget the cached test run IDs of an execution"""
+        with self._testrun_lock:
+            self._testrun_ids.pop(test_execution_key, None)
     
     def update_test_execution_status(self, test_execution_key, test_key, status, comment=None, 
                                      defects=None, evidence=None):
         """Update the status of a test within a test execution using v2 TestRun API"""
         try:
-            # Step 1: Get the test run ID from the test execution
-            # Use v1 API to get list of tests in execution with their test run IDs
-            url = f"{self.base_url}/rest/raven/1.0/api/testexec/{test_execution_key}/test"
-            auth_param = None if self.is_token else self.auth
-            
-            response = requests.get(url, auth=auth_param, headers=self.headers)
-            response.raise_for_status()
-            
-            tests_in_exec = response.json()
-            
-            # Find the test run ID for our specific test
-            testrun_id = None
-            for test in tests_in_exec:
-                if test.get('key') == test_key:
-                    testrun_id = test.get('id')
-                    break
+            # Step 1: Get the test run ID from the (cached) tests of the execution
+            testrun_id = self.get_testrun_ids(test_execution_key).get(test_key)
+            if not testrun_id:
+                # The test may have been added after the list was cached
+                testrun_id = self.get_testrun_ids(test_execution_key, refresh=True).get(test_key)
             
             if not testrun_id:
                 raise Exception(f"Test {test_key} not found in execution {test_execution_key}")
@@ -404,6 +699,29 @@ class JiraXrayClient:
             print(f"  Warning: Could not update test status: {e}")
             return None
     
+    def import_execution_results(self, test_execution_key, results):
+        """Import many test results into a Test Execution in one request
+        
+        Uses the Xray JSON format of /rest/raven/1.0/import/execution. Each
+        result is a dict with 'test_key', 'status' and optional 'comment'.
+        """
+        tests = []
+        for result in results:
+            test = {'testKey': result['test_key'], 'status': result['status']}
+            if result.get('comment'):
+                test['comment'] = result['comment']
+            tests.append(test)
+        
+        payload = {
+            'testExecutionKey': test_execution_key,
+            'tests': tests
+        }
+        try:
+            return self._make_xray_request('POST', 'import/execution', data=payload, api_version='1.0')
+        finally:
+            # The import may add tests (and test runs) to the execution
+            self.invalidate_testrun_ids(test_execution_key)
+    
     def create_precondition(self, project_key, summary, description=None):
         """Create a Precondition issue"""
         issue_data = {
@@ -446,13 +764,82 @@ def map_testrail_status_to_xray(status_id, statuses):
     
     return status_map.get(status_id, 'TODO')
 
-def migrate_test_cases(client, project_key, mapping):
-    """Migrate test cases to Xray Tests"""
-    print("\n[1/5] Migrating Test Cases...")
-    
-    db = get_db_connection()
-    cursor = db.cursor()
-    
+def build_test_from_case(case):
+    """Build the Xray Test description and steps for a TestRail case row
+    
+    Returns:
+        (description, steps) where steps is a list of action/data/expected
+        dicts, or None when the case has no steps.
+    """
+    # Parse custom fields
+    custom_fields = {}
+    if case.get('custom_fields'):
+        try:
+            custom_fields = eval(case['custom_fields'])
+        except:
+            pass
+    
+    # Build description
+    description = f"*Imported from TestRail (ID: {case['id']})*\n\n"
+    
+    if case.get('section_name'):
+        description += f"*Section:* {case['section_name']}\n"
+    
+    # Add preconditions if exists
+    precondition_text = custom_fields.get('custom_preconds')
+    if precondition_text:
+        description += f"\n*Preconditions:*\n{precondition_text}\n"
+    
+    # Parse test steps
+    test_steps = None
+    if custom_fields.get('custom_steps_separated'):
+        # Handle structured steps
+        description += f"\n*Steps:*\n"
+        try:
+            steps = eval(custom_fields['custom_steps_separated'])
+            test_steps = []
+            for step in steps:
+                if isinstance(step, dict):
+                    test_steps.append({
+                        'action': step.get('content', ''),
+                        'data': '',
+                        'expected': step.get('expected', '')
+                    })
+                    description += f"- {step.get('content', '')}\n"
+                    if step.get('expected'):
+                        description += f"  *Expected:* {step.get('expected')}\n"
+        except:
+            pass
+    elif custom_fields.get('custom_steps'):
+        # Handle plain text steps - split by newlines and create steps
+        steps_text = custom_fields['custom_steps']
+        description += f"\n*Steps:*\n{steps_text}\n"
+        
+        # Try to parse into structured steps for Xray
+        test_steps = []
+        step_lines = [line.strip() for line in steps_text.split('\n') if line.strip()]
+        for i, line in enumerate(step_lines, 1):
+            test_steps.append({
+                'action': line,
+                'data': '',
+                'expected': custom_fields.get('custom_expected', '') if i == len(step_lines) else ''
+            })
+    
+    # Add expected results if not in steps
+    if custom_fields.get('custom_expected') and not custom_fields.get('custom_steps_separated'):
+        description += f"\n*Expected Results:*\n{custom_fields['custom_expected']}\n"
+    
+    # Add any additional custom fields
+    description += f"\n*Additional Information:*\n"
+    if case.get('refs'):
+        description += f"- References: {case['refs']}\n"
+    if case.get('estimate'):
+        description += f"- Estimate: {case['estimate']}\n"
+    
+    return description, test_steps
+
+def load_cases(cursor):
+    """Return the cases of the selected project with section and priority names"""
     # Get the selected project ID from migration config
     testrail_project_id = migration_config.get('testrail_project_id') if migration_config else None
     
@@ -476,108 +863,115 @@ def migrate_test_cases(client, project_key, mapping):
             LEFT JOIN priorities p ON c.priority_id = p.id
         ''')
     
-    cases = cursor.fetchall()
     columns = [desc[0] for desc in cursor.description]
-    
-    test_count = 0
-    for row in cases:
-        case = dict(zip(columns, row))
-        
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def prepare_tests(cases, mapping, errors):
+    """Build the Test payload of every case not in mapping['cases'] yet
+    
+    Returns:
+        (pending, resumed_count) where pending holds (case, description,
+        steps) tuples. Cases that fail to build are added to errors.
+    """
+    pending = []
+    resumed_count = 0
+    for case in cases:
+        if case['id'] in mapping['cases']:
+            resumed_count += 1
+            continue
         try:
-            # Parse custom fields
-            custom_fields = {}
-            if case.get('custom_fields'):
-                try:
-                    custom_fields = eval(case['custom_fields'])
-                except:
-                    pass
-            
-            # Build description
-            description = f"*Imported from TestRail (ID: {case['id']})*\n\n"
-            
-            if case.get('section_name'):
-                description += f"*Section:* {case['section_name']}\n"
-            
-            # Add preconditions if exists
-            precondition_text = custom_fields.get('custom_preconds')
-            if precondition_text:
-                description += f"\n*Preconditions:*\n{precondition_text}\n"
-            
-            # Parse test steps
-            test_steps = None
-            if custom_fields.get('custom_steps_separated'):
-                # Handle structured steps
-                description += f"\n*Steps:*\n"
-                try:
-                    steps = eval(custom_fields['custom_steps_separated'])
-                    test_steps = []
-                    for step in steps:
-                        if isinstance(step, dict):
-                            test_steps.append({
-                                'action': step.get('content', ''),
-                                'data': '',
-                                'expected': step.get('expected', '')
-                            })
-                            description += f"- {step.get('content', '')}\n"
-                            if step.get('expected'):
-                                description += f"  *Expected:* {step.get('expected')}\n"
-                except:
-                    pass
-            elif custom_fields.get('custom_steps'):
-                # Handle plain text steps - split by newlines and create steps
-                steps_text = custom_fields['custom_steps']
-                description += f"\n*Steps:*\n{steps_text}\n"
-                
-                # Try to parse into structured steps for Xray
-                test_steps = []
-                step_lines = [line.strip() for line in steps_text.split('\n') if line.strip()]
-                for i, line in enumerate(step_lines, 1):
-                    test_steps.append({
-                        'action': line,
-                        'data': '',
-                        'expected': custom_fields.get('custom_expected', '') if i == len(step_lines) else ''
-                    })
-            
-            # Add expected results if not in steps
-            if custom_fields.get('custom_expected') and not custom_fields.get('custom_steps_separated'):
-                description += f"\n*Expected Results:*\n{custom_fields['custom_expected']}\n"
-            
-            # Add any additional custom fields
-            description += f"\n*Additional Information:*\n"
-            if case.get('refs'):
-                description += f"- References: {case['refs']}\n"
-            if case.get('estimate'):
-                description += f"- Estimate: {case['estimate']}\n"
-            
-            # Create test in Xray with steps
-            test = client.create_test(
-                project_key=project_key,
-                summary=case['title'],
-                description=description,
-                steps=test_steps
-            )
-            
-            # Store mapping
-            mapping['cases'][case['id']] = test['key']
-            test_count += 1
-            
-            if test_count % 10 == 0:
-                print(f"  ✓ Migrated {test_count} test cases...")
-            
+            description, test_steps = build_test_from_case(case)
+            pending.append((case, description, test_steps))
         except Exception as e:
             print(f"  ❌ Error migrating case {case['id']}: {e}")
-    
-    db.close()
-    print(f"✓ Migrated {test_count} test cases")
-    return mapping
+            errors.append((case['id'], str(e)))
+    return pending, resumed_count
 
-def migrate_test_suites(client, project_key, mapping):
-    """Migrate test suites to Xray Test Sets"""
-    print("\n[2/5] Migrating Test Suites as Test Sets...")
+def create_test_chunk(client, project_key, batch):
+    """Create one bulk chunk of Tests; returns (case, test key, error) tuples"""
+    try:
+        tests = client.create_tests_bulk(project_key, [
+            {'summary': case['title'], 'description': description, 'steps': test_steps}
+            for case, description, test_steps in batch
+        ])
+    except Exception as e:
+        return [(case, None, str(e)) for case, _, _ in batch]
+    
+    outcomes = []
+    for (case, _, _), test in zip(batch, tests):
+        if not test:
+            outcomes.append((case, None, 'Test could not be created'))
+        elif test.get('steps_failed'):
+            outcomes.append((case, test['key'], f"Test {test['key']} created but its steps could not be added"))
+        else:
+            outcomes.append((case, test['key'], None))
+    return outcomes
+
+def record_test_outcomes(outcomes, mapping, errors, checkpoint=None):
+    """Apply create_test_chunk outcomes to the mapping; returns the number of Tests created"""
+    created = 0
+    for case, test_key, error in outcomes:
+        if error:
+            print(f"  ❌ Error migrating case {case['id']}: {error}")
+            errors.append((case['id'], error))
+        if test_key:
+            mapping['cases'][case['id']] = test_key
+            if checkpoint:
+                checkpoint.record('case', case['id'], test_key)
+            created += 1
+    return created
+
+def print_case_errors(errors):
+    if errors:
+        print(f"  ⚠ {len(errors)} case(s) had errors:")
+        for case_id, error in errors:
+            print(f"    - Case {case_id}: {error}")
+
+def migrate_test_cases(client, project_key, mapping, workers=1, checkpoint=None):
+    """Migrate test cases to Xray Tests
+    
+    Bulk chunks of Tests (issue plus steps) are created on up to workers
+    threads. Each created Test is added to mapping['cases'] and the
+    checkpoint as soon as its chunk finishes; failures are collected and
+    listed at the end instead of stopping the stage. Cases already in
+    mapping['cases'] are skipped.
+    """
+    print("\n[1/5] Migrating Test Cases...")
     
     db = get_db_connection()
     cursor = db.cursor()
     
+    # Build every Test first so they can be created in bulk
+    errors = []
+    pending, resumed_count = prepare_tests(load_cases(cursor), mapping, errors)
+    
+    if resumed_count:
+        print(f"  ↻ Skipping {resumed_count} case(s) already migrated")
+    
+    chunks = [pending[start:start + JIRA_BULK_CREATE_SIZE]
+              for start in range(0, len(pending), JIRA_BULK_CREATE_SIZE)]
+    if workers > 1 and chunks:
+        print(f"  Creating tests with {workers} workers")
+    
+    test_count = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(create_test_chunk, client, project_key, batch) for batch in chunks]
+        
+        # Mapping updates stay on this thread, so the dict is only ever
+        # touched by one thread
+        for future in as_completed(futures):
+            test_count += record_test_outcomes(future.result(), mapping, errors, checkpoint)
+            print(f"  ✓ Migrated {test_count} test cases...")
+    
+    if checkpoint:
+        checkpoint.flush()
+    db.close()
+    print(f"✓ Migrated {test_count} test cases")
+    print_case_errors(errors)
+    return mapping
+
+def load_suites(cursor):
+    """Return the suites of the selected project, each with its 'case_ids'"""
     # Get the selected project ID from migration config
     testrail_project_id = migration_config.get('testrail_project_id') if migration_config else None
     
@@ -589,50 +983,86 @@ def migrate_test_suites(client, project_key, mapping):
         print("  Warning: No project ID specified, migrating all suites")
         cursor.execute('SELECT * FROM suites')
     
-    suites = cursor.fetchall()
     columns = [desc[0] for desc in cursor.description]
+    suites = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    # Get tests of every suite in one query
+    case_ids = {}
+    cursor.execute('SELECT suite_id, id FROM cases')
+    for suite_id, case_id in cursor.fetchall():
+        case_ids.setdefault(suite_id, []).append(case_id)
+    for suite in suites:
+        suite['case_ids'] = case_ids.get(suite['id'], [])
+    return suites
+
+def migrate_suite(client, project_key, suite, mapping, checkpoint=None, resumed_cases=()):
+    """Create the Test Set of one suite
     
-    suite_count = 0
-    for row in suites:
-        suite = dict(zip(columns, row))
+    Returns:
+        'created', 'resumed' when the Test Set exists from an earlier run
+        (only Tests created since are added to it), or None on error.
+    """
+    try:
+        # Get corresponding Xray test keys
+        test_keys = [mapping['cases'][cid] for cid in suite['case_ids'] if cid in mapping['cases']]
         
-        try:
-            # Get tests in this suite
-            cursor.execute('SELECT id FROM cases WHERE suite_id = ?', (suite['id'],))
-            case_ids = [r[0] for r in cursor.fetchall()]
-            
-            # Get corresponding Xray test keys
-            test_keys = [mapping['cases'][cid] for cid in case_ids if cid in mapping['cases']]
-            
-            description = f"*Imported from TestRail Suite (ID: {suite['id']})*\n\n"
-            if suite.get('description'):
-                description += suite['description']
-            
-            # Create Test Set
-            test_set = client.create_test_set(
-                project_key=project_key,
-                summary=suite['name'],
-                description=description,
-                tests=test_keys
-            )
-            
-            mapping['suites'][suite['id']] = test_set['key']
-            suite_count += 1
-            
-        except Exception as e:
-            print(f"  ❌ Error migrating suite {suite['id']}: {e}")
-    
-    db.close()
-    print(f"✓ Migrated {suite_count} test suites as test sets")
-    return mapping
+        if suite['id'] in mapping['suites']:
+            # Created by an earlier run: only add the Tests created since
+            new_keys = [mapping['cases'][cid] for cid in suite['case_ids']
+                        if cid in mapping['cases'] and cid not in resumed_cases]
+            if new_keys:
+                client.add_tests_to_test_set(mapping['suites'][suite['id']], new_keys)
+            return 'resumed'
+        
+        description = f"*Imported from TestRail Suite (ID: {suite['id']})*\n\n"
+        if suite.get('description'):
+            description += suite['description']
+        
+        # Create Test Set
+        test_set = client.create_test_set(
+            project_key=project_key,
+            summary=suite['name'],
+            description=description,
+            tests=test_keys
+        )
+        
+        mapping['suites'][suite['id']] = test_set['key']
+        if checkpoint:
+            checkpoint.record('suite', suite['id'], test_set['key'])
+        return 'created'
+        
+    except Exception as e:
+        print(f"  ❌ Error migrating suite {suite['id']}: {e}")
+        return None
 
-def migrate_test_runs(client, project_key, mapping):
-    """Migrate test runs to Xray Test Executions"""
-    print("\n[3/5] Migrating Test Runs as Test Executions...")
+def migrate_test_suites(client, project_key, mapping, checkpoint=None):
+    """Migrate test suites to Xray Test Sets"""
+    print("\n[2/5] Migrating Test Suites as Test Sets...")
     
     db = get_db_connection()
     cursor = db.cursor()
+    suites = load_suites(cursor)
+    db.close()
     
+    suite_count = 0
+    resumed_count = 0
+    resumed_cases = checkpoint.done('case') if checkpoint else {}
+    for suite in suites:
+        outcome = migrate_suite(client, project_key, suite, mapping, checkpoint, resumed_cases)
+        if outcome == 'created':
+            suite_count += 1
+        elif outcome == 'resumed':
+            resumed_count += 1
+    
+    if checkpoint:
+        checkpoint.flush()
+    if resumed_count:
+        print(f"  ↻ Skipped {resumed_count} suite(s) already migrated")
+    print(f"✓ Migrated {suite_count} test suites as test sets")
+    return mapping
+
+def load_runs(cursor):
+    """Return the runs of the selected project, each with its 'case_ids'"""
     # Get the selected project ID from migration config
     testrail_project_id = migration_config.get('testrail_project_id') if migration_config else None
     
@@ -644,94 +1074,156 @@ def migrate_test_runs(client, project_key, mapping):
         print("  Warning: No project ID specified, migrating all runs")
         cursor.execute('SELECT * FROM runs ORDER BY created_on')
     
-    runs = cursor.fetchall()
     columns = [desc[0] for desc in cursor.description]
+    runs = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    
+    # Get tests of every run in one query
+    case_ids = {}
+    cursor.execute('SELECT run_id, case_id FROM tests')
+    for run_id, case_id in cursor.fetchall():
+        case_ids.setdefault(run_id, []).append(case_id)
+    for run in runs:
+        run['case_ids'] = case_ids.get(run['id'], [])
+    return runs
+
+def migrate_run(client, project_key, run, mapping, checkpoint=None, resumed_cases=()):
+    """Create the Test Execution of one run
     
-    run_count = 0
-    for row in runs:
-        run = dict(zip(columns, row))
+    Returns:
+        'created', 'resumed' when the Test Execution exists from an earlier
+        run (only Tests created since are added to it), or None on error.
+    """
+    try:
+        # Get corresponding Xray test keys
+        test_keys = [mapping['cases'][cid] for cid in run['case_ids'] if cid in mapping['cases']]
         
-        try:
-            # Get tests in this run
-            cursor.execute('SELECT case_id FROM tests WHERE run_id = ?', (run['id'],))
-            case_ids = [r[0] for r in cursor.fetchall()]
-            
-            # Get corresponding Xray test keys
-            test_keys = [mapping['cases'][cid] for cid in case_ids if cid in mapping['cases']]
-            
-            # Build description
-            description = f"*Imported from TestRail Run (ID: {run['id']})*\n\n"
-            if run.get('description'):
-                description += f"{run['description']}\n\n"
-            
-            description += f"*Statistics:*\n"
-            description += f"- Passed: {run.get('passed_count', 0)}\n"
-            description += f"- Failed: {run.get('failed_count', 0)}\n"
-            description += f"- Blocked: {run.get('blocked_count', 0)}\n"
-            description += f"- Untested: {run.get('untested_count', 0)}\n"
-            description += f"- Retest: {run.get('retest_count', 0)}\n"
-            
-            if run.get('created_on'):
-                created_date = datetime.fromtimestamp(run['created_on']).strftime('%Y-%m-%d %H:%M:%S')
-                description += f"\n*Created:* {created_date}\n"
-            
-            # Create Test Execution
-            test_exec = client.create_test_execution(
-                project_key=project_key,
-                summary=run['name'],
-                description=description,
-                tests=test_keys
-            )
-            
-            mapping['runs'][run['id']] = test_exec['key']
+        if run['id'] in mapping['runs']:
+            # Created by an earlier run: only add the Tests created since
+            new_keys = [mapping['cases'][cid] for cid in run['case_ids']
+                        if cid in mapping['cases'] and cid not in resumed_cases]
+            if new_keys:
+                client.add_tests_to_execution(mapping['runs'][run['id']], new_keys)
+            return 'resumed'
+        
+        # Build description
+        description = f"*Imported from TestRail Run (ID: {run['id']})*\n\n"
+        if run.get('description'):
+            description += f"{run['description']}\n\n"
+        
+        description += f"*Statistics:*\n"
+        description += f"- Passed: {run.get('passed_count', 0)}\n"
+        description += f"- Failed: {run.get('failed_count', 0)}\n"
+        description += f"- Blocked: {run.get('blocked_count', 0)}\n"
+        description += f"- Untested: {run.get('untested_count', 0)}\n"
+        description += f"- Retest: {run.get('retest_count', 0)}\n"
+        
+        if run.get('created_on'):
+            created_date = datetime.fromtimestamp(run['created_on']).strftime('%Y-%m-%d %H:%M:%S')
+            description += f"\n*Created:* {created_date}\n"
+        
+        # Create Test Execution
+        test_exec = client.create_test_execution(
+            project_key=project_key,
+            summary=run['name'],
+            description=description,
+            tests=test_keys
+        )
+        
+        mapping['runs'][run['id']] = test_exec['key']
+        if checkpoint:
+            checkpoint.record('run', run['id'], test_exec['key'])
+        return 'created'
+        
+    except Exception as e:
+        print(f"  ❌ Error migrating run {run['id']}: {e}")
+        return None
+
+def migrate_test_runs(client, project_key, mapping, checkpoint=None):
+    """Migrate test runs to Xray Test Executions"""
+    print("\n[3/5] Migrating Test Runs as Test Executions...")
+    
+    db = get_db_connection()
+    cursor = db.cursor()
+    runs = load_runs(cursor)
+    db.close()
+    
+    run_count = 0
+    resumed_count = 0
+    resumed_cases = checkpoint.done('case') if checkpoint else {}
+    for run in runs:
+        outcome = migrate_run(client, project_key, run, mapping, checkpoint, resumed_cases)
+        if outcome == 'resumed':
+            resumed_count += 1
+        elif outcome == 'created':
             run_count += 1
-            
             if run_count % 5 == 0:
                 print(f"  ✓ Migrated {run_count} test runs...")
-            
-        except Exception as e:
-            print(f"  ❌ Error migrating run {run['id']}: {e}")
     
-    db.close()
+    if checkpoint:
+        checkpoint.flush()
+    if resumed_count:
+        print(f"  ↻ Skipped {resumed_count} run(s) already migrated")
     print(f"✓ Migrated {run_count} test runs as test executions")
     return mapping
 
-def migrate_test_results(client, project_key, mapping):
-    """Migrate test results to Xray Test Execution results"""
-    print("\n[4/5] Migrating Test Results...")
-    
-    db = get_db_connection()
-    cursor = db.cursor()
+def load_results(cursor):
+    """Return {run_id: [result dicts]} ready to push, keyed by TestRail IDs
     
+    Each result holds 'case_id', 'status', 'comment' and 'defects'; Jira
+    keys are looked up when the results are pushed.
+    """
     # Get statuses for mapping
     cursor.execute('SELECT * FROM statuses')
     statuses = [dict(zip([desc[0] for desc in cursor.description], row)) 
                 for row in cursor.fetchall()]
     
-    # Get all tests with their results
-    cursor.execute('''
-        SELECT t.*, r.status_id, r.comment, r.defects, r.created_on as result_date
-        FROM tests t
-        LEFT JOIN results r ON t.id = r.test_id
-        WHERE r.id IS NOT NULL
-        ORDER BY t.run_id, r.created_on
-    ''')
+    if COLLAPSE_RESULT_HISTORY:
+        # Xray keeps a single status per test in an execution, so pick the
+        # effective (latest) result of every (run, case) in SQL and push only
+        # that instead of replaying each retest
+        cursor.execute('''
+            SELECT run_id, case_id, status_id, comment, defects, result_date, result_count
+            FROM (
+                SELECT t.run_id, t.case_id, r.status_id, r.comment, r.defects,
+                       r.created_on as result_date,
+                       COUNT(*) OVER w as result_count,
+                       ROW_NUMBER() OVER (w ORDER BY r.created_on DESC, r.id DESC) as result_rank
+                FROM tests t
+                JOIN results r ON t.id = r.test_id
+                WINDOW w AS (PARTITION BY t.run_id, t.case_id)
+            )
+            WHERE result_rank = 1
+            ORDER BY run_id, result_date
+        ''')
+    else:
+        # Get all tests with their results
+        cursor.execute('''
+            SELECT t.*, r.status_id, r.comment, r.defects, r.created_on as result_date
+            FROM tests t
+            LEFT JOIN results r ON t.id = r.test_id
+            WHERE r.id IS NOT NULL
+            ORDER BY t.run_id, r.created_on
+        ''')
     
     test_results = cursor.fetchall()
     columns = [desc[0] for desc in cursor.description]
     
-    # Group results by test execution for batch processing
-    results_by_execution = {}
+    # Earlier results per (run, case), folded into the final comment
+    history = {}
+    if COLLAPSE_RESULT_HISTORY and CONSOLIDATE_RESULT_COMMENTS:
+        cursor.execute('''
+            SELECT t.run_id, t.case_id, r.status_id, r.comment, r.created_on
+            FROM tests t
+            JOIN results r ON t.id = r.test_id
+            ORDER BY t.run_id, t.case_id, r.created_on, r.id
+        ''')
+        for run_id, case_id, status_id, comment, created_on in cursor.fetchall():
+            history.setdefault((run_id, case_id), []).append((status_id, comment, created_on))
+    
+    # Group results by run for batch processing
+    results_by_run = {}
     for row in test_results:
         test = dict(zip(columns, row))
-        run_key = mapping['runs'].get(test['run_id'])
-        test_key = mapping['cases'].get(test['case_id'])
-        
-        if not run_key or not test_key:
-            continue
-            
-        if run_key not in results_by_execution:
-            results_by_execution[run_key] = []
         
         # Parse defects - only include if there are actual defect keys
         defects_str = test.get('defects') or ''
@@ -742,39 +1234,112 @@ def migrate_test_results(client, project_key, mapping):
             if not defects_list:  # If list is empty after filtering, set to None
                 defects_list = None
         
-        results_by_execution[run_key].append({
-            'test_key': test_key,
+        comment = test.get('comment')
+        if (test['run_id'], test['case_id']) in history and test['result_count'] > 1:
+            comment = consolidate_result_comments(history[(test['run_id'], test['case_id'])], statuses)
+        
+        results_by_run.setdefault(test['run_id'], []).append({
+            'case_id': test['case_id'],
             'status': map_testrail_status_to_xray(test['status_id'], statuses),
-            'comment': test.get('comment'),
+            'comment': comment,
             'defects': defects_list
         })
     
+    return results_by_run
+
+def push_run_results(client, run_id, results, mapping, checkpoint=None, resumed_tests=()):
+    """Push the results of one run into its Test Execution
+    
+    Results of cases without a Test are dropped. A run whose results were
+    pushed by an earlier run is skipped, apart from Tests created since.
+    
+    Returns:
+        (migrated, skipped, resumed)
+    """
+    run_key = mapping['runs'].get(run_id)
+    if not run_key:
+        return 0, 0, False
+    
+    results = [dict(result, test_key=mapping['cases'][result['case_id']])
+               for result in results if result['case_id'] in mapping['cases']]
+    
+    if checkpoint and checkpoint.done('run_results').get(run_id) == run_key:
+        # Pushed by an earlier run, apart from Tests created since then
+        results = [result for result in results if result['test_key'] not in resumed_tests]
+        if not results:
+            return 0, 0, True
+    
+    migrated = 0
+    skipped = 0
+    if not client.bulk_results:
+        migrated, skipped = update_results_individually(client, run_key, results)
+    else:
+        # Xray keeps one status per test run, so only the latest result of
+        # each test needs to be imported (results are ordered by date)
+        latest_results = list({result['test_key']: result for result in results}.values())
+        
+        for start in range(0, len(latest_results), BULK_RESULTS_CHUNK_SIZE):
+            chunk = latest_results[start:start + BULK_RESULTS_CHUNK_SIZE]
+            
+            if client.bulk_results:
+                try:
+                    client.import_execution_results(run_key, chunk)
+                    migrated += len(chunk)
+                    print(f"  ✓ Imported {len(chunk)} results into {run_key}")
+                    continue
+                except Exception as e:
+                    status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+                    if status_code in (404, 405, 415):
+                        # Endpoint not available on this server - stop trying
+                        print(f"  ⚠ Bulk result import not supported, using per-test updates")
+                        client.bulk_results = False
+                    else:
+                        print(f"  ⚠ Bulk result import rejected for {run_key}, using per-test updates for this chunk")
+            
+            chunk_migrated, chunk_skipped = update_results_individually(client, run_key, chunk, migrated)
+            migrated += chunk_migrated
+            skipped += chunk_skipped
+    
+    if checkpoint:
+        checkpoint.record('run_results', run_id, run_key)
+    return migrated, skipped, False
+
+def resumed_test_keys(mapping, checkpoint):
+    """Return the keys of Tests that were created by an earlier run"""
+    resumed_cases = checkpoint.done('case') if checkpoint else {}
+    return {mapping['cases'][case_id] for case_id in resumed_cases if case_id in mapping['cases']}
+
+def migrate_test_results(client, project_key, mapping, checkpoint=None):
+    """Migrate test results to Xray Test Execution results
+    
+    A run is recorded in the checkpoint ('run_results') once all of its
+    results were pushed, so a resumed migration skips it.
+    """
+    print("\n[4/5] Migrating Test Results...")
+    
+    db = get_db_connection()
+    cursor = db.cursor()
+    results_by_run = load_results(cursor)
+    db.close()
+    
     result_count = 0
     skipped_count = 0
+    resumed_count = 0
+    resumed_tests = resumed_test_keys(mapping, checkpoint)
     
     # Process each test execution
-    for run_key, results in results_by_execution.items():
-        for result in results:
-            try:
-                # Update test execution status
-                client.update_test_execution_status(
-                    test_execution_key=run_key,
-                    test_key=result['test_key'],
-                    status=result['status'],
-                    comment=result['comment'],
-                    defects=result['defects']
-                )
-                
-                result_count += 1
-                
-                if result_count % 20 == 0:
-                    print(f"  ✓ Migrated {result_count} test results...")
-                    
-            except Exception as e:
-                # Test might not be in execution - skip silently
-                skipped_count += 1
+    for run_id, results in results_by_run.items():
+        migrated, skipped, resumed = push_run_results(client, run_id, results, mapping,
+                                                      checkpoint, resumed_tests)
+        result_count += migrated
+        skipped_count += skipped
+        resumed_count += resumed
     
-    db.close()
+    if checkpoint:
+        checkpoint.flush()
+    
+    if resumed_count:
+        print(f"  ↻ Skipped {resumed_count} run(s) whose results were already migrated")
     
     if skipped_count > 0:
         print(f"✓ Migrated {result_count} test results ({skipped_count} skipped)")
@@ -783,7 +1348,54 @@ def migrate_test_results(client, project_key, mapping):
     
     return mapping
 
-def migrate_milestones(client, project_key, mapping):
+def consolidate_result_comments(history, statuses):
+    """Fold a test's result history into one comment, latest result first
+    
+    Args:
+        history: (status_id, comment, created_on) tuples, oldest first.
+        statuses: Rows of the statuses table, used for status labels.
+    """
+    labels = {status['id']: status['label'] for status in statuses}
+    final_status, final_comment, _ = history[-1]
+    
+    lines = [final_comment] if final_comment else []
+    lines.append(f"*TestRail result history ({len(history)} results):*")
+    for status_id, comment, created_on in reversed(history):
+        when = datetime.fromtimestamp(created_on).strftime('%Y-%m-%d %H:%M') if created_on else 'unknown date'
+        line = f"- {when}: {labels.get(status_id, status_id)}"
+        if comment:
+            line += f" - {' '.join(comment.split())}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+def update_results_individually(client, run_key, results, progress_offset=0):
+    """Push results one PUT at a time; returns (migrated, skipped)"""
+    migrated = 0
+    skipped = 0
+    
+    for result in results:
+        # Update test execution status (None means the update failed, e.g.
+        # the test is not part of the execution)
+        response = client.update_test_execution_status(
+            test_execution_key=run_key,
+            test_key=result['test_key'],
+            status=result['status'],
+            comment=result['comment'],
+            defects=result['defects']
+        )
+        
+        if response is None:
+            skipped += 1
+            continue
+        
+        migrated += 1
+        
+        if (progress_offset + migrated) % 20 == 0:
+            print(f"  ✓ Migrated {progress_offset + migrated} test results...")
+    
+    return migrated, skipped
+
+def migrate_milestones(client, project_key, mapping, checkpoint=None):
     """Migrate milestones as Jira versions/releases"""
     print("\n[5/5] Migrating Milestones as Versions...")
     
@@ -819,12 +1431,17 @@ def migrate_milestones(client, project_key, mapping):
     
     for row in milestones:
         milestone = dict(zip(columns, row))
+        if milestone['id'] in mapping['milestones']:
+            skipped_count += 1
+            continue
         
         try:
             # Check if version already exists
             if milestone['name'] in existing_versions:
                 print(f"  ⚠ Skipping milestone '{milestone['name']}' - version already exists")
                 mapping['milestones'][milestone['id']] = existing_versions[milestone['name']]
+                if checkpoint:
+                    checkpoint.record('milestone', milestone['id'], existing_versions[milestone['name']])
                 skipped_count += 1
                 continue
             
@@ -847,11 +1464,15 @@ def migrate_milestones(client, project_key, mapping):
             version = client._make_request('POST', 'version', data=version_data)
             
             mapping['milestones'][milestone['id']] = version['id']
+            if checkpoint:
+                checkpoint.record('milestone', milestone['id'], version['id'])
             milestone_count += 1
             
         except Exception as e:
             print(f"  ❌ Error migrating milestone {milestone['id']}: {e}")
     
+    if checkpoint:
+        checkpoint.flush()
     db.close()
     
     if skipped_count > 0:
@@ -861,8 +1482,126 @@ def migrate_milestones(client, project_key, mapping):
     
     return mapping
 
-def migrate_attachments(client, project_key, mapping):
-    """Migrate attachments from TestRail to Jira"""
+def upload_attachment(client, attachment, jira_key, checkpoint=None, progress=None):
+    """Upload one downloaded TestRail attachment to a Jira issue
+    
+    Nothing is transferred when the issue already has the attachment: either
+    the Jira attachment ID recorded by an earlier run, or a file with the
+    same name and size.
+    
+    Returns:
+        'uploaded', 'resumed' when an earlier run already uploaded it to
+        jira_key, or 'skipped'.
+    """
+    if checkpoint and checkpoint.done('attachment').get(attachment['id']) == jira_key:
+        return 'resumed'
+    
+    # Check if file exists
+    local_path = attachment['local_path']
+    if not os.path.exists(local_path):
+        print(f"  Warning: File not found: {local_path}")
+        return 'skipped'
+    
+    try:
+        remote = client.get_attachment_index(jira_key)
+    except Exception as e:
+        print(f"  Warning: Could not list attachments of {jira_key}: {e}")
+        remote = {}
+    
+    # Earlier migrations named uploads after the local file
+    size = os.path.getsize(local_path)
+    existing_id = attachment.get('jira_attachment_id')
+    if existing_id not in remote.values():
+        existing_id = next((remote[(name, size)] for name in (attachment['filename'], os.path.basename(local_path))
+                            if (name, size) in remote), None)
+    if existing_id:
+        record_attachment_upload(checkpoint, attachment, jira_key, existing_id)
+        return 'resumed'
+    
+    try:
+        # Upload attachment
+        result = client.add_attachment(jira_key, local_path, filename=attachment['filename'], progress=progress)
+    except Exception as e:
+        print(f"  ❌ Error uploading attachment {attachment['filename']} to {jira_key}: {e}")
+        return 'skipped'
+    if not result:
+        return 'skipped'
+    record_attachment_upload(checkpoint, attachment, jira_key, result[0]['id'])
+    return 'uploaded'
+
+def record_attachment_upload(checkpoint, attachment, jira_key, jira_attachment_id):
+    """Checkpoint an attachment that is on the Jira issue
+    
+    A failed commit only delays the rows: they stay queued and are written
+    by the next flush, and the upload itself still counts.
+    """
+    if not checkpoint:
+        return
+    try:
+        checkpoint.record('attachment', attachment['id'], jira_key)
+        checkpoint.record_upload(attachment['id'], jira_attachment_id)
+    except sqlite3.Error as e:
+        print(f"  Warning: Could not checkpoint attachment {attachment['filename']} on {jira_key}: {e}")
+
+def load_attachment_plan(cursor, mapping):
+    """Resolve every attachment to the Jira issue it goes to
+    
+    One query finds the owner of every attachment: case attachments go to
+    the case's Test, result attachments to the Test Execution of the
+    result's run. Keys come from this migration's mapping (which holds the
+    checkpointed keys when resuming), never from rows an earlier migration
+    left in jira_mappings.
+    
+    Returns:
+        (list of (attachment dict, jira_key or None), total bytes of the
+        mapped attachments). The rows are read completely so no read
+        transaction stays open while the checkpoint commits.
+    """
+    # Get the selected project ID from migration config
+    testrail_project_id = migration_config.get('testrail_project_id') if migration_config else None
+    
+    project_filter = ''
+    params = ()
+    if testrail_project_id:
+        print(f"  Filtering attachments for TestRail project ID: {testrail_project_id}")
+        project_filter = 'WHERE COALESCE(su.project_id, ru.project_id) = ?'
+        params = (testrail_project_id,)
+    
+    cursor.execute(f'''
+        SELECT a.*, CASE a.entity_type WHEN 'case' THEN a.entity_id ELSE t.run_id END as owner_id
+        FROM attachments a
+        LEFT JOIN results r ON a.entity_type = 'result' AND r.id = a.entity_id
+        LEFT JOIN tests t ON t.id = r.test_id
+        LEFT JOIN cases c ON a.entity_type = 'case' AND c.id = a.entity_id
+        LEFT JOIN suites su ON su.id = c.suite_id
+        LEFT JOIN runs ru ON ru.id = t.run_id
+        {project_filter}
+        ORDER BY a.entity_type, a.entity_id
+    ''', params)
+    columns = [desc[0] for desc in cursor.description]
+    
+    plan = []
+    plan_bytes = 0
+    for row in cursor.fetchall():
+        attachment = dict(zip(columns, row))
+        owner_id = attachment.pop('owner_id')
+        owners = mapping['cases'] if attachment['entity_type'] == 'case' else mapping['runs']
+        # Mappings loaded from JSON are keyed by strings
+        jira_key = owners.get(owner_id) or owners.get(str(owner_id))
+        if jira_key:
+            plan_bytes += attachment['size'] or 0
+        plan.append((attachment, jira_key))
+    return plan, plan_bytes
+
+def migrate_attachments(client, project_key, mapping, checkpoint=None):
+    """Migrate attachments from TestRail to Jira
+    
+    Every attachment is resolved to the issue its case or run was migrated
+    to in mapping, and fed to up to ATTACHMENT_WORKERS concurrent
+    streaming uploads. Uploaded attachments are
+    recorded in the checkpoint ('attachment' -> issue key) and skipped by a
+    resumed migration.
+    """
     print("\n[6/6] Migrating Attachments...")
     
     db = get_db_connection()
@@ -875,68 +1614,254 @@ def migrate_attachments(client, project_key, mapping):
         db.close()
         return mapping
     
-    # Get all attachments
-    cursor.execute('SELECT * FROM attachments ORDER BY entity_type, entity_id')
-    attachments = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
+    # Adds attachments.jira_attachment_id to databases that predate it
+    create_mapping_table(cursor)
+    db.commit()
+    plan, plan_bytes = load_attachment_plan(cursor, mapping)
+    # The checkpoint commits through its own connection during the uploads
+    db.close()
     
-    attachment_count = 0
-    skipped_count = 0
+    counts = {'uploaded': 0, 'resumed': 0, 'skipped': 0}
+    lock = threading.Lock()
+    progress = UploadProgress(plan_bytes)
+    workers = max(1, ATTACHMENT_WORKERS)
+    # Bounds the uploads queued ahead of the workers
+    slots = threading.BoundedSemaphore(workers * 2)
     
-    for row in attachments:
-        attachment = dict(zip(columns, row))
-        entity_type = attachment['entity_type']
-        entity_id = attachment['entity_id']
-        local_path = attachment['local_path']
-        
-        # Determine which Jira issue to attach to
-        jira_key = None
-        
-        if entity_type == 'case':
-            # Attach to test case
-            jira_key = mapping['cases'].get(entity_id)
-        elif entity_type == 'result':
-            # Find which test execution this result belongs to
-            # Get the test_id for this result
-            cursor.execute('SELECT test_id FROM results WHERE id = ?', (entity_id,))
-            result = cursor.fetchone()
-            if result:
-                test_id = result[0]
-                # Get the run_id for this test
-                cursor.execute('SELECT run_id FROM tests WHERE id = ?', (test_id,))
-                test = cursor.fetchone()
-                if test:
-                    run_id = test[0]
-                    jira_key = mapping['runs'].get(run_id)
-        
-        if not jira_key:
-            skipped_count += 1
-            continue
-        
-        # Check if file exists
-        if not os.path.exists(local_path):
-            print(f"  Warning: File not found: {local_path}")
-            skipped_count += 1
-            continue
-        
+    def upload(attachment, jira_key):
         try:
-            # Upload attachment
-            result = client.add_attachment(jira_key, local_path)
-            if result:
-                attachment_count += 1
-                if attachment_count % 10 == 0:
-                    print(f"  Uploaded {attachment_count} attachments...")
+            outcome = upload_attachment(client, attachment, jira_key, checkpoint, progress)
         except Exception as e:
             print(f"  ❌ Error uploading attachment {attachment['filename']} to {jira_key}: {e}")
-            skipped_count += 1
+            outcome = 'skipped'
+        finally:
+            slots.release()
+        with lock:
+            counts[outcome] += 1
+            if outcome == 'uploaded' and counts['uploaded'] % 10 == 0:
+                print(f"  Uploaded {counts['uploaded']} attachments...")
+    
+    if plan:
+        print(f"  Uploading up to {format_size(plan_bytes)} of attachments with {workers} workers")
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for attachment, jira_key in plan:
+            if not jira_key:
+                with lock:
+                    counts['skipped'] += 1
+                continue
+            
+            slots.acquire()
+            pool.submit(upload, attachment, jira_key)
+    
+    if checkpoint:
+        checkpoint.flush()
+    
+    print_attachment_summary(counts)
+    return mapping
+
+def print_attachment_summary(counts):
+    if counts['resumed']:
+        print(f"  ↻ Skipped {counts['resumed']} attachment(s) already uploaded")
+    
+    if counts['skipped'] > 0:
+        print(f"✓ Migrated {counts['uploaded']} attachments ({counts['skipped']} skipped)")
+    else:
+        print(f"✓ Migrated {counts['uploaded']} attachments")
+
+def load_attachment_owners(cursor):
+    """Group attachments by owning case and by the run of their result
+    
+    Returns:
+        ({case_id: [attachment]}, {run_id: [attachment]})
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='attachments'")
+    if not cursor.fetchone():
+        return {}, {}
+    
+    cursor.execute('''
+        SELECT a.*, t.run_id as owner_run_id
+        FROM attachments a
+        LEFT JOIN results r ON a.entity_type = 'result' AND r.id = a.entity_id
+        LEFT JOIN tests t ON t.id = r.test_id
+        ORDER BY a.entity_type, a.entity_id
+    ''')
+    columns = [desc[0] for desc in cursor.description]
+    
+    by_case = {}
+    by_run = {}
+    for row in cursor.fetchall():
+        attachment = dict(zip(columns, row))
+        if attachment['entity_type'] == 'case':
+            by_case.setdefault(attachment['entity_id'], []).append(attachment)
+        elif attachment['owner_run_id'] is not None:
+            by_run.setdefault(attachment['owner_run_id'], []).append(attachment)
+    return by_case, by_run
+
+def migrate_pipelined(client, project_key, mapping, workers=4, checkpoint=None):
+    """Migrate everything as one dependency graph instead of strict stages
     
+    Milestones start right away. A suite's Test Set is created as soon as
+    the chunks holding its cases are done, a run's Test Execution once its
+    cases exist, and each execution's results and attachments follow it,
+    so network latency of the stages overlaps (see task_graph.py).
+    """
+    print("\nMigrating with the pipelined scheduler...")
+    
+    db = get_db_connection()
+    cursor = db.cursor()
+    errors = []
+    pending, resumed_count = prepare_tests(load_cases(cursor), mapping, errors)
+    suites = load_suites(cursor)
+    runs = load_runs(cursor)
+    results_by_run = load_results(cursor)
+    case_attachments, run_attachments = load_attachment_owners(cursor)
     db.close()
     
-    if skipped_count > 0:
-        print(f"✓ Migrated {attachment_count} attachments ({skipped_count} skipped)")
+    if resumed_count:
+        print(f"  ↻ Skipping {resumed_count} case(s) already migrated")
+    
+    resumed_cases = checkpoint.done('case') if checkpoint else {}
+    resumed_tests = resumed_test_keys(mapping, checkpoint)
+    
+    lock = threading.Lock()
+    counts = {'cases': 0, 'suites': 0, 'runs': 0, 'results': 0, 'results_skipped': 0,
+              'uploaded': 0, 'resumed': 0, 'skipped': 0}
+    
+    def count(key, amount=1):
+        with lock:
+            counts[key] += amount
+            return counts[key]
+    
+    def create_cases(batch):
+        outcomes = create_test_chunk(client, project_key, batch)
+        with lock:
+            created = record_test_outcomes(outcomes, mapping, errors, checkpoint)
+        print(f"  ✓ Migrated {count('cases', created)} test cases...")
+    
+    def create_suite(suite):
+        if migrate_suite(client, project_key, suite, mapping, checkpoint, resumed_cases) == 'created':
+            print(f"  ✓ Test Set {mapping['suites'][suite['id']]} created for suite {suite['id']}")
+            count('suites')
+    
+    def create_run(run):
+        if migrate_run(client, project_key, run, mapping, checkpoint, resumed_cases) == 'created':
+            print(f"  ✓ Test Execution {mapping['runs'][run['id']]} created for run {run['id']}")
+            count('runs')
+    
+    def push_results(run_id):
+        migrated, skipped, _ = push_run_results(client, run_id, results_by_run[run_id], mapping,
+                                                checkpoint, resumed_tests)
+        count('results', migrated)
+        count('results_skipped', skipped)
+    
+    def upload(attachments, issue_keys, owner_key):
+        for attachment in attachments:
+            jira_key = issue_keys.get(attachment[owner_key])
+            count(upload_attachment(client, attachment, jira_key, checkpoint) if jira_key else 'skipped')
+    
+    graph = TaskGraph(workers)
+    graph.add('milestones', migrate_milestones, client, project_key, mapping, checkpoint)
+    
+    # Tests in bulk chunks; remember which chunk creates each case
+    case_tasks = {}
+    for index, start in enumerate(range(0, len(pending), JIRA_BULK_CREATE_SIZE)):
+        batch = pending[start:start + JIRA_BULK_CREATE_SIZE]
+        task = graph.add(f'cases:{index}', create_cases, batch)
+        attachments = [a for case, _, _ in batch for a in case_attachments.pop(case['id'], [])]
+        if attachments:
+            graph.add(f'case-attachments:{index}', upload, attachments, mapping['cases'], 'entity_id',
+                      deps=[task])
+        for case, _, _ in batch:
+            case_tasks[case['id']] = task
+    
+    # Attachments of cases migrated by an earlier run have nothing to wait for
+    leftover = [a for attachments in case_attachments.values() for a in attachments]
+    if leftover:
+        graph.add('case-attachments:resumed', upload, leftover, mapping['cases'], 'entity_id')
+    
+    for suite in suites:
+        deps = {case_tasks[cid] for cid in suite['case_ids'] if cid in case_tasks}
+        graph.add(f"suite:{suite['id']}", create_suite, suite, deps=deps)
+    
+    for run in runs:
+        deps = {case_tasks[cid] for cid in run['case_ids'] if cid in case_tasks}
+        task = graph.add(f"run:{run['id']}", create_run, run, deps=deps)
+        if run['id'] in results_by_run:
+            graph.add(f"results:{run['id']}", push_results, run['id'], deps=[task])
+        if run['id'] in run_attachments:
+            graph.add(f"run-attachments:{run['id']}", upload, run_attachments[run['id']],
+                      mapping['runs'], 'owner_run_id', deps=[task])
+    
+    print(f"  Scheduling {len(graph)} tasks on {workers} workers")
+    task_errors = graph.run()
+    
+    if checkpoint:
+        checkpoint.flush()
+    
+    print(f"\n✓ Migrated {counts['cases']} test cases, {counts['suites']} test sets and "
+          f"{counts['runs']} test executions")
+    print_case_errors(errors)
+    if counts['results_skipped'] > 0:
+        print(f"✓ Migrated {counts['results']} test results ({counts['results_skipped']} skipped)")
     else:
-        print(f"✓ Migrated {attachment_count} attachments")
+        print(f"✓ Migrated {counts['results']} test results")
+    print_attachment_summary(counts)
+    for name, error in task_errors.items():
+        print(f"  ❌ Task {name} failed: {error}")
+    return mapping
+
+# Description markers written by migrate_test_cases, migrate_test_suites and
+# migrate_test_runs, e.g. "*Imported from TestRail Suite (ID: 3)*"
+TESTRAIL_MARKER = re.compile(r'\*Imported from TestRail (?:(Suite|Run) )?\(ID: (\d+)\)\*')
+MARKER_ENTITY_TYPES = {None: 'case', 'Suite': 'suite', 'Run': 'run'}
+
+def reconcile_mappings(client, project_key, mapping):
+    """Rebuild the case/suite/run mapping from the issues already in Jira
+    
+    Streams the project's Tests, Test Sets and Test Executions through
+    paginated JQL (description field only), parses the TestRail ID markers
+    and bulk-loads them into jira_mappings and migration_mapping.json. When
+    several issues claim the same TestRail ID, the oldest key wins.
+    """
+    print("\nReconciling mappings from Jira...")
+    
+    jql = (f'project = "{project_key}" AND issuetype in '
+           f'("{XRAY_TEST_TYPE}", "{XRAY_TEST_SET_TYPE}", "{XRAY_TEST_EXECUTION_TYPE}") '
+           f'ORDER BY key ASC')
+    entity_keys = {entity_type: key for key, entity_type in MAPPING_ENTITY_TYPES.items()}
+    
+    scanned = 0
+    duplicates = 0
+    checkpoint = MappingCheckpoint(batch_size=1000)
+    try:
+        for issue in client.iter_search_issues(jql, fields=['description']):
+            scanned += 1
+            if scanned % 5000 == 0:
+                print(f"  Scanned {scanned} issues...")
+            
+            match = TESTRAIL_MARKER.search(issue['fields'].get('description') or '')
+            if not match:
+                continue
+            
+            entity_type = MARKER_ENTITY_TYPES[match.group(1)]
+            testrail_id = int(match.group(2))
+            entity_mapping = mapping[entity_keys[entity_type]]
+            if testrail_id in entity_mapping:
+                duplicates += 1
+                continue
+            
+            entity_mapping[testrail_id] = issue['key']
+            checkpoint.record(entity_type, testrail_id, issue['key'])
+    finally:
+        checkpoint.close()
+    
+    save_mapping(mapping)
     
+    print(f"✓ Scanned {scanned} issues: {len(mapping['cases'])} tests, "
+          f"{len(mapping['suites'])} test sets and {len(mapping['runs'])} executions mapped")
+    if duplicates:
+        print(f"  ⚠ {duplicates} issue(s) duplicate an already mapped TestRail ID and were ignored")
     return mapping
 
 def save_mapping(mapping, filename='migration_mapping.json'):
@@ -944,14 +1869,12 @@ def save_mapping(mapping, filename='migration_mapping.json'):
     with open(filename, 'w') as f:
         json.dump(mapping, f, indent=2)
 
-def store_mapping_in_database(mapping):
-    """Store Jira issue mapping in the database for future reference"""
-    print("\nStoring mappings in database...")
+def create_mapping_table(cursor):
+    """Create the jira_mappings table if it doesn't exist
     
-    db = get_db_connection()
-    cursor = db.cursor()
-    
-    # Create mapping table if it doesn't exist
+    Also adds attachments.jira_attachment_id to databases imported before
+    the column existed.
+    """
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS jira_mappings (
             testrail_entity_type TEXT,
@@ -961,6 +1884,92 @@ def store_mapping_in_database(mapping):
         )
     ''')
     
+    cursor.execute('PRAGMA table_info(attachments)')
+    columns = [row[1] for row in cursor.fetchall()]
+    if columns and 'jira_attachment_id' not in columns:
+        cursor.execute('ALTER TABLE attachments ADD COLUMN jira_attachment_id TEXT')
+
+class MappingCheckpoint:
+    """Persist mapping rows to jira_mappings while the migration runs
+    
+    Rows are buffered and committed in small transactions, so a crash loses
+    at most batch_size rows. With resume=True the rows written by an earlier
+    run are loaded back, letting every stage skip what already exists in
+    Jira.
+    """
+    
+    def __init__(self, db_path=DB_PATH, batch_size=CHECKPOINT_BATCH_SIZE, resume=False):
+        self.batch_size = max(1, batch_size)
+        self.resume = resume
+        self._lock = threading.Lock()
+        self._pending = []
+        self._uploads = []
+        self._done = {}
+        
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        create_mapping_table(self._db.cursor())
+        self._db.commit()
+        
+        if resume:
+            rows = self._db.execute(
+                'SELECT testrail_entity_type, testrail_entity_id, jira_key FROM jira_mappings')
+            for entity_type, testrail_id, jira_key in rows:
+                self._done.setdefault(entity_type, {})[testrail_id] = jira_key
+    
+    def done(self, entity_type):
+        """Return {TestRail ID: Jira key} recorded by an earlier run (empty unless resuming)"""
+        return self._done.get(entity_type, {})
+    
+    def record(self, entity_type, testrail_id, jira_key):
+        """Queue one mapping row, committing once batch_size rows are pending"""
+        with self._lock:
+            self._pending.append((entity_type, testrail_id, str(jira_key)))
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+    
+    def record_upload(self, attachment_id, jira_attachment_id):
+        """Queue attachments.jira_attachment_id of an uploaded attachment"""
+        with self._lock:
+            self._uploads.append((str(jira_attachment_id), attachment_id))
+            if len(self._uploads) >= self.batch_size:
+                self._flush()
+    
+    def flush(self):
+        """Commit all pending rows"""
+        with self._lock:
+            self._flush()
+    
+    def close(self):
+        self.flush()
+        self._db.close()
+    
+    def _flush(self):
+        if not self._pending and not self._uploads:
+            return
+        try:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO jira_mappings (testrail_entity_type, testrail_entity_id, jira_key) VALUES (?, ?, ?)',
+                self._pending
+            )
+            self._db.executemany('UPDATE attachments SET jira_attachment_id = ? WHERE id = ?', self._uploads)
+            self._db.commit()
+        except sqlite3.Error:
+            # Keep the rows queued for the next flush and release the write lock
+            self._db.rollback()
+            raise
+        self._pending = []
+        self._uploads = []
+
+def store_mapping_in_database(mapping):
+    """Store Jira issue mapping in the database for future reference"""
+    print("\nStoring mappings in database...")
+    
+    db = get_db_connection()
+    cursor = db.cursor()
+    
+    # Create mapping table if it doesn't exist
+    create_mapping_table(cursor)
+    
     total_count = 0
     
     # Insert case mappings
@@ -999,6 +2008,18 @@ def store_mapping_in_database(mapping):
 # ============================================================================
 
 def main():
+    parser = argparse.ArgumentParser(description='Migrate the imported TestRail data to Xray')
+    parser.add_argument('--workers', type=int, default=MIGRATION_WORKERS,
+                        help='number of concurrent workers creating tests (default: 1)')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip everything already recorded in jira_mappings by an earlier run')
+    parser.add_argument('--reconcile', action='store_true',
+                        help='rebuild jira_mappings from the issues in Jira and exit')
+    parser.add_argument('--pipelined', action='store_true', default=PIPELINED_MIGRATION,
+                        help='start each entity as soon as the issues it needs exist')
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+    
     print("=" * 80)
     print("TESTRAIL TO XRAY MIGRATION")
     print("=" * 80)
@@ -1009,7 +2030,8 @@ def main():
     
     # Initialize client
     print("\nConnecting to Jira/Xray...")
-    client = JiraXrayClient(JIRA_URL, JIRA_USERNAME, JIRA_PASSWORD)
+    client = JiraXrayClient(JIRA_URL, JIRA_USERNAME, JIRA_PASSWORD,
+                            pool_maxsize=max(workers, ATTACHMENT_WORKERS))
     
     # Verify project exists
     try:
@@ -1029,14 +2051,36 @@ def main():
         'plans': {}       # TestRail plan_id -> Xray test plan key (if needed)
     }
     
+    if args.reconcile:
+        try:
+            reconcile_mappings(client, JIRA_PROJECT_KEY, mapping)
+        finally:
+            client.close()
+        return
+    
+    # Databases imported before the indexes existed get them now
+    if optimize_database(DB_PATH):
+        print("\n✓ Indexed the local database")
+    
+    # Every created issue is checkpointed to jira_mappings right away
+    checkpoint = MappingCheckpoint(resume=args.resume)
+    if args.resume:
+        for key, entity_type in MAPPING_ENTITY_TYPES.items():
+            mapping[key].update(checkpoint.done(entity_type))
+        print(f"\n↻ Resuming: {len(mapping['cases'])} tests, {len(mapping['suites'])} test sets, "
+              f"{len(mapping['runs'])} executions and {len(mapping['milestones'])} versions already migrated")
+    
     # Perform migration
     try:
-        mapping = migrate_test_cases(client, JIRA_PROJECT_KEY, mapping)
-        mapping = migrate_test_suites(client, JIRA_PROJECT_KEY, mapping)
-        mapping = migrate_test_runs(client, JIRA_PROJECT_KEY, mapping)
-        mapping = migrate_test_results(client, JIRA_PROJECT_KEY, mapping)
-        mapping = migrate_milestones(client, JIRA_PROJECT_KEY, mapping)
-        mapping = migrate_attachments(client, JIRA_PROJECT_KEY, mapping)
+        if args.pipelined:
+            mapping = migrate_pipelined(client, JIRA_PROJECT_KEY, mapping, workers=workers, checkpoint=checkpoint)
+        else:
+            mapping = migrate_test_cases(client, JIRA_PROJECT_KEY, mapping, workers=workers, checkpoint=checkpoint)
+            mapping = migrate_test_suites(client, JIRA_PROJECT_KEY, mapping, checkpoint=checkpoint)
+            mapping = migrate_test_runs(client, JIRA_PROJECT_KEY, mapping, checkpoint=checkpoint)
+            mapping = migrate_test_results(client, JIRA_PROJECT_KEY, mapping, checkpoint=checkpoint)
+            mapping = migrate_milestones(client, JIRA_PROJECT_KEY, mapping, checkpoint=checkpoint)
+            mapping = migrate_attachments(client, JIRA_PROJECT_KEY, mapping, checkpoint=checkpoint)
         
         # Save mapping to file and database
         save_mapping(mapping)
@@ -1065,6 +2109,9 @@ def main():
         print(f"\n❌ Migration failed: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        checkpoint.close()
+        client.close()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,128 @@
+"""
+Streaming multipart/form-data uploads.
+
+requests builds a files= body completely in memory before sending it, so a
+200 MB attachment costs 200 MB of RAM per upload. MultipartFile is a
+file-like body that produces the multipart envelope around the file on the
+fly, reading the file in chunks while the request is sent. Memory use stays
+constant whatever the file size, which makes concurrent uploads safe.
+"""
+import mimetypes
+import os
+import threading
+import uuid
+
+# Bytes read from disk per chunk
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class MultipartFile:
+    """Single-file multipart/form-data body, streamed from disk
+
+    Pass it as data= to requests together with its content_type header:
+
+        with MultipartFile(path) as body:
+            session.post(url, data=body, headers={'Content-Type': body.content_type})
+
+    requests sends it with a Content-Length of len(body) and reads it in
+    chunks.
+    """
+
+    def __init__(self, path, field='file', filename=None, content_type=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        """
+        Args:
+            path: File to upload.
+            field: Form field name of the file part.
+            filename: Name reported to the server; defaults to the file's name.
+            content_type: MIME type of the file; guessed from filename.
+            chunk_size: Largest number of bytes returned by one read().
+            progress: Optional callable receiving the number of file bytes
+                read, e.g. UploadProgress.add.
+        """
+        filename = filename or os.path.basename(path)
+        content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.bytes_read = 0     # file bytes handed out so far
+
+        # Same escaping urllib3 uses for form-data filenames
+        quoted = filename.replace('\\', '\\\\').replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+        self._head = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{quoted}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode('utf-8')
+        self._tail = f'\r\n--{self.boundary}--\r\n'.encode('ascii')
+        self._file_size = os.path.getsize(path)
+        self._file = open(path, 'rb')
+        self._position = 0
+
+    def __len__(self):
+        return len(self._head) + self._file_size + len(self._tail)
+
+    def read(self, size=-1):
+        """Return up to size bytes of the body (at most chunk_size)"""
+        if size is None or size < 0 or size > self.chunk_size:
+            size = self.chunk_size
+        head_size = len(self._head)
+        body_end = head_size + self._file_size
+
+        if self._position < head_size:
+            data = self._head[self._position:self._position + size]
+        elif self._position < body_end:
+            data = self._file.read(min(size, body_end - self._position))
+            if not data:
+                raise IOError(f"{self._file.name} shrank while it was being uploaded")
+            self.bytes_read += len(data)
+            if self.progress:
+                self.progress(len(data))
+        else:
+            offset = self._position - body_end
+            data = self._tail[offset:offset + size]
+        self._position += len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class UploadProgress:
+    """Thread-safe byte counter shared by concurrent uploads
+
+    Prints a line each time another `step` fraction of total_bytes has been
+    sent. Bytes of failed attempts are taken back with add(-n).
+    """
+
+    def __init__(self, total_bytes, step=0.1):
+        self.total_bytes = total_bytes
+        self.step = step
+        self.sent = 0
+        self._next_report = step
+        self._lock = threading.Lock()
+
+    def add(self, count):
+        with self._lock:
+            self.sent += count
+            if not self.total_bytes or self.sent < self._next_report * self.total_bytes:
+                return
+            percent = min(100, int(self.sent * 100 / self.total_bytes))
+            while self._next_report * self.total_bytes <= self.sent:
+                self._next_report += self.step
+        print(f"  📦 Sent {format_size(self.sent)} of {format_size(self.total_bytes)} ({percent}%)")
+
+
+def format_size(size):
+    """Human readable byte count, e.g. 1.5 MB"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
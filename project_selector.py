@@ -7,7 +7,8 @@ import json
 import sys
 import sqlite3
 import requests
-from requests.auth import HTTPBasicAuth
+
+from jira_session import session_from_config
 
 def print_header(text):
     """Print a formatted header"""
@@ -23,11 +24,9 @@ def print_section(text):
 
 def get_testrail_projects(config):
     """Fetch all TestRail projects"""
-    from testrail import APIClient
+    from testrail import client_from_config
     
-    client = APIClient(config['testrail_url'])
-    client.user = config['testrail_user']
-    client.password = config['testrail_password']
+    client = client_from_config(config)
     
     try:
         response = client.send_get('get_projects')
@@ -35,42 +34,23 @@ def get_testrail_projects(config):
     except Exception as e:
         print(f"❌ Error fetching TestRail projects: {e}")
         return []
+    finally:
+        client.close()
 
-def get_jira_projects(config):
+def get_jira_projects(config, session):
     """Fetch all Jira projects"""
     base_url = config['jira_url']
-    username = config['jira_username']
-    password = config['jira_password']
-    
-    # Detect if using PAT
-    import re
-    is_base64_like = bool(re.match(r'^[A-Za-z0-9+/=]+$', password))
-    is_token = (len(password) > 30 and is_base64_like) or len(password) > 40
-    
-    if is_token:
-        headers = {
-            'Authorization': f'Bearer {password}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        auth = None
-    else:
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        auth = HTTPBasicAuth(username, password)
     
     try:
         url = f"{base_url}/rest/api/2/project"
-        response = requests.get(url, auth=auth, headers=headers)
+        response = session.get(url)
         response.raise_for_status()
         return response.json()
     except Exception as e:
         print(f"❌ Error fetching Jira projects: {e}")
         return []
 
-def create_jira_project(config):
+def create_jira_project(config, session):
     """Create a new Jira project"""
     print_section("CREATE NEW JIRA PROJECT")
     
@@ -114,34 +94,13 @@ def create_jira_project(config):
     use_xray = template_choice in ["4", "5", "6"]
     
     base_url = config['jira_url']
-    username = config['jira_username']
-    password = config['jira_password']
-    
-    # Detect if using PAT
-    import re
-    is_base64_like = bool(re.match(r'^[A-Za-z0-9+/=]+$', password))
-    is_token = (len(password) > 30 and is_base64_like) or len(password) > 40
-    
-    if is_token:
-        headers = {
-            'Authorization': f'Bearer {password}',
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        auth = None
-    else:
-        headers = {
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        }
-        auth = HTTPBasicAuth(username, password)
     
     try:
         print(f"\nCreating project '{project_name}' ({project_key})...")
         
         # Get current user's account ID
         user_url = f"{base_url}/rest/api/3/myself"
-        user_response = requests.get(user_url, auth=auth, headers=headers)
+        user_response = session.get(user_url)
         user_response.raise_for_status()
         account_id = user_response.json().get('accountId')
         
@@ -162,7 +121,7 @@ def create_jira_project(config):
             project_data['description'] = description
         
         url = f"{base_url}/rest/api/2/project"
-        response = requests.post(url, auth=auth, headers=headers, json=project_data)
+        response = session.post(url, json=project_data)
         response.raise_for_status()
         
         project = response.json()
@@ -311,23 +270,24 @@ def main():
         print("\n❌ No TestRail project selected. Exiting.")
         sys.exit(0)
     
-    # Step 2: Select or create Jira project
+    # Step 2: Select or create Jira project; one session serves every Jira call
     print("\n📋 Step 2: Select target Jira project")
-    jira_projects = get_jira_projects(config)
-    
-    jira_project_selection = select_jira_project(jira_projects)
-    
-    if not jira_project_selection:
-        print("\n❌ No Jira project selected. Exiting.")
-        sys.exit(0)
-    
-    if jira_project_selection == 'CREATE':
-        jira_project = create_jira_project(config)
-        if not jira_project:
-            print("\n❌ Failed to create Jira project. Exiting.")
-            sys.exit(1)
-    else:
-        jira_project = jira_project_selection
+    with session_from_config(config) as jira_session:
+        jira_projects = get_jira_projects(config, jira_session)
+        
+        jira_project_selection = select_jira_project(jira_projects)
+        
+        if not jira_project_selection:
+            print("\n❌ No Jira project selected. Exiting.")
+            sys.exit(0)
+        
+        if jira_project_selection == 'CREATE':
+            jira_project = create_jira_project(config, jira_session)
+            if not jira_project:
+                print("\n❌ Failed to create Jira project. Exiting.")
+                sys.exit(1)
+        else:
+            jira_project = jira_project_selection
     
     # Step 3: Save configuration
     print_header("MIGRATION CONFIGURATION")
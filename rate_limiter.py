@@ -0,0 +1,137 @@
+"""
+Adaptive rate limiting shared by the TestRail and Jira/Xray clients.
+
+AdaptiveRateLimiter is a token bucket whose refill rate follows AIMD
+(additive increase, multiplicative decrease): every fast, successful
+response nudges the rate up, while HTTP 429/503 halves it and pauses all
+callers for the server's Retry-After period. Callers wrap each HTTP call in
+send(), which also retries throttled requests.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Status codes that mean "slow down and try again"
+RETRY_STATUSES = (429, 503)
+
+
+class AdaptiveRateLimiter:
+    """Thread-safe AIMD token bucket with Retry-After support"""
+
+    def __init__(self, rate=2.0, min_rate=0.2, max_rate=20.0, burst=None,
+                 increase=0.1, decrease=0.5, latency_target=2.0, max_retries=5):
+        """
+        Args:
+            rate: Initial requests per second.
+            min_rate, max_rate: Bounds the rate adapts between.
+            burst: Bucket size; defaults to one second's worth at max_rate.
+            increase: Requests/second added after each healthy response.
+            decrease: Factor the rate is multiplied by on 429/503.
+            latency_target: Responses slower than this (seconds) stop the
+                rate from growing.
+            max_retries: Retries of a throttled request before giving up and
+                returning the last response.
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst or max(1.0, max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+
+        self._lock = threading.Lock()
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                else:
+                    wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def record(self, status_code, latency, retry_after=None):
+        """Adapt the rate to the outcome of a request"""
+        with self._lock:
+            if status_code in RETRY_STATUSES:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._tokens = 0.0
+                if retry_after:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            elif status_code < 400 and latency <= self.latency_target:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def send(self, request_fn):
+        """Send a request through the limiter, retrying 429/503 responses.
+
+        Args:
+            request_fn: Zero-argument callable performing the HTTP call and
+                returning a requests.Response. It is called again on retry,
+                so it must not consume one-shot state such as open files.
+
+        Returns:
+            The last response received.
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            started = time.monotonic()
+            response = request_fn()
+            latency = time.monotonic() - started
+
+            retry_after = None
+            if response.status_code in RETRY_STATUSES:
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if retry_after is None:
+                    # No hint from the server: exponential backoff
+                    retry_after = min(60.0, 2.0 ** attempt)
+            self.record(response.status_code, latency, retry_after)
+
+            if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return response
+            attempt += 1
+
+
+def parse_retry_after(value):
+    """Convert a Retry-After header (seconds or HTTP date) to seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def limiter_from_config(config, prefix, default_rate=2.0):
+    """Create a limiter from '<prefix>_rate_limit' style config.json keys.
+
+    Recognised keys (all optional): <prefix>_rate_limit (initial requests
+    per second), <prefix>_min_rate, <prefix>_max_rate and
+    <prefix>_max_retries.
+    """
+    return AdaptiveRateLimiter(
+        rate=config.get(f'{prefix}_rate_limit', default_rate),
+        min_rate=config.get(f'{prefix}_min_rate', 0.2),
+        max_rate=config.get(f'{prefix}_max_rate', 20.0),
+        max_retries=config.get(f'{prefix}_max_retries', 5)
+    )
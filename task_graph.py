@@ -0,0 +1,101 @@
+"""
+Dependency-aware task scheduling.
+
+TaskGraph runs callables on a pool of worker threads as soon as every task
+they depend on has finished, so independent work overlaps instead of waiting
+for a whole stage to complete. Among the tasks that are ready, the ones
+furthest down the graph run first, which lets downstream work (e.g. a Test
+Set) follow its inputs promptly instead of queueing behind unrelated tasks.
+"""
+import itertools
+import queue
+import threading
+
+
+class TaskGraph:
+    """Run named tasks on worker threads in dependency order"""
+
+    def __init__(self, workers=4):
+        self.workers = max(1, workers)
+        self._tasks = {}    # name -> (fn, args, deps)
+
+    def add(self, name, fn, *args, deps=()):
+        """Add a task and return its name
+
+        Args:
+            name: Unique task name.
+            fn: Callable run as fn(*args).
+            deps: Names of tasks that must finish first. They must already
+                have been added, which keeps the graph acyclic.
+        """
+        if name in self._tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        missing = [dep for dep in deps if dep not in self._tasks]
+        if missing:
+            raise ValueError(f"Task {name} depends on unknown task(s): {', '.join(missing)}")
+        self._tasks[name] = (fn, args, tuple(set(deps)))
+        return name
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def run(self):
+        """Run every task and return {name: exception} for the tasks that raised
+
+        A task starts once all of its dependencies have finished, whether or
+        not they succeeded.
+        """
+        if not self._tasks:
+            return {}
+
+        remaining = {}
+        dependents = {name: [] for name in self._tasks}
+        depth = {}
+        for name, (_, _, deps) in self._tasks.items():
+            remaining[name] = len(deps)
+            depth[name] = 1 + max((depth[dep] for dep in deps), default=-1)
+            for dep in deps:
+                dependents[dep].append(name)
+
+        ready = queue.PriorityQueue()
+        order = itertools.count()
+        lock = threading.Lock()
+        errors = {}
+        unfinished = [len(self._tasks)]
+
+        def push(name):
+            ready.put((-depth[name], next(order), name))
+
+        def worker():
+            while True:
+                _, _, name = ready.get()
+                if name is None:
+                    return
+                fn, args, _ = self._tasks[name]
+                try:
+                    fn(*args)
+                except Exception as e:
+                    with lock:
+                        errors[name] = e
+                with lock:
+                    for dependent in dependents[name]:
+                        remaining[dependent] -= 1
+                        if remaining[dependent] == 0:
+                            push(dependent)
+                    unfinished[0] -= 1
+                    if unfinished[0] == 0:
+                        # Wake every worker up so they can exit
+                        for _ in range(self.workers):
+                            ready.put((float('inf'), next(order), None))
+
+        for name, count in remaining.items():
+            if count == 0:
+                push(name)
+
+        threads = [threading.Thread(target=worker, name=f'task-graph-{i}', daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
@@ -16,17 +16,51 @@ import base64
 import json
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from rate_limiter import AdaptiveRateLimiter, limiter_from_config
+
+
+# Connection pool defaults, overridable from config.json
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_TIMEOUT = (10, 120)     # (connect, read) seconds
+
+# Rows per page for bulk list endpoints (TestRail caps this at 250)
+DEFAULT_PAGE_SIZE = 250
+
+# Bytes per chunk when streaming attachment downloads
+DEFAULT_CHUNK_SIZE = 1024 * 1024
 
 
 class APIClient:
-    def __init__(self, base_url):
+    def __init__(self, base_url, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, timeout=DEFAULT_TIMEOUT,
+                 rate_limiter=None):
         self.user = ''
         self.password = ''
+        self.timeout = timeout
+        # Throttles requests and retries HTTP 429/503 (see rate_limiter.py)
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(rate=5.0)
+        self.page_size = DEFAULT_PAGE_SIZE
         if not base_url.endswith('/'):
             base_url += '/'
         self.__url = base_url + 'index.php?/api/v2/'
 
+        # One keep-alive session per client so every call reuses pooled
+        # TCP/TLS connections instead of handshaking again
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize)
+        self.__session.mount('https://', adapter)
+        self.__session.mount('http://', adapter)
+        self.__auth_credentials = None
+        self.__auth_header = None
+
+    def close(self):
+        """Release the pooled connections held by this client."""
+        self.__session.close()
+
     def send_get(self, uri, filepath=None):
         """Issue a GET request (read) against the API.
 
@@ -54,29 +88,188 @@ class APIClient:
         """
         return self.__send_request('POST', uri, data)
 
+    def iter_pages(self, uri, key, limit=None, offset=0):
+        """Iterate over every item of a paginated list endpoint.
+
+        Pages are requested with limit/offset and the response's _links.next
+        is followed until it is exhausted, so only one page is held in memory
+        at a time. Instances that predate pagination return a bare list,
+        which is yielded as-is.
+
+        Args:
+            uri: The API method to call including parameters, e.g.
+                get_cases/1&suite_id=2.
+            key: The key holding the items in a paginated response, e.g.
+                'cases'.
+            limit: Page size; defaults to the client's page_size.
+            offset: Index of the first item to return.
+
+        Yields:
+            One dict per item.
+        """
+        next_uri = self.__with_params(uri, limit=limit or self.page_size,
+                                      offset=offset)
+        while next_uri:
+            response = self.send_get(next_uri)
+            if isinstance(response, list):
+                yield from response
+                return
+            yield from response.get(key, [])
+            next_link = (response.get('_links') or {}).get('next')
+            next_uri = next_link.split('/api/v2/', 1)[-1] if next_link else None
+
+    def iter_cases(self, project_id, suite_id=None, limit=None, offset=0, **filters):
+        """Iterate over the cases of a project (and suite), e.g.
+        iter_cases(1, suite_id=2, updated_after=1700000000)."""
+        uri = self.__with_params(f'get_cases/{project_id}', suite_id=suite_id, **filters)
+        return self.iter_pages(uri, 'cases', limit, offset)
+
+    def iter_sections(self, project_id, suite_id=None, limit=None, offset=0):
+        """Iterate over the sections of a project (and suite)."""
+        uri = self.__with_params(f'get_sections/{project_id}', suite_id=suite_id)
+        return self.iter_pages(uri, 'sections', limit, offset)
+
+    def iter_milestones(self, project_id, limit=None, offset=0, **filters):
+        """Iterate over the milestones of a project."""
+        uri = self.__with_params(f'get_milestones/{project_id}', **filters)
+        return self.iter_pages(uri, 'milestones', limit, offset)
+
+    def iter_plans(self, project_id, limit=None, offset=0, **filters):
+        """Iterate over the test plans of a project."""
+        uri = self.__with_params(f'get_plans/{project_id}', **filters)
+        return self.iter_pages(uri, 'plans', limit, offset)
+
+    def iter_runs(self, project_id, limit=None, offset=0, **filters):
+        """Iterate over the test runs of a project, e.g.
+        iter_runs(1, created_after=1700000000)."""
+        uri = self.__with_params(f'get_runs/{project_id}', **filters)
+        return self.iter_pages(uri, 'runs', limit, offset)
+
+    def iter_tests(self, run_id, limit=None, offset=0, **filters):
+        """Iterate over the tests of a test run."""
+        uri = self.__with_params(f'get_tests/{run_id}', **filters)
+        return self.iter_pages(uri, 'tests', limit, offset)
+
+    def iter_results(self, test_id, limit=None, offset=0, **filters):
+        """Iterate over the results of a single test."""
+        uri = self.__with_params(f'get_results/{test_id}', **filters)
+        return self.iter_pages(uri, 'results', limit, offset)
+
+    def iter_results_for_run(self, run_id, limit=None, offset=0, **filters):
+        """Iterate over all results of a test run, e.g.
+        iter_results_for_run(7, created_after=1700000000)."""
+        uri = self.__with_params(f'get_results_for_run/{run_id}', **filters)
+        return self.iter_pages(uri, 'results', limit, offset)
+
+    def iter_attachments_for_case(self, case_id, limit=None, offset=0):
+        """Iterate over the attachments of a test case."""
+        return self.iter_pages(f'get_attachments_for_case/{case_id}',
+                               'attachments', limit, offset)
+
+    def iter_attachments_for_test(self, test_id, limit=None, offset=0):
+        """Iterate over the attachments of a test (and its results)."""
+        return self.iter_pages(f'get_attachments_for_test/{test_id}',
+                               'attachments', limit, offset)
+
+    def open_attachment(self, attachment_id, offset=0, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Start a streamed download of an attachment.
+
+        Unlike send_get('get_attachment/...'), the file is never held in
+        memory as a whole.
+
+        Args:
+            attachment_id: The ID of the attachment.
+            offset: First byte to download; requested with an HTTP Range
+                header to resume a partial download.
+            chunk_size: Bytes per chunk.
+
+        Returns:
+            (start, chunks): the offset the returned content starts at (0
+            when the server ignored the Range header) and an iterator over
+            the content in byte chunks.
+        """
+        url = self.__url + 'get_attachment/%s' % attachment_id
+        headers = {'Authorization': self.__get_auth_header()}
+        if offset:
+            headers['Range'] = 'bytes=%d-' % offset
+        response = self.rate_limiter.send(
+            lambda: self.__session.get(url, headers=headers, stream=True,
+                                       timeout=self.timeout))
+
+        if response.status_code == 416 and offset:
+            # Nothing left at that offset; start over
+            response.close()
+            return self.open_attachment(attachment_id, 0, chunk_size)
+        if response.status_code not in (200, 201, 206):
+            response.close()
+            raise APIError('TestRail API returned HTTP %s (%s)' % (
+                response.status_code, response.text[:500]))
+
+        start = 0
+        if response.status_code == 206:
+            # Content-Range: bytes <start>-<end>/<total>
+            content_range = response.headers.get('Content-Range', '')
+            try:
+                start = int(content_range.split()[1].split('-')[0])
+            except (IndexError, ValueError):
+                start = offset
+
+        def chunks():
+            with response:
+                yield from response.iter_content(chunk_size)
+
+        return start, chunks()
+
+    @staticmethod
+    def __with_params(uri, **params):
+        for name, value in params.items():
+            if value is not None:
+                uri += '&%s=%s' % (name, value)
+        return uri
+
+    def __get_auth_header(self):
+        # user/password are plain attributes set after construction, so the
+        # encoded header is cached per credential pair rather than per call
+        credentials = (self.user, self.password)
+        if credentials != self.__auth_credentials:
+            auth = str(
+                base64.b64encode(
+                    bytes('%s:%s' % credentials, 'utf-8')
+                ),
+                'ascii'
+            ).strip()
+            self.__auth_header = 'Basic ' + auth
+            self.__auth_credentials = credentials
+        return self.__auth_header
+
     def __send_request(self, method, uri, data):
         url = self.__url + uri
 
-        auth = str(
-            base64.b64encode(
-                bytes('%s:%s' % (self.user, self.password), 'utf-8')
-            ),
-            'ascii'
-        ).strip()
-        headers = {'Authorization': 'Basic ' + auth}
+        headers = {'Authorization': self.__get_auth_header()}
 
         if method == 'POST':
             if uri[:14] == 'add_attachment':    # add_attachment API method
-                files = {'attachment': (open(data, 'rb'))}
-                response = requests.post(url, headers=headers, files=files)
-                files['attachment'].close()
+                def send():
+                    # Reopened per attempt so a throttled upload can be retried
+                    with open(data, 'rb') as attachment:
+                        return self.__session.post(url, headers=headers,
+                                                   files={'attachment': attachment},
+                                                   timeout=self.timeout)
             else:
                 headers['Content-Type'] = 'application/json'
                 payload = bytes(json.dumps(data), 'utf-8')
-                response = requests.post(url, headers=headers, data=payload)
+
+                def send():
+                    return self.__session.post(url, headers=headers, data=payload,
+                                               timeout=self.timeout)
         else:
             headers['Content-Type'] = 'application/json'
-            response = requests.get(url, headers=headers)
+
+            def send():
+                return self.__session.get(url, headers=headers,
+                                          timeout=self.timeout)
+
+        response = self.rate_limiter.send(send)
 
         if response.status_code > 201:
             try:
@@ -101,3 +294,31 @@ class APIClient:
 
 class APIError(Exception):
     pass
+
+
+def client_from_config(config, pool_maxsize=None):
+    """Create an authenticated APIClient from config.json settings.
+
+    Optional keys: testrail_pool_connections, testrail_pool_maxsize,
+    testrail_connect_timeout, testrail_read_timeout, testrail_page_size and
+    the testrail_rate_limit family read by rate_limiter.limiter_from_config. pool_maxsize, when
+    given, raises the per-host pool to at least that many connections.
+    """
+    maxsize = config.get('testrail_pool_maxsize', DEFAULT_POOL_MAXSIZE)
+    if pool_maxsize:
+        maxsize = max(maxsize, pool_maxsize)
+    timeout = (
+        config.get('testrail_connect_timeout', DEFAULT_TIMEOUT[0]),
+        config.get('testrail_read_timeout', DEFAULT_TIMEOUT[1])
+    )
+    client = APIClient(
+        config['testrail_url'],
+        pool_connections=config.get('testrail_pool_connections', DEFAULT_POOL_CONNECTIONS),
+        pool_maxsize=maxsize,
+        timeout=timeout,
+        rate_limiter=limiter_from_config(config, 'testrail', default_rate=5.0)
+    )
+    client.page_size = config.get('testrail_page_size', DEFAULT_PAGE_SIZE)
+    client.user = config['testrail_user']
+    client.password = config['testrail_password']
+    return client
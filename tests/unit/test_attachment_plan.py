@@ -0,0 +1,92 @@
+"""
+Unit tests for migrator.load_attachment_plan (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import os
+import sqlite3
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # migrator reads config.json from the working directory
+
+import migrator
+
+SCHEMA = '''
+CREATE TABLE suites (id INTEGER PRIMARY KEY, project_id INTEGER);
+CREATE TABLE cases (id INTEGER PRIMARY KEY, suite_id INTEGER);
+CREATE TABLE runs (id INTEGER PRIMARY KEY, project_id INTEGER);
+CREATE TABLE tests (id INTEGER PRIMARY KEY, run_id INTEGER, case_id INTEGER);
+CREATE TABLE results (id INTEGER PRIMARY KEY, test_id INTEGER);
+CREATE TABLE attachments (id INTEGER PRIMARY KEY, entity_type TEXT, entity_id INTEGER,
+                          filename TEXT, size INTEGER, local_path TEXT);
+CREATE TABLE jira_mappings (testrail_entity_type TEXT, testrail_entity_id INTEGER, jira_key TEXT);
+
+INSERT INTO suites VALUES (1, 10), (2, 20);
+INSERT INTO cases VALUES (100, 1), (101, 1), (200, 2);
+INSERT INTO runs VALUES (7, 10), (8, 20);
+INSERT INTO tests VALUES (70, 7, 100), (80, 8, 200);
+INSERT INTO results VALUES (700, 70), (800, 80);
+INSERT INTO attachments VALUES
+    (1, 'case', 100, 'shot.png', 1000, 'a/1'),
+    (2, 'case', 101, 'log.txt', 200, 'a/2'),
+    (3, 'result', 700, 'trace.txt', 30, 'a/3'),
+    (4, 'case', 200, 'other.png', 4, 'a/4'),
+    (5, 'result', 800, 'other.txt', 5, 'a/5');
+
+-- Left behind by an earlier migration
+INSERT INTO jira_mappings VALUES ('case', 101, 'OLD-1');
+'''
+
+
+class LoadAttachmentPlanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = sqlite3.connect(':memory:')
+        self.db.executescript(SCHEMA)
+        self.cursor = self.db.cursor()
+
+    def tearDown(self):
+        self.db.close()
+
+    def plan(self, mapping, project_id=None):
+        config = {'testrail_project_id': project_id} if project_id else None
+        with mock.patch.object(migrator, 'migration_config', config), mock.patch('builtins.print'):
+            plan, plan_bytes = migrator.load_attachment_plan(self.cursor, mapping)
+        return {attachment['id']: jira_key for attachment, jira_key in plan}, plan_bytes
+
+    def test_resolves_case_and_result_owners(self):
+        mapping = {'cases': {100: 'T-1', 200: 'T-2'}, 'runs': {7: 'E-1', 8: 'E-2'}}
+        keys, plan_bytes = self.plan(mapping)
+
+        self.assertEqual(keys, {1: 'T-1', 2: None, 3: 'E-1', 4: 'T-2', 5: 'E-2'})
+        self.assertEqual(plan_bytes, 1000 + 30 + 4 + 5)
+
+    def test_ignores_keys_of_earlier_migrations(self):
+        # Case 101 was not migrated this time; its old jira_mappings row
+        # must not be used
+        keys, plan_bytes = self.plan({'cases': {100: 'T-1'}, 'runs': {}})
+
+        self.assertIsNone(keys[2])
+        self.assertEqual(plan_bytes, 1000)
+
+    def test_accepts_string_keyed_mapping(self):
+        keys, _ = self.plan({'cases': {'100': 'T-1'}, 'runs': {'7': 'E-1'}})
+
+        self.assertEqual(keys[1], 'T-1')
+        self.assertEqual(keys[3], 'E-1')
+
+    def test_filters_by_project(self):
+        mapping = {'cases': {100: 'T-1', 200: 'T-2'}, 'runs': {7: 'E-1', 8: 'E-2'}}
+        keys, plan_bytes = self.plan(mapping, project_id=10)
+
+        self.assertEqual(sorted(keys), [1, 2, 3])
+        self.assertEqual(plan_bytes, 1030)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Unit tests for attachment_store.AttachmentStore (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from attachment_store import AttachmentStore
+
+CONTENT = bytes(range(256)) * 40
+
+
+def serve(content, honour_range=True, chunk_size=1000):
+    """open_stream callable over content; records the offsets asked for"""
+    offsets = []
+
+    def open_stream(offset):
+        offsets.append(offset)
+        start = offset if honour_range else 0
+        chunks = (content[i:i + chunk_size] for i in range(start, len(content), chunk_size))
+        return start, chunks
+    return open_stream, offsets
+
+
+class AttachmentStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.store = AttachmentStore(os.path.join(self.tmp, 'attachments'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def write_partial(self, key, data):
+        os.makedirs(self.store.partial_dir, exist_ok=True)
+        with open(os.path.join(self.store.partial_dir, f'{key}.part'), 'wb') as part_file:
+            part_file.write(data)
+
+    def test_stores_under_content_hash(self):
+        open_stream, _ = serve(CONTENT)
+        content_hash, path, size = self.store.download('500', open_stream, len(CONTENT))
+
+        self.assertEqual(content_hash, hashlib.sha256(CONTENT).hexdigest())
+        self.assertEqual(path, self.store.path_for(content_hash))
+        self.assertEqual(size, len(CONTENT))
+        with open(path, 'rb') as stored:
+            self.assertEqual(stored.read(), CONTENT)
+        self.assertFalse(os.listdir(self.store.partial_dir))
+
+    def test_same_content_is_stored_once(self):
+        first = self.store.download('1', serve(CONTENT)[0], len(CONTENT))
+        second = self.store.download('2', serve(CONTENT)[0], len(CONTENT))
+
+        self.assertEqual(first, second)
+        shard = os.path.dirname(first[1])
+        self.assertEqual(os.listdir(shard), [first[0]])
+
+    def test_same_key_is_downloaded_once(self):
+        open_stream, offsets = serve(CONTENT)
+        first = self.store.download('1', open_stream, len(CONTENT))
+        second = self.store.download('1', open_stream, len(CONTENT))
+
+        self.assertEqual(first, second)
+        self.assertEqual(offsets, [0])
+
+    def test_resumes_partial_download(self):
+        self.write_partial('7', CONTENT[:3000])
+        open_stream, offsets = serve(CONTENT)
+        content_hash, path, size = self.store.download('7', open_stream, len(CONTENT))
+
+        self.assertEqual(offsets, [3000])
+        self.assertEqual(content_hash, hashlib.sha256(CONTENT).hexdigest())
+        self.assertEqual(size, len(CONTENT))
+
+    def test_restarts_when_range_is_ignored(self):
+        self.write_partial('7', b'stale bytes')
+        open_stream, offsets = serve(CONTENT, honour_range=False)
+        content_hash, path, size = self.store.download('7', open_stream, len(CONTENT))
+
+        self.assertEqual(offsets, [len(b'stale bytes')])
+        self.assertEqual(content_hash, hashlib.sha256(CONTENT).hexdigest())
+        self.assertEqual(size, len(CONTENT))
+
+    def test_complete_partial_file_is_not_downloaded_again(self):
+        self.write_partial('7', CONTENT)
+        open_stream, offsets = serve(CONTENT)
+        content_hash, _, _ = self.store.download('7', open_stream, len(CONTENT))
+
+        self.assertEqual(offsets, [])
+        self.assertEqual(content_hash, hashlib.sha256(CONTENT).hexdigest())
+
+    def test_size_mismatch_discards_partial_file(self):
+        open_stream, _ = serve(CONTENT[:1000])
+        with self.assertRaises(IOError):
+            self.store.download('9', open_stream, len(CONTENT))
+        self.assertFalse(os.listdir(self.store.partial_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Unit tests for migrator.JiraXrayClient.create_issues_bulk (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # migrator reads config.json from the working directory
+
+import migrator
+
+
+def http_error(status_code, body=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body).encode('utf-8') if body is not None else b'<html>error</html>'
+    return requests.exceptions.HTTPError(f'{status_code} Error', response=response)
+
+
+def failed(number, message='Summary is required'):
+    return {'status': 400, 'failedElementNumber': number,
+            'elementErrors': {'errorMessages': [], 'errors': {'summary': message}}}
+
+
+class FakeJira:
+    """Answers issue/bulk requests from a list of replies; creates every other element"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = []
+        self.next_key = 1
+
+    def created(self, count):
+        issues = [{'key': f'T-{self.next_key + i}'} for i in range(count)]
+        self.next_key += count
+        return issues
+
+    def __call__(self, method, endpoint, data=None, params=None):
+        summaries = [issue['fields']['summary'] for issue in data['issueUpdates']]
+        self.requests.append(summaries)
+        reply = self.replies.pop(0) if self.replies else None
+        if isinstance(reply, Exception):
+            raise reply
+        if callable(reply):
+            return reply(self, summaries)
+        return {'issues': self.created(len(summaries)), 'errors': []}
+
+
+def issues(count):
+    return [{'fields': {'summary': f'Case {i}'}} for i in range(count)]
+
+
+class CreateIssuesBulkTest(unittest.TestCase):
+
+    def create(self, fake, count, max_retries=1):
+        client = migrator.JiraXrayClient.__new__(migrator.JiraXrayClient)
+        client._make_request = fake
+        with mock.patch.object(migrator, 'JIRA_BULK_CREATE_SIZE', 3), mock.patch('builtins.print'):
+            return client.create_issues_bulk(issues(count), max_retries=max_retries)
+
+    def keys(self, created):
+        return [issue and issue['key'] for issue in created]
+
+    def test_maps_results_by_position(self):
+        fake = FakeJira()
+        created = self.create(fake, 5)
+
+        self.assertEqual(self.keys(created), ['T-1', 'T-2', 'T-3', 'T-4', 'T-5'])
+        self.assertEqual(fake.requests, [['Case 0', 'Case 1', 'Case 2'], ['Case 3', 'Case 4']])
+
+    def test_retries_only_failed_elements(self):
+        def partly_failed(fake, summaries):
+            return {'issues': fake.created(1), 'errors': [failed(0), failed(2)]}
+        fake = FakeJira(partly_failed)
+        created = self.create(fake, 3)
+
+        self.assertEqual(fake.requests, [['Case 0', 'Case 1', 'Case 2'], ['Case 0', 'Case 2']])
+        self.assertEqual(self.keys(created), ['T-2', 'T-1', 'T-3'])
+
+    def test_all_failed_400_body_is_read(self):
+        body = {'issues': [], 'errors': [failed(0), failed(1)]}
+        fake = FakeJira(http_error(400, body), http_error(400, body))
+        created = self.create(fake, 2)
+
+        self.assertEqual(len(fake.requests), 2)
+        self.assertEqual(created, [None, None])
+
+    def test_rejected_batch_is_retried(self):
+        for status_code in (401, 403, 429):
+            with self.subTest(status_code=status_code):
+                fake = FakeJira(http_error(status_code, {'errorMessages': ['Try again'], 'errors': {}}))
+                created = self.create(fake, 2)
+
+                self.assertEqual(fake.requests, [['Case 0', 'Case 1']] * 2)
+                self.assertEqual(self.keys(created), ['T-1', 'T-2'])
+
+    def test_unknown_outcome_is_not_resent(self):
+        for reply in (requests.exceptions.ConnectionError('reset'),
+                      requests.exceptions.Timeout('read timed out'),
+                      http_error(502),
+                      http_error(400, {'errorMessages': ['Bad request'], 'errors': {}}),
+                      lambda fake, summaries: {}):
+            with self.subTest(reply=reply):
+                fake = FakeJira(reply)
+                created = self.create(fake, 2, max_retries=3)
+
+                self.assertEqual(len(fake.requests), 1)
+                self.assertEqual(created, [None, None])
+
+    def test_unknown_batch_does_not_stop_the_others(self):
+        fake = FakeJira(requests.exceptions.Timeout('read timed out'))
+        created = self.create(fake, 5)
+
+        self.assertEqual(self.keys(created), [None, None, None, 'T-1', 'T-2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
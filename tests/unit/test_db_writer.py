@@ -0,0 +1,136 @@
+"""
+Unit tests for db_writer.DBWriter (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from db_writer import DBWriter
+
+INSERT = 'INSERT INTO items (id, name) VALUES (?, ?)'
+
+
+class DBWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp, 'test.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def open_writer(self, **kwargs):
+        writer = DBWriter(self.db_path, **kwargs)
+        self.addCleanup(writer.close)
+        writer.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)')
+        return writer
+
+    def stored_count(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_query_sees_buffered_inserts(self):
+        writer = self.open_writer(batch_size=100)
+        for index in range(250):
+            writer.execute(INSERT, (index, f'item {index}'))
+        writer.executemany(INSERT, [(index, 'bulk') for index in range(250, 300)])
+
+        self.assertEqual(writer.query('SELECT COUNT(*) FROM items'), [(300,)])
+
+    def test_inserts_from_many_threads(self):
+        writer = self.open_writer(batch_size=50)
+
+        def produce(first):
+            for index in range(first, first + 100):
+                writer.execute(INSERT, (index, 'threaded'))
+
+        threads = [threading.Thread(target=produce, args=(first,)) for first in range(0, 400, 100)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(writer.query('SELECT COUNT(*) FROM items'), [(400,)])
+
+    def test_commit_waits_for_transaction_size(self):
+        writer = self.open_writer(batch_size=10, transaction_size=1000)
+        writer.executemany(INSERT, [(index, 'row') for index in range(20)])
+        writer.commit()
+        writer.query('SELECT 1')    # wait until the writer got this far
+        self.assertEqual(self.stored_count(), 0)
+
+        writer.executemany(INSERT, [(index, 'row') for index in range(20, 1000)])
+        writer.commit()
+        writer.query('SELECT 1')
+        self.assertEqual(self.stored_count(), 1000)
+
+    def test_close_commits_outstanding_rows(self):
+        writer = self.open_writer(batch_size=1000, transaction_size=50000)
+        writer.executemany(INSERT, [(index, 'row') for index in range(10)])
+        writer.close()
+
+        self.assertEqual(self.stored_count(), 10)
+        with self.assertRaises(RuntimeError):
+            writer.execute(INSERT, (99, 'late'))
+
+    def test_close_while_producers_are_running(self):
+        writer = self.open_writer(batch_size=10, max_pending=20)
+        accepted = []
+        stuck = []
+
+        def produce(first):
+            index = first
+            try:
+                while True:
+                    writer.execute(INSERT, (index, 'racing'))
+                    accepted.append(index)
+                    # A query queued behind the stop sentinel would never return
+                    writer.query('SELECT 1')
+                    index += 1
+            except RuntimeError:
+                pass
+            except Exception as e:
+                stuck.append(e)
+
+        threads = [threading.Thread(target=produce, args=(first,), daemon=True)
+                   for first in range(0, 400000, 100000)]
+        for thread in threads:
+            thread.start()
+        while len(accepted) < 100:
+            time.sleep(0.001)
+        writer.close()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertFalse([thread for thread in threads if thread.is_alive()])
+        self.assertEqual(stuck, [])
+        self.assertEqual(self.stored_count(), len(accepted))
+
+    def test_failed_row_does_not_lose_its_batch(self):
+        writer = self.open_writer(batch_size=5)
+        writer.executemany(INSERT, [(1, 'a'), (2, 'b'), (1, 'duplicate'), (3, 'c'), (4, 'd')])
+
+        self.assertEqual(writer.query('SELECT id FROM items ORDER BY id'), [(1,), (2,), (3,), (4,)])
+        self.assertEqual(writer.error_count, 1)
+
+    def test_query_errors_reach_the_caller(self):
+        writer = self.open_writer()
+        with self.assertRaises(sqlite3.OperationalError):
+            writer.query('SELECT * FROM missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
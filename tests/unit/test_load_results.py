@@ -0,0 +1,98 @@
+"""
+Unit tests for migrator.load_results (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import os
+import sqlite3
+import sys
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # migrator reads config.json from the working directory
+
+import migrator
+
+SCHEMA = '''
+CREATE TABLE statuses (id INTEGER PRIMARY KEY, label TEXT, is_final INTEGER, is_untested INTEGER);
+CREATE TABLE tests (id INTEGER PRIMARY KEY, run_id INTEGER, case_id INTEGER);
+CREATE TABLE results (id INTEGER PRIMARY KEY, test_id INTEGER, status_id INTEGER,
+                      comment TEXT, defects TEXT, created_on INTEGER);
+
+INSERT INTO statuses VALUES (1, 'Passed', 1, 0), (3, 'Untested', 0, 1), (5, 'Failed', 0, 0);
+
+INSERT INTO tests VALUES (1, 7, 100), (2, 7, 101), (3, 7, 102), (4, 8, 100), (5, 8, 103);
+INSERT INTO results VALUES
+    -- Run 7, case 100: failed, then passed on a retest
+    (1, 1, 5, 'broken', 'BUG-1', 100),
+    (2, 1, 1, 'fixed', NULL, 200),
+    -- Run 7, case 101: one result
+    (3, 2, 5, 'fails', 'BUG-2, ,BUG-3', 150),
+    -- Run 7, case 102: two results with the same timestamp
+    (4, 3, 5, 'first', NULL, 300),
+    (5, 3, 1, 'second', NULL, 300),
+    -- Run 8, case 103 (case 100 has no result in this run)
+    (6, 5, 3, NULL, ' ', 50);
+'''
+
+
+class LoadResultsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db = sqlite3.connect(':memory:')
+        self.db.executescript(SCHEMA)
+
+    def tearDown(self):
+        self.db.close()
+
+    def load(self, collapse=True, consolidate=False):
+        with mock.patch.object(migrator, 'COLLAPSE_RESULT_HISTORY', collapse), \
+                mock.patch.object(migrator, 'CONSOLIDATE_RESULT_COMMENTS', consolidate):
+            return migrator.load_results(self.db.cursor())
+
+    def summary(self, results_by_run):
+        return {run_id: [(result['case_id'], result['status'], result['comment']) for result in results]
+                for run_id, results in results_by_run.items()}
+
+    def test_pushes_latest_result_per_run_and_case(self):
+        results_by_run = self.load()
+
+        self.assertEqual(self.summary(results_by_run), {
+            7: [(101, 'FAIL', 'fails'), (100, 'PASS', 'fixed'), (102, 'PASS', 'second')],
+            8: [(103, 'TODO', None)],
+        })
+
+    def test_parses_defects(self):
+        results_by_run = self.load()
+        defects = {result['case_id']: result['defects'] for result in results_by_run[7]}
+
+        self.assertEqual(defects, {100: None, 101: ['BUG-2', 'BUG-3'], 102: None})
+        self.assertIsNone(results_by_run[8][0]['defects'])
+
+    def test_consolidates_earlier_results_into_comment(self):
+        results_by_run = self.load(consolidate=True)
+        comments = {result['case_id']: result['comment'] for result in results_by_run[7]}
+
+        lines = comments[100].split('\n')
+        self.assertEqual(lines[0], 'fixed')
+        self.assertEqual(lines[1], '*TestRail result history (2 results):*')
+        self.assertTrue(lines[2].endswith(': Passed - fixed'))
+        self.assertTrue(lines[3].endswith(': Failed - broken'))
+        # A single result keeps its own comment
+        self.assertEqual(comments[101], 'fails')
+
+    def test_without_collapsing_pushes_every_result(self):
+        results_by_run = self.load(collapse=False)
+
+        self.assertEqual(self.summary(results_by_run), {
+            7: [(100, 'FAIL', 'broken'), (101, 'FAIL', 'fails'), (100, 'PASS', 'fixed'),
+                (102, 'FAIL', 'first'), (102, 'PASS', 'second')],
+            8: [(103, 'TODO', None)],
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
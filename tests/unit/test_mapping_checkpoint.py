@@ -0,0 +1,119 @@
+"""
+Unit tests for migrator.MappingCheckpoint (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # migrator reads config.json from the working directory
+
+from migrator import MappingCheckpoint
+
+
+class MappingCheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp, 'testrail.db')
+        # As left by the importer, before jira_attachment_id was added
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE attachments (id INTEGER PRIMARY KEY, filename TEXT)')
+        conn.executemany('INSERT INTO attachments VALUES (?, ?)', [(1, 'a.png'), (2, 'b.png')])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def open_checkpoint(self, **kwargs):
+        checkpoint = MappingCheckpoint(self.db_path, **kwargs)
+        self.addCleanup(checkpoint._db.close)
+        return checkpoint
+
+    def committed(self, sql='SELECT testrail_entity_type, testrail_entity_id, jira_key FROM jira_mappings'):
+        """Rows another connection sees, i.e. what survives a crash"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return sorted(conn.execute(sql).fetchall())
+        finally:
+            conn.close()
+
+    def test_rows_are_committed_on_flush(self):
+        checkpoint = self.open_checkpoint(batch_size=100)
+        checkpoint.record('case', 1, 'T-1')
+        checkpoint.record('run', 7, 'E-1')
+        self.assertEqual(self.committed(), [])
+
+        checkpoint.flush()
+        self.assertEqual(self.committed(), [('case', 1, 'T-1'), ('run', 7, 'E-1')])
+
+    def test_commits_every_batch_size_rows(self):
+        checkpoint = self.open_checkpoint(batch_size=3)
+        for case_id in range(1, 8):
+            checkpoint.record('case', case_id, f'T-{case_id}')
+
+        self.assertEqual(len(self.committed()), 6)
+        checkpoint.close()
+        self.assertEqual(len(self.committed()), 7)
+
+    def test_resume_loads_earlier_rows(self):
+        first = self.open_checkpoint()
+        first.record('case', 1, 'T-1')
+        first.record('case', 2, 'T-2')
+        first.record('suite', 3, 'S-1')
+        first.close()
+
+        resumed = self.open_checkpoint(resume=True)
+        self.assertEqual(resumed.done('case'), {1: 'T-1', 2: 'T-2'})
+        self.assertEqual(resumed.done('suite'), {3: 'S-1'})
+        self.assertEqual(resumed.done('run'), {})
+
+        fresh = self.open_checkpoint()
+        self.assertEqual(fresh.done('case'), {})
+
+    def test_record_replaces_earlier_key(self):
+        checkpoint = self.open_checkpoint()
+        checkpoint.record('case', 1, 'OLD-1')
+        checkpoint.record('case', 1, 'T-1')
+        checkpoint.close()
+
+        self.assertEqual(self.committed(), [('case', 1, 'T-1')])
+
+    def test_record_upload_sets_attachment_id(self):
+        checkpoint = self.open_checkpoint()     # adds attachments.jira_attachment_id
+        checkpoint.record_upload(1, 10001)
+        checkpoint.close()
+
+        self.assertEqual(self.committed('SELECT id, jira_attachment_id FROM attachments'),
+                         [(1, '10001'), (2, None)])
+
+    def test_failed_flush_rolls_back_and_keeps_rows(self):
+        checkpoint = self.open_checkpoint()
+        checkpoint._db.execute('ALTER TABLE attachments RENAME TO attachments_moved')
+        checkpoint._db.commit()
+        checkpoint.record('case', 1, 'T-1')
+        checkpoint.record_upload(1, 10001)
+
+        # The jira_mappings insert succeeds, the attachments update does not
+        with self.assertRaises(sqlite3.OperationalError):
+            checkpoint.flush()
+        self.assertFalse(checkpoint._db.in_transaction)
+        self.assertEqual(self.committed(), [])
+
+        checkpoint._db.execute('ALTER TABLE attachments_moved RENAME TO attachments')
+        checkpoint._db.commit()
+        checkpoint.flush()
+        self.assertEqual(self.committed(), [('case', 1, 'T-1')])
+        self.assertEqual(self.committed('SELECT id, jira_attachment_id FROM attachments'), [(1, '10001'), (2, None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Unit tests for multipart_upload (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from email.parser import BytesParser
+from email.policy import HTTP
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from multipart_upload import MultipartFile, UploadProgress, format_size
+
+CONTENT = os.urandom(10000)
+
+
+def read_all(body, size=-1):
+    parts = []
+    while True:
+        data = body.read(size)
+        if not data:
+            return b''.join(parts)
+        parts.append(data)
+
+
+class MultipartFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'screenshot.png')
+        with open(self.path, 'wb') as upload:
+            upload.write(CONTENT)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def parse(self, body, data):
+        """Parse a multipart body the way a server would; returns its single part"""
+        message = BytesParser(policy=HTTP).parsebytes(
+            f'Content-Type: {body.content_type}\r\n\r\n'.encode('ascii') + data)
+        parts = list(message.iter_parts())
+        self.assertEqual(len(parts), 1)
+        return parts[0]
+
+    def test_length_matches_body(self):
+        with MultipartFile(self.path, chunk_size=1024) as body:
+            data = read_all(body)
+        self.assertEqual(len(body), len(data))
+
+    def test_body_holds_file_and_headers(self):
+        with MultipartFile(self.path) as body:
+            part = self.parse(body, read_all(body))
+
+        self.assertEqual(part.get_content_type(), 'image/png')
+        self.assertEqual(part.get_param('name', header='content-disposition'), 'file')
+        self.assertEqual(part.get_filename(), 'screenshot.png')
+        self.assertEqual(part.get_payload(decode=True), CONTENT)
+
+    def test_reads_are_bounded_by_chunk_size(self):
+        with MultipartFile(self.path, chunk_size=100) as body:
+            sizes = []
+            while True:
+                data = body.read(4096)
+                if not data:
+                    break
+                sizes.append(len(data))
+        self.assertLessEqual(max(sizes), 100)
+        self.assertEqual(sum(sizes), len(body))
+
+    def test_filename_is_escaped(self):
+        name = 'say "hi"\r\nX-Injected: 1.txt'
+        with MultipartFile(self.path, filename=name) as body:
+            data = read_all(body)
+
+        self.assertNotIn(b'\r\nX-Injected', data)
+        self.assertIn(b'filename="say %22hi%22%0D%0AX-Injected: 1.txt"', data)
+        self.assertEqual(self.parse(body, data).get_payload(decode=True), CONTENT)
+
+    def test_counts_file_bytes_only(self):
+        counted = []
+        with MultipartFile(self.path, chunk_size=999, progress=counted.append) as body:
+            read_all(body)
+
+        self.assertEqual(body.bytes_read, len(CONTENT))
+        self.assertEqual(sum(counted), len(CONTENT))
+
+    def test_unknown_extension_is_octet_stream(self):
+        with MultipartFile(self.path, filename='data.unknownext') as body:
+            part = self.parse(body, read_all(body))
+        self.assertEqual(part.get_content_type(), 'application/octet-stream')
+
+
+class UploadProgressTest(unittest.TestCase):
+
+    def test_reports_each_step(self):
+        progress = UploadProgress(1000, step=0.25)
+        with mock.patch('builtins.print') as printed:
+            for _ in range(10):
+                progress.add(100)
+        self.assertEqual(progress.sent, 1000)
+        self.assertEqual(printed.call_count, 4)
+
+    def test_failed_attempts_are_taken_back(self):
+        progress = UploadProgress(1000)
+        with mock.patch('builtins.print'):
+            progress.add(600)
+            progress.add(-600)
+        self.assertEqual(progress.sent, 0)
+
+    def test_format_size(self):
+        self.assertEqual(format_size(512), '512 B')
+        self.assertEqual(format_size(1536), '1.5 KB')
+        self.assertEqual(format_size(5 * 1024 ** 3), '5.0 GB')
+
+
+if __name__ == '__main__':
+    unittest.main()
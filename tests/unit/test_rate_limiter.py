@@ -0,0 +1,97 @@
+"""
+Unit tests for rate_limiter (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import os
+import sys
+import time
+import unittest
+from email.utils import formatdate
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def replay(*responses):
+    """Request function returning the given responses in turn"""
+    calls = []
+
+    def send():
+        calls.append(time.monotonic())
+        return responses[min(len(calls), len(responses)) - 1]
+    return send, calls
+
+
+class AdaptiveRateLimiterTest(unittest.TestCase):
+
+    def test_retries_429_after_retry_after(self):
+        limiter = AdaptiveRateLimiter(rate=10.0, max_rate=10.0)
+        send, calls = replay(FakeResponse(429, {'Retry-After': '0.3'}), FakeResponse(200))
+
+        response = limiter.send(send)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(calls[1] - calls[0], 0.3)
+        # Halved by the 429, then nudged up by the 200
+        self.assertAlmostEqual(limiter.rate, 10.0 * 0.5 + 0.1)
+
+    def test_retries_503(self):
+        limiter = AdaptiveRateLimiter(rate=10.0)
+        send, calls = replay(FakeResponse(503, {'Retry-After': '0'}), FakeResponse(200))
+
+        self.assertEqual(limiter.send(send).status_code, 200)
+        self.assertEqual(len(calls), 2)
+
+    def test_gives_up_after_max_retries(self):
+        limiter = AdaptiveRateLimiter(rate=10.0, min_rate=2.0, max_retries=2)
+        send, calls = replay(FakeResponse(429, {'Retry-After': '0'}))
+
+        self.assertEqual(limiter.send(send).status_code, 429)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(limiter.rate, 2.0)     # 10 -> 5 -> 2.5 -> floor
+
+    def test_other_errors_are_not_retried(self):
+        limiter = AdaptiveRateLimiter(rate=10.0)
+        send, calls = replay(FakeResponse(500))
+
+        self.assertEqual(limiter.send(send).status_code, 500)
+        self.assertEqual(len(calls), 1)
+
+    def test_rate_stays_within_bounds(self):
+        limiter = AdaptiveRateLimiter(rate=1.0, min_rate=0.5, max_rate=1.2, increase=0.5)
+        limiter.record(200, 0.1)
+        self.assertEqual(limiter.rate, 1.2)
+        limiter.record(200, 10.0)   # slower than latency_target: no increase
+        self.assertEqual(limiter.rate, 1.2)
+        for _ in range(5):
+            limiter.record(429, 0.1)
+        self.assertEqual(limiter.rate, 0.5)
+
+
+class ParseRetryAfterTest(unittest.TestCase):
+
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after('5'), 5.0)
+        self.assertEqual(parse_retry_after('-1'), 0.0)
+
+    def test_http_date(self):
+        seconds = parse_retry_after(formatdate(time.time() + 30, usegmt=True))
+        self.assertTrue(25 <= seconds <= 30, seconds)
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after(''))
+        self.assertIsNone(parse_retry_after('soon'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Unit tests for task_graph.TaskGraph (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from task_graph import TaskGraph
+
+
+class TaskGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.order = []
+        self.lock = threading.Lock()
+
+    def task(self, name):
+        with self.lock:
+            self.order.append(name)
+
+    def fail(self, name):
+        self.task(name)
+        raise RuntimeError(f"{name} failed")
+
+    def test_runs_dependencies_first(self):
+        graph = TaskGraph(workers=4)
+        graph.add('suite', self.task, 'suite')
+        graph.add('case-1', self.task, 'case-1', deps=['suite'])
+        graph.add('case-2', self.task, 'case-2', deps=['suite'])
+        graph.add('set', self.task, 'set', deps=['case-1', 'case-2'])
+        graph.add('milestone', self.task, 'milestone')
+
+        self.assertEqual(graph.run(), {})
+        self.assertEqual(sorted(self.order), ['case-1', 'case-2', 'milestone', 'set', 'suite'])
+        position = {name: index for index, name in enumerate(self.order)}
+        self.assertLess(position['suite'], position['case-1'])
+        self.assertLess(position['suite'], position['case-2'])
+        self.assertLess(position['case-1'], position['set'])
+        self.assertLess(position['case-2'], position['set'])
+
+    def test_deepest_ready_task_runs_first(self):
+        # With one worker the order is fully determined by the priorities
+        graph = TaskGraph(workers=1)
+        graph.add('a', self.task, 'a')
+        graph.add('b', self.task, 'b')
+        graph.add('a-child', self.task, 'a-child', deps=['a'])
+
+        graph.run()
+        self.assertEqual(self.order, ['a', 'a-child', 'b'])
+
+    def test_dependents_run_after_a_failed_dependency(self):
+        graph = TaskGraph(workers=2)
+        graph.add('execution', self.fail, 'execution')
+        graph.add('results', self.task, 'results', deps=['execution'])
+
+        errors = graph.run()
+        self.assertEqual(list(errors), ['execution'])
+        self.assertIsInstance(errors['execution'], RuntimeError)
+        self.assertEqual(self.order, ['execution', 'results'])
+
+    def test_workers_stop_when_done(self):
+        graph = TaskGraph(workers=3)
+        for index in range(10):
+            graph.add(index, self.task, index, deps=[index - 1] if index else ())
+
+        graph.run()
+        self.assertEqual(self.order, list(range(10)))
+        self.assertFalse([thread for thread in threading.enumerate()
+                          if thread.name.startswith('task-graph-')])
+
+    def test_empty_graph(self):
+        self.assertEqual(TaskGraph().run(), {})
+
+    def test_rejects_unknown_and_duplicate_tasks(self):
+        graph = TaskGraph()
+        graph.add('a', self.task, 'a')
+        with self.assertRaises(ValueError):
+            graph.add('a', self.task, 'a')
+        with self.assertRaises(ValueError):
+            graph.add('b', self.task, 'b', deps=['missing'])
+        self.assertEqual(len(graph), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
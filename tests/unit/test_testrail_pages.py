@@ -0,0 +1,76 @@
+"""
+Unit tests for testrail.APIClient.iter_pages (no server needed)
+
+Run from the repository root:
+    python -m unittest discover -s tests/unit
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from testrail import APIClient
+
+
+class FakeClient(APIClient):
+    """APIClient answering send_get from a dict of canned responses"""
+
+    def __init__(self, responses):
+        super().__init__('http://testrail.invalid')
+        self.responses = responses
+        self.requested = []
+
+    def send_get(self, uri, filepath=None):
+        self.requested.append(uri)
+        return self.responses[uri]
+
+
+def page(key, items, next_uri=None):
+    return {'offset': 0, 'limit': 2, 'size': len(items), key: items,
+            '_links': {'next': next_uri and '/api/v2/' + next_uri, 'prev': None}}
+
+
+class IterPagesTest(unittest.TestCase):
+
+    def test_follows_next_links(self):
+        client = FakeClient({
+            'get_cases/1&suite_id=2&limit=2&offset=0':
+                page('cases', [{'id': 1}, {'id': 2}], 'get_cases/1&suite_id=2&limit=2&offset=2'),
+            'get_cases/1&suite_id=2&limit=2&offset=2':
+                page('cases', [{'id': 3}]),
+        })
+
+        cases = list(client.iter_pages('get_cases/1&suite_id=2', 'cases', limit=2))
+        self.assertEqual([case['id'] for case in cases], [1, 2, 3])
+        self.assertEqual(len(client.requested), 2)
+
+    def test_is_lazy(self):
+        client = FakeClient({
+            'get_runs/1&limit=2&offset=0': page('runs', [{'id': 1}, {'id': 2}], 'get_runs/1&limit=2&offset=2'),
+        })
+
+        runs = client.iter_pages('get_runs/1', 'runs', limit=2)
+        self.assertEqual(next(runs)['id'], 1)
+        self.assertEqual(next(runs)['id'], 2)
+        self.assertEqual(client.requested, ['get_runs/1&limit=2&offset=0'])
+
+    def test_uses_client_page_size_and_offset(self):
+        client = FakeClient({'get_sections/1&limit=250&offset=10': page('sections', [{'id': 5}])})
+
+        self.assertEqual(list(client.iter_pages('get_sections/1', 'sections', offset=10)), [{'id': 5}])
+
+    def test_bare_list_response(self):
+        client = FakeClient({'get_cases/1&limit=250&offset=0': [{'id': 1}, {'id': 2}]})
+
+        self.assertEqual(list(client.iter_pages('get_cases/1', 'cases')), [{'id': 1}, {'id': 2}])
+        self.assertEqual(len(client.requested), 1)
+
+    def test_iter_cases_passes_filters(self):
+        client = FakeClient({'get_cases/1&suite_id=2&updated_after=100&limit=250&offset=0': page('cases', [])})
+
+        self.assertEqual(list(client.iter_cases(1, suite_id=2, updated_after=100)), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -159,7 +159,7 @@ def validate_and_upload_attachments():
                 total_missing += 1
                 continue
             
-            result = client.add_attachment(jira_key, att['local_path'])
+            result = client.add_attachment(jira_key, att['local_path'], filename=att['filename'])
             if result:
                 total_uploaded += 1
             else:
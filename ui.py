@@ -45,6 +45,11 @@ class TestRailMigratorUI:
         # Load configuration
         self.load_config()
         
+        # Jira session shared by the project lookups and the connection test,
+        # rebuilt only when the credentials change
+        self._jira_session = None
+        self._jira_session_credentials = None
+        
         # Create main notebook (tabs)
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -78,6 +83,19 @@ class TestRailMigratorUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save configuration: {e}")
     
+    def get_jira_session(self, username, password):
+        """Return this window's pooled Jira session for the given credentials"""
+        from jira_session import session_from_config
+        
+        credentials = (username, password)
+        if self._jira_session is None or self._jira_session_credentials != credentials:
+            if self._jira_session is not None:
+                self._jira_session.close()
+            self._jira_session = session_from_config(
+                dict(self.config, jira_username=username, jira_password=password))
+            self._jira_session_credentials = credentials
+        return self._jira_session
+    
     # ========================================================================
     # PROJECT SELECTION TAB
     # ========================================================================
@@ -202,13 +220,13 @@ class TestRailMigratorUI:
             return
         
         try:
-            from testrail import APIClient
+            from testrail import client_from_config
             
-            client = APIClient(self.config['testrail_url'])
-            client.user = self.config['testrail_user']
-            client.password = self.config['testrail_password']
-            
-            response = client.send_get('get_projects')
+            client = client_from_config(self.config)
+            try:
+                response = client.send_get('get_projects')
+            finally:
+                client.close()
             projects = response.get('projects', [])
             
             for project in projects:
@@ -234,34 +252,11 @@ class TestRailMigratorUI:
             return
         
         try:
-            import requests
-            from requests.auth import HTTPBasicAuth
-            import re
-            
             base_url = self.config['jira_url']
-            username = self.config['jira_username']
-            password = self.config['jira_password']
-            
-            # Detect if using PAT
-            is_base64_like = bool(re.match(r'^[A-Za-z0-9+/=]+$', password))
-            is_token = (len(password) > 30 and is_base64_like) or len(password) > 40
-            
-            if is_token:
-                headers = {
-                    'Authorization': f'Bearer {password}',
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                }
-                auth = None
-            else:
-                headers = {
-                    'Content-Type': 'application/json',
-                    'Accept': 'application/json'
-                }
-                auth = HTTPBasicAuth(username, password)
+            session = self.get_jira_session(self.config['jira_username'], self.config['jira_password'])
             
             url = f"{base_url}/rest/api/2/project"
-            response = requests.get(url, auth=auth, headers=headers)
+            response = session.get(url)
             response.raise_for_status()
             projects = response.json()
             
@@ -316,34 +311,13 @@ class TestRailMigratorUI:
             
             try:
                 import requests
-                from requests.auth import HTTPBasicAuth
-                import re
                 
                 base_url = self.config['jira_url']
-                username = self.config['jira_username']
-                password = self.config['jira_password']
-                
-                # Detect if using PAT
-                is_base64_like = bool(re.match(r'^[A-Za-z0-9+/=]+$', password))
-                is_token = (len(password) > 30 and is_base64_like) or len(password) > 40
-                
-                if is_token:
-                    headers = {
-                        'Authorization': f'Bearer {password}',
-                        'Content-Type': 'application/json',
-                        'Accept': 'application/json'
-                    }
-                    auth = None
-                else:
-                    headers = {
-                        'Content-Type': 'application/json',
-                        'Accept': 'application/json'
-                    }
-                    auth = HTTPBasicAuth(username, password)
+                session = self.get_jira_session(self.config['jira_username'], self.config['jira_password'])
                 
                 # Fetch project details to verify it exists
                 url = f"{base_url}/rest/api/2/project/{project_key}"
-                response = requests.get(url, auth=auth, headers=headers)
+                response = session.get(url)
                 
                 if response.status_code == 404:
                     messagebox.showerror("Error", f"Project '{project_key}' not found in Jira.")
@@ -1377,7 +1351,8 @@ class TestRailMigratorUI:
             client = migrator.JiraXrayClient(
                 self.jira_url.get(),
                 self.jira_username.get(),
-                self.jira_password.get()
+                self.jira_password.get(),
+                session=self.get_jira_session(self.jira_username.get(), self.jira_password.get())
             )
             project = client.get_project(self.jira_project.get())
             messagebox.showinfo("Success", 
@@ -1388,6 +1363,8 @@ class TestRailMigratorUI:
     def on_closing(self):
         """Handle window close event"""
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
+            if self._jira_session is not None:
+                self._jira_session.close()
             self.root.destroy()
             sys.exit(0)
     